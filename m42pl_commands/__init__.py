@@ -10,7 +10,7 @@ from . import multiproc_comm
 # Control flow
 from . import (
     ignore, echo, foreach, until, sleep, assertion,
-    buffer, head, tailf, limit, parallel
+    buffer, compact, batch, head, tailf, limit, parallel, partition
 )
 
 # Data manipulation
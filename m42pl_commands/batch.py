@@ -0,0 +1,317 @@
+"""Columnar events batches.
+
+An ``EventBatch`` holds the data of several events as columns (one list
+per top-level data field) and a selection vector (the indexes of the
+rows which are still part of the batch).
+
+Batches are built by the ``batch`` command and passed along the
+batch-aware commands (see ``Batchable``) as a single item, which saves
+the per-event commands calls. A batch-aware command which is followed by
+a command which does not accept batches yields the batch's rows as
+regular events instead; the ``unbatch`` command does the same
+explicitly.
+"""
+
+import ast
+import re
+
+from m42pl.commands import StreamingCommand, DequeBufferingCommand
+from m42pl.event import Event
+from m42pl.fields import Field
+
+
+class Missing:
+    """Marker of a field which is missing from an event.
+    """
+
+    def __repr__(self):
+        return 'missing'
+
+
+missing = Missing()
+
+
+def plain(name, nested: bool = True) -> bool:
+    """Returns ``True`` if a field name is a plain field path (which can
+    be read from a batch's columns).
+
+    :param name:    Field name
+    :param nested:  Accept dotted fields paths (e.g. ``a.b``)
+    """
+    pattern = nested and r'[A-Za-z_]\w*(\.[A-Za-z_]\w*)*' or r'[A-Za-z_]\w*'
+    return isinstance(name, str) and re.fullmatch(pattern, name) is not None
+
+
+def references(expression: str) -> set|None:
+    """Returns the top-level fields an expression may read.
+
+    The names and the strings constants' roots (e.g. for
+    ``field('a.b', 0)``) are returned.
+
+    :param expression: Expression
+    :returns: Fields names, or ``None`` if the expression cannot be
+        parsed
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            names.add(node.value.split('.', 1)[0])
+    return names
+
+
+class EventBatch:
+    """Columnar batch of events.
+
+    :ivar columns:      Data columns, by top-level field name
+    :ivar size:         Number of rows
+    :ivar signs:        Rows signatures
+    :ivar metas:        Rows metadata
+    :ivar selection:    Selected rows indexes; ``None`` selects all rows
+    """
+
+    __slots__ = ('columns', 'size', 'signs', 'metas', 'selection')
+
+    def __init__(self, columns: dict, size: int, signs: list = None,
+                    metas: list = None, selection: list = None):
+        self.columns = columns
+        self.size = size
+        self.signs = signs or [None] * size
+        self.metas = metas or [{} for _ in range(size)]
+        self.selection = selection
+
+    @classmethod
+    def from_events(cls, events: list) -> 'EventBatch':
+        """Builds a batch from a list of events.
+
+        :param events: Events
+        """
+        columns = {} # type: dict[str, list]
+        for index, event in enumerate(events):
+            for name, value in event['data'].items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = [missing] * len(events)
+                column[index] = value
+        return cls(
+            columns,
+            len(events),
+            [event.get('sign') for event in events],
+            [event.get('meta') or {} for event in events]
+        )
+
+    def __len__(self) -> int:
+        return self.size if self.selection is None else len(self.selection)
+
+    def rows(self):
+        """Returns the selected rows indexes.
+        """
+        return range(self.size) if self.selection is None else self.selection
+
+    def column(self, path: str, default=missing) -> list:
+        """Returns a field's values for the selected rows.
+
+        :param path:    Field path (e.g. ``a`` or ``a.b``)
+        :param default: Missing values replacement
+        """
+        root, *keys = path.split('.')
+        column = self.columns.get(root)
+        if column is None:
+            return [default] * len(self)
+        values = []
+        for index in self.rows():
+            value = column[index]
+            for key in keys:
+                value = value.get(key, missing) if isinstance(value, dict) else missing
+            values.append(default if value is missing else value)
+        return values
+
+    def data(self, index: int) -> dict:
+        """Returns a row's data.
+
+        :param index: Row index
+        """
+        return {
+            name: column[index]
+            for name, column
+            in self.columns.items()
+            if column[index] is not missing
+        }
+
+    def records(self, names: set = None):
+        """Yields the selected rows indexes and data.
+
+        :param names:   Top-level fields to include in the rows data;
+                        Defaults to all the fields
+        """
+        if names is None:
+            for index in self.rows():
+                yield index, self.data(index)
+            return
+        selected = [name for name in self.columns if name in names]
+        if not selected:
+            for index in self.rows():
+                yield index, {}
+            return
+        columns = [self.columns[name] for name in selected]
+        if self.selection is not None:
+            columns = [[column[i] for i in self.selection] for column in columns]
+        for index, values in zip(self.rows(), zip(*columns)):
+            yield index, {
+                name: value
+                for name, value
+                in zip(selected, values)
+                if value is not missing
+            }
+
+    def set(self, name: str, index: int, value):
+        """Sets a row's top-level field value.
+
+        :param name:    Field name
+        :param index:   Row index
+        :param value:   Field value
+        """
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = [missing] * self.size
+        column[index] = value
+
+    def assign(self, name: str, values: list):
+        """Sets a top-level field's values for the selected rows.
+
+        :param name:    Field name
+        :param values:  Field values, by selected row
+        """
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = [missing] * self.size
+        if self.selection is None:
+            column[:] = values
+        else:
+            for index, value in zip(self.selection, values):
+                column[index] = value
+
+    def select(self, mask):
+        """Keeps only the selected rows which passes ``mask``.
+
+        :param mask: Selected rows mask
+        """
+        self.selection = [
+            index
+            for index, keep
+            in zip(self.rows(), mask)
+            if keep
+        ]
+
+    def events(self):
+        """Yields the selected rows as events.
+        """
+        for index in self.rows():
+            yield Event(
+                data=self.data(index),
+                meta=self.metas[index],
+                sign=self.signs[index]
+            )
+
+
+class Batchable:
+    """Commands which accept ``EventBatch`` events.
+
+    :ivar unbatch: Yield the batches rows instead of the batches; Set
+        at setup time by ``link_batches``
+    """
+
+    unbatch = True
+
+    def batchable(self) -> bool:
+        """Returns ``True`` if the instance accepts batches.
+        """
+        return True
+
+    def link_batches(self, pipeline):
+        """Checks whether the next command accepts batches.
+
+        :param pipeline: Current pipeline
+        """
+        commands = list(getattr(pipeline, 'commands', []))
+        for index, command in enumerate(commands):
+            if command is self:
+                following = index + 1 < len(commands) and commands[index + 1] or None
+                self.unbatch = not (
+                    isinstance(following, Batchable)
+                    and following.batchable()
+                )
+                break
+
+    async def emit_batch(self, batch: EventBatch):
+        """Yields a batch, or its rows if the next command does not
+        accepts batches.
+
+        :param batch: Batch to yield
+        """
+        if self.unbatch:
+            for event in batch.events():
+                yield event
+        elif len(batch):
+            yield batch
+
+
+class Batch(DequeBufferingCommand, Batchable):
+    """Groups events into columnar batches.
+    """
+
+    _about_     = 'Groups events into columnar batches'
+    _syntax_    = '[[size=]<batch size>]'
+    _aliases_   = ['batch', ]
+    _schema_    = {'properties': {}} # type: ignore
+
+    def __init__(self, size: int = 1024):
+        """
+        :param size: Batch size
+        """
+        super().__init__(size)
+        self.size = Field(size, default=1024, type=int)
+
+    def batchable(self) -> bool:
+        return False
+
+    async def setup(self, event, pipeline, context):
+        await super().setup(
+            event,
+            pipeline,
+            context,
+            await self.size.read(event, pipeline, context)
+        )
+        self.link_batches(pipeline)
+
+    async def target(self, pipeline):
+        events = [
+            event
+            async for event
+            in super().target(pipeline)
+        ]
+        if events:
+            async for event in self.emit_batch(EventBatch.from_events(events)):
+                yield event
+
+
+class Unbatch(StreamingCommand):
+    """Splits columnar batches into events.
+    """
+
+    _about_     = 'Splits columnar batches into events'
+    _syntax_    = ''
+    _aliases_   = ['unbatch', ]
+    _schema_    = {'properties': {}} # type: ignore
+
+    async def target(self, event, pipeline, context):
+        if isinstance(event, EventBatch):
+            for row in event.events():
+                yield row
+        else:
+            yield event
@@ -0,0 +1,72 @@
+from time import monotonic
+
+from m42pl.commands import StreamingCommand
+from m42pl.event import signature
+from m42pl.fields import Field
+
+
+class Compact(StreamingCommand):
+    """Keeps only the latest event of each signature.
+
+    Events are buffered by signature, a newer event replacing the
+    previous one with the same signature. The buffer is flushed once
+    ``size`` events have been received, when an event is received more
+    than ``interval`` seconds after the previous flush, and at the
+    pipeline's end. The interval is only checked when events are
+    received: an idle stream keeps its buffered events until its next
+    event or the pipeline's end.
+
+    This is typically used to reduce the partial results of a streaming
+    aggregation (e.g. ``stats``) before an expensive command.
+    """
+
+    _about_     = 'Keeps only the latest event of each signature'
+    _syntax_    = '[[size=]<buffer size>] [[interval=]<seconds>]'
+    _aliases_   = ['compact', ]
+    _schema_    = {'properties': {}}
+
+    def __init__(self, size: int = 1024, interval: float = 0.0):
+        """
+        :param size:        Number of events to receive before flushing
+        :param interval:    Maximum delay between two flushes, in
+                            seconds; Defaults to ``0`` (no delay)
+        """
+        super().__init__(size, interval)
+        self.size = Field(size, default=1024, type=int)
+        self.interval = Field(interval, default=0.0, type=(float, int))
+        # Latest events by signature, received events count and latest
+        # flush time
+        self.events = {} # type: dict[str, dict]
+        self.received = 0
+        self.flushed = monotonic()
+
+    async def setup(self, event, pipeline, context):
+        self.size = await self.size.read(event, pipeline, context)
+        self.interval = await self.interval.read(event, pipeline, context)
+
+    async def __call__(self, event, pipeline, context, ending, *args, **kwargs):
+        """Flushes the buffered events at the pipeline's end.
+        """
+        async for next_event in super().__call__(event, pipeline, context, ending, *args, **kwargs):
+            yield next_event
+        if ending:
+            async for next_event in self.flush():
+                yield next_event
+
+    async def target(self, event, pipeline, context):
+        self.events[signature(event)] = event
+        self.received += 1
+        if (self.received >= self.size
+                or (self.interval
+                    and monotonic() - self.flushed >= self.interval)):
+            async for next_event in self.flush():
+                yield next_event
+
+    async def flush(self):
+        """Yields and clears the buffered events.
+        """
+        events, self.events = self.events, {}
+        self.received = 0
+        self.flushed = monotonic()
+        for event in events.values():
+            yield event
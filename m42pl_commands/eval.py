@@ -1,14 +1,113 @@
+import ast
+import operator
+import re
 from textwrap import dedent
 from collections import OrderedDict
 
-from typing import Dict
+# NumPy is optional: batches are evaluated row by row when it is not
+# available
+try:
+    import numpy as np
+except ImportError:
+    np = None # type: ignore
+
+from typing import Dict, List
 
 from m42pl.commands import StreamingCommand
 from m42pl.utils.eval import Evaluator
 from m42pl.fields import Field
 
+from .batch import Batchable, EventBatch, references
+
+
+# Vectorizable arithmetic operators
+arithmetics = {
+    ast.Add:    operator.add,
+    ast.Sub:    operator.sub,
+    ast.Mult:   operator.mul,
+    ast.Div:    operator.truediv
+}
+
+
+def compile_column(expression: str):
+    """Compiles a simple arithmetic expression to a NumPy column
+    function.
+
+    Supported expressions are made of top-level fields, numeric
+    constants, ``+``, ``-``, ``*``, ``/`` and unary ``-``.
+
+    The returned function takes a column reader (which returns a
+    field's values list) and the number of rows, and returns the
+    expression's values list, or ``None`` if the result could differ
+    from Python's (fields which are missing, not numeric or of mixed
+    types, integers overflow, division by zero, ...): the caller must
+    then evaluate the expression row by row.
+
+    :param expression: Expression
+    :returns: Column function, or ``None`` if the expression is not
+        supported
+    """
+    if np is None:
+        return None
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return None
+    names = set()
+
+    def build(node):
+        if isinstance(node, ast.BinOp) and type(node.op) in arithmetics:
+            function = arithmetics[type(node.op)]
+            left, right = build(node.left), build(node.right)
+            return lambda columns: function(left(columns), right(columns))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            part = build(node.operand)
+            return lambda columns: np.negative(part(columns))
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+            return lambda columns: columns[node.id]
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return lambda columns: node.value
+        raise ValueError(node)
 
-class Eval(StreamingCommand):
+    try:
+        function = build(tree.body)
+    except ValueError:
+        return None
+
+    def column(read, size: int):
+        columns = {}
+        for name in names:
+            values = read(name)
+            # Mixed int and float columns would be computed as floats
+            types = set(map(type, values))
+            if len(types) > 1 or not types <= {int, float}:
+                return None
+            columns[name] = np.asarray(values)
+            if columns[name].dtype.kind not in 'if':
+                return None
+            # Large integers do not round-trip through float64
+            if (columns[name].dtype.kind == 'i' and len(values)
+                    and np.abs(columns[name]).max() >= 2 ** 53):
+                return None
+        try:
+            with np.errstate(all='raise'):
+                result = np.broadcast_to(function(columns), (size,))
+                if result.dtype.kind == 'i':
+                    # Python integers do not overflow
+                    check = function({n: c.astype(float) for n, c in columns.items()})
+                    if np.any(np.abs(check) >= 2 ** 62):
+                        return None
+                elif result.dtype.kind != 'f':
+                    return None
+        except (ArithmeticError, TypeError):
+            return None
+        return result.tolist()
+
+    return column
+
+
+class Eval(StreamingCommand, Batchable):
     _about_     = 'Evaluate a Python expression and assign result to a field'
     _syntax_    = '<field_name> = <expression> [, ...]'
     _aliases_   = ['eval', 'evaluate']
@@ -17,6 +116,7 @@ class Eval(StreamingCommand):
             'description': 'Evaluated fields'
         }
     }
+    accumulator = '__eval_values__'
     _grammar_   = OrderedDict(StreamingCommand._grammar_)
     # Eval does not uses the arguments grammar
     _grammar_.pop('arguments_rules')
@@ -40,12 +140,166 @@ class Eval(StreamingCommand):
             for field, expr 
             in fields.items()
         ])
-    
-    async def target(self, event, pipeline, context):
-        for field, expr in self.fields.items():
+        # ---
+        # Compiled stages
+        # Assignments are grouped in stages of independent assignments,
+        # each stage being evaluated at once as a single expression (see
+        # ``compile``). An assignment which reads a field assigned in
+        # the current stage starts a new stage. Stages also keep their
+        # assignments NumPy column functions, if they can all be
+        # vectorized.
+        self.stages = [] # type: List[list]
+        stage = [] # type: List[tuple]
+        for (field, evaluator), expr in zip(self.fields.items(), fields.values()):
+            if stage and any(self.reads(expr, assigned.name) for assigned, *_ in stage):
+                self.stages.append(self.compile(stage))
+                stage = []
+            stage.append((field, self.toplevel(field), evaluator, expr))
+        if stage:
+            self.stages.append(self.compile(stage))
+
+    @staticmethod
+    def reads(expr: str, name: str) -> bool:
+        """Returns ``True`` if an expression may read a field.
+
+        The check is textual and conservative: it matches the field's
+        top-level name anywhere in the expression.
+
+        :param expr:    Expression
+        :param name:    Field name
+        """
+        root = re.split(r'[.\[]', name, 1)[0]
+        return re.search(rf'(?<![\w.]){re.escape(root)}(?!\w)', expr) is not None
+
+    @staticmethod
+    def toplevel(field: Field) -> str|None:
+        """Returns a field's name if it is a plain top-level field name,
+        which can be written directly to the event's data.
+
+        :param field: Destination field
+        """
+        name = field.name
+        if isinstance(name, str) and re.fullmatch(r'[A-Za-z_]\w*', name):
+            return name
+        return None
+
+    @classmethod
+    def compile(cls, stage: list) -> list:
+        """Returns a compiled stage, as ``[evaluator, assignments,
+        columns functions, read fields]``.
+
+        The stage evaluator appends its assignments values one by one
+        to the ``accumulator`` list, so that the values computed before
+        a failing assignment are kept (see ``values``). Single
+        assignment stages have no stage evaluator: they are evaluated
+        by their assignment's evaluator.
+
+        :param stage: Stage assignments, as
+            ``(field, top-level name, evaluator, expression)``
+        """
+        columns = [compile_column(expr) for *_, expr in stage]
+        names = [references(expr) for *_, expr in stage]
+        return [
+            len(stage) > 1 and Evaluator(
+                '(' + ', '.join(
+                    f'{cls.accumulator}.append(({expr}))'
+                    for *_, expr
+                    in stage
+                ) + ',)'
+            ) or None,
+            [(field, key, evaluator) for field, key, evaluator, _ in stage],
+            all(columns) and columns or None,
+            None if None in names else set().union(*names)
+        ]
+
+    def values(self, data: dict, stage: list) -> list:
+        """Returns a stage's values.
+
+        Failing assignments are set to ``None``. When an assignment of
+        a stage evaluator fails, the values computed before it are kept
+        and the next assignments are evaluated one by one, for the
+        current event only: each assignment is evaluated once.
+
+        :param data:    Event's data
+        :param stage:   Compiled stage
+        """
+        evaluator, assignments, *_ = stage
+        values = [] # type: list
+        if evaluator is not None:
+            data[self.accumulator] = values
+            try:
+                evaluator(data)
+                return values
+            except Exception as error:
+                # The failed assignment is the first one without value
+                self.logger.error(error)
+                values.append(None)
+            finally:
+                data.pop(self.accumulator, None)
+        for _, _, expr in assignments[len(values):]:
             try:
-                await field.write(event, expr(event['data']))
+                values.append(expr(data))
             except Exception as error:
                 self.logger.error(error)
-                await field.write(event, None)
+                values.append(None)
+        return values
+
+    def batchable(self) -> bool:
+        # Batches rows can only be updated by top-level fields
+        return all(
+            key
+            for _, assignments, *_ in self.stages
+            for _, key, _ in assignments
+        )
+
+    async def setup(self, event, pipeline, context):
+        self.link_batches(pipeline)
+
+    async def target(self, event, pipeline, context):
+        if isinstance(event, EventBatch):
+            self.evaluate_batch(event)
+            async for next_event in self.emit_batch(event):
+                yield next_event
+            return
+        for stage in self.stages:
+            assignments = stage[1]
+            values = self.values(event['data'], stage)
+            for (field, key, _), value in zip(assignments, values):
+                if key:
+                    event['data'][key] = value
+                else:
+                    await field.write(event, value)
         yield event
+
+    def evaluate_batch(self, batch: EventBatch) -> EventBatch:
+        """Evaluates the assignments over a batch's rows.
+
+        Each stage is evaluated over all the rows before the next one:
+        as NumPy columns operations if possible (see
+        ``compile_column``), or row by row otherwise, each row's data
+        holding only the fields read by the stage.
+
+        :param batch: Batch to update
+        """
+        size = len(batch)
+        for stage in self.stages:
+            _, assignments, columns, names = stage
+            # Vectorized path
+            if columns:
+                results = []
+                for column in columns:
+                    results.append(column(batch.column, size))
+                    if results[-1] is None:
+                        break
+                else:
+                    for (_, key, _), values in zip(assignments, results):
+                        batch.assign(key, values)
+                    continue
+            # Per-row path
+            results = [[] for _ in assignments]
+            for _, data in batch.records(names):
+                for values, value in zip(results, self.values(data, stage)):
+                    values.append(value)
+            for (_, key, _), values in zip(assignments, results):
+                batch.assign(key, values)
+        return batch
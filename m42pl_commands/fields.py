@@ -5,8 +5,11 @@ from m42pl.commands import StreamingCommand
 from m42pl.fields import Field
 from m42pl.event import Event
 
+from .batch import Batchable, EventBatch, missing, plain
+from .projection import Projection, getter, setter, deleter, plains
 
-class Fields(StreamingCommand):
+
+class Fields(StreamingCommand, Batchable, Projection):
     _about_     = 'Keep (+) or remove (-) the selected fields'
     _syntax_    = '[+|-] field_name [, ...]'
     _aliases_   = ['fields',]
@@ -39,10 +42,40 @@ class Fields(StreamingCommand):
         super().__init__(mode, fields)
         self.mode = Field(mode, default=mode)
         self.fields = [Field(f) for f in fields]
-    
+        # Compiled projection (plain fields paths only)
+        if mode in ('+', '-') and plains(*fields):
+            self.projection = self.compile(mode, fields)
+
+    @staticmethod
+    def compile(mode: str, fields: list):
+        """Returns the compiled projection of plain fields paths.
+
+        :param mode:    Projection mode (``+`` or ``-``)
+        :param fields:  Fields paths
+        """
+        if mode == '+':
+            accessors = [(getter(f), setter(f)) for f in fields]
+            def keep(event):
+                _event = Event(data={}, sign=event['sign'])
+                for get, set in accessors:
+                    set(_event['data'], get(event['data']))
+                return _event
+            return keep
+        deleters = [deleter(f) for f in fields]
+        def remove(event):
+            for delete in deleters:
+                delete(event['data'])
+            return event
+        return remove
+
+    def batchable(self) -> bool:
+        return all(plain(field.name, nested=False) for field in self.fields)
+
     async def setup(self, event, pipeline, context):
         self.mode = await self.mode.read(event, pipeline, context)
         self.filter = self.mode == '+' and self.keep or self.remove
+        self.link_batches(pipeline)
+        self.fuse(pipeline)
 
     async def keep(self, event):
         """Keep only the selected fields.
@@ -62,5 +95,31 @@ class Fields(StreamingCommand):
             await field.delete(event)
         return event
     
+    def filter_batch(self, batch: EventBatch) -> EventBatch:
+        """Keep or remove the selected columns of a batch.
+        """
+        names = [field.name for field in self.fields]
+        if self.mode == '+':
+            batch.columns = {
+                name: [
+                    None if value is missing else value
+                    for value
+                    in batch.columns.get(name) or [None] * batch.size
+                ]
+                for name in names
+            }
+        else:
+            for name in names:
+                batch.columns.pop(name, None)
+        return batch
+
     async def target(self, event, pipeline, context):
-        yield await self.filter(event)
+        if isinstance(event, EventBatch):
+            async for next_event in self.emit_projected(self.filter_batch(event)):
+                yield next_event
+        elif self.fused:
+            yield event
+        elif self.projection:
+            yield self.project(event, [self.projection, *self.after])
+        else:
+            yield await self.filter(event)
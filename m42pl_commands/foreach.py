@@ -1,8 +1,9 @@
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from textwrap import dedent
+import asyncio
 
 from m42pl.commands import StreamingCommand
-from m42pl.pipeline import InfiniteRunner
+from m42pl.pipeline import Pipeline, InfiniteRunner
 from m42pl.fields import Field
 
 
@@ -14,37 +15,119 @@ class Foreach(StreamingCommand):
     * It hijacks its parent :class:`StreamingCommand.__call__` method
       and let the sub-pipeline handle its own termination
     * It iterates over the sub-pipeline in *infinite* mode
+
+    With ``concurrency`` greater than 1, the command keeps a pool of
+    runners (each one with its own copy of the sub-pipeline) and
+    dispatches each event to the next free runner; the events results
+    are yield in the events order (``ordered=yes``, default) or as soon
+    as they are available (``ordered=no``).
+
+    At most ``2 * concurrency`` events are pending (running or waiting
+    for an earlier event to complete): past this limit, the command
+    waits for the first pending event (or for any of them when
+    unordered) before returning. The results of the last pending events
+    are yield with the next events, or at the pipeline's end.
     """
 
     _about_     = 'Run a sub-pipeline for each event'
-    _syntax_    = '<pipeline>'
+    _syntax_    = '[concurrency=<n>] [ordered=<yes|no>] <pipeline>'
     _aliases_   = ['foreach',]
     _schema_    = {'properties': {}} # type: ignore
-    
+
     _grammar_   = OrderedDict(StreamingCommand._grammar_)
     _grammar_['start'] = dedent('''\
-        start : piperef
+        start : kwargs? piperef
     ''')
 
     class Transformer(StreamingCommand.Transformer):
         def start(self, items):
-            return items, {}
+            kwargs = {}
+            if len(items) > 1:
+                for kwarg in items[0]:
+                    kwargs.update(kwarg)
+            return items[-1:], kwargs
 
-    def __init__(self, pipeline: str):
+    def __init__(self, pipeline: str, concurrency: int = 1,
+                    ordered: str = 'yes'):
         """
         :param pipeline:    Pipeline ID
+        :param concurrency: Number of concurrent sub-pipeline runners
+        :param ordered:     Yield the results in the events order
+                            (``yes`` or ``no``)
         """
-        super().__init__(pipeline)
+        super().__init__(pipeline, concurrency, ordered)
         self.pipeline = Field(pipeline)
+        self.concurrency = Field(concurrency, default=1, type=int)
+        self.ordered = Field(ordered, default=ordered)
+        # Free runners, pending events and maximum number of pending events
+        self.idle = None # type: asyncio.Queue|None
+        self.pending = deque() # type: deque[asyncio.Task]
+        self.window = 1
 
     async def setup(self, event, pipeline, context):
-        self.runner = InfiniteRunner(
-            context.pipelines[self.pipeline.name],
-            context,
-            event
-        )
-        await self.runner.setup()
-
-    async def __call__(self, event, pipeline, ending, *args, **kwargs):
-        async for next_event in self.runner(event):
+        self.concurrency = max(1, await self.concurrency.read(event, pipeline, context))
+        self.ordered = await self.ordered.read(event, pipeline, context)
+        self.ordered = self.ordered not in (False, 'no', 'false')
+        if self.concurrency == 1:
+            self.runner = InfiniteRunner(
+                context.pipelines[self.pipeline.name],
+                context,
+                event
+            )
+            await self.runner.setup()
+            return
+        # Each runner runs its own copy of the sub-pipeline
+        source = context.pipelines[self.pipeline.name].to_dict()
+        self.window = 2 * self.concurrency
+        self.idle = asyncio.Queue()
+        for _ in range(self.concurrency):
+            runner = InfiniteRunner(Pipeline.from_dict(source), context, event)
+            await runner.setup()
+            self.idle.put_nowait(runner)
+
+    async def run(self, runner, event) -> list:
+        """Runs an event through a runner, then frees the runner.
+
+        :param runner:  Sub-pipeline runner
+        :param event:   Event to process
+        :returns:       The sub-pipeline results
+        """
+        try:
+            return [next_event async for next_event in runner(event)]
+        finally:
+            self.idle.put_nowait(runner) # type: ignore
+
+    def completed(self):
+        """Yields the results of the completed events.
+        """
+        if self.ordered:
+            while self.pending and self.pending[0].done():
+                yield from self.pending.popleft().result()
+        else:
+            for task in [t for t in self.pending if t.done()]:
+                self.pending.remove(task)
+                yield from task.result()
+
+    async def __call__(self, event, pipeline, context, ending, *args, **kwargs):
+        if self.concurrency == 1:
+            async for next_event in self.runner(event):
+                yield next_event
+            return
+        if event is not None:
+            # Waits for a free runner
+            runner = await self.idle.get() # type: ignore
+            self.pending.append(asyncio.create_task(self.run(runner, event)))
+            # Let the runners run
+            await asyncio.sleep(0)
+        for next_event in self.completed():
             yield next_event
+        # Wait for the pending events while there are too many of them
+        # (or for all of them at the pipeline's end)
+        limit = 0 if ending else self.window - 1
+        while len(self.pending) > limit:
+            if self.ordered:
+                await asyncio.wait((self.pending[0], ))
+            else:
+                await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+            for next_event in self.completed():
+                yield next_event
@@ -1,13 +1,269 @@
 from multiprocessing.queues import Queue
 from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import asyncio
+import multiprocessing
+import os
+import struct
+import time
 
 import m42pl
 from m42pl.commands import StreamingCommand, GeneratingCommand
 
 from typing import Any, Union
 
+
+def attach(name: str) -> SharedMemory:
+    """Attaches to an existing shared memory segment without registering
+    it to the process' resource tracker.
+
+    Only the segment's creator unlinks it: before Python 3.13, attaching
+    also registers the segment, which is then unlinked (or reported as
+    leaked) when the attaching process exits.
+
+    :param name: Segment name
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedRing:
+    """Shared memory ring buffer of length-prefixed frames.
+
+    The buffer starts with a header made of the write and read positions
+    (as ever-increasing offsets) and the reader's process ID, followed
+    by the frames: each frame is
+    its length (4 bytes) followed by its data. Sentinels (a tuple of two
+    integers) are frames with a special length.
+
+    Frames are published and consumed in batches: writers update the
+    write position once per batch, and the reader consumes all the
+    available frames at once; no system call is made unless the buffer
+    is full (writers wait) or empty (the reader waits).
+
+    The ring supports a single reader process (enforced by
+    ``get_many``); several writers must set ``lock`` so their batches
+    are not interleaved.
+
+    :ivar header:   Header structure (write and read positions, reader
+                    process ID)
+    :ivar frame:    Frame header structure (frame length)
+    :ivar sentinel: Sentinel frame length
+    """
+
+    header = struct.Struct('<QQQ')
+    frame = struct.Struct('<I')
+    sentinel = 0xFFFFFFFF
+    sentinel_data = struct.Struct('<II')
+
+    def __init__(self, size: int = 4 * 1024 * 1024, lock: bool = False):
+        """
+        :param size:    Frames buffer size in bytes
+        :param lock:    Serialize writers (required with several writers)
+        """
+        self.size = size
+        self.shm = SharedMemory(create=True, size=self.header.size + size)
+        self.header.pack_into(self.shm.buf, 0, 0, 0, 0)
+        self.lock = lock and multiprocessing.Lock() or None
+        # Creator process ID: forked processes share the ring object
+        self.owner = os.getpid()
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'size': self.size, 'lock': self.lock}
+
+    def __setstate__(self, state):
+        self.size = state['size']
+        self.shm = attach(state['name'])
+        self.lock = state['lock']
+        self.owner = 0
+
+    @staticmethod
+    def wait(delay: float) -> float:
+        """Waits for the other side and returns the next wait delay.
+        """
+        time.sleep(delay)
+        return min(delay * 2 or 0.00005, 0.001)
+
+    def positions(self) -> tuple:
+        """Returns the write and read positions.
+        """
+        return self.header.unpack_from(self.shm.buf, 0)[:2]
+
+    def copy_in(self, position: int, data):
+        """Copies data to the buffer, wrapping at its end.
+        """
+        data = memoryview(data)
+        start = self.header.size
+        offset = position % self.size
+        first = min(len(data), self.size - offset)
+        self.shm.buf[start + offset:start + offset + first] = data[:first]
+        if first < len(data):
+            self.shm.buf[start:start + len(data) - first] = data[first:]
+
+    def copy_out(self, position: int, length: int) -> bytes:
+        """Copies data from the buffer, wrapping at its end.
+        """
+        start = self.header.size
+        offset = position % self.size
+        first = min(length, self.size - offset)
+        data = bytes(self.shm.buf[start + offset:start + offset + first])
+        if first < length:
+            data += bytes(self.shm.buf[start:start + length - first])
+        return data
+
+    def put_many(self, items, locked: bool = True):
+        """Publishes frames.
+
+        :param items:   Frames data (``bytes``) or sentinels
+                        (a tuple of two integers)
+        :param locked:  Serialize with the other writers; a writer
+                        which has been terminated may never release
+                        the lock, so the writers must all be stopped
+                        when ``False``
+        """
+        with locked and self.lock or nullcontext():
+            write, read = self.positions()
+            position, delay = write, 0.0
+            for data in items:
+                if isinstance(data, tuple):
+                    length, data = self.sentinel, self.sentinel_data.pack(*data)
+                else:
+                    length = len(data)
+                needed = self.frame.size + len(data)
+                if needed > self.size:
+                    raise Exception(f'Frame too large for shared ring: {needed} bytes')
+                # Publish what has been written so far and wait for the
+                # reader to free enough space
+                while position + needed - read > self.size:
+                    if position != write:
+                        struct.pack_into('<Q', self.shm.buf, 0, position)
+                        write = position
+                    delay = self.wait(delay)
+                    read = self.positions()[1]
+                self.copy_in(position, self.frame.pack(length))
+                self.copy_in(position + self.frame.size, data)
+                position += needed
+            struct.pack_into('<Q', self.shm.buf, 0, position)
+
+    def put(self, data):
+        """Publishes a single frame.
+        """
+        self.put_many((data, ))
+
+    def get_many(self) -> list:
+        """Waits for and consumes all the available frames.
+
+        The first process to call this method becomes the ring's reader;
+        calls from any other process raise an exception.
+        """
+        reader = self.header.unpack_from(self.shm.buf, 0)[2]
+        if reader != os.getpid():
+            if reader:
+                raise Exception(f'Shared ring is already read by process {reader}')
+            struct.pack_into('<Q', self.shm.buf, 16, os.getpid())
+        write, read = self.positions()
+        delay = 0.0
+        while write == read:
+            delay = self.wait(delay)
+            write = self.positions()[0]
+        items = []
+        position = read
+        while position < write:
+            length, = self.frame.unpack(self.copy_out(position, self.frame.size))
+            position += self.frame.size
+            if length == self.sentinel:
+                items.append(self.sentinel_data.unpack(
+                    self.copy_out(position, self.sentinel_data.size)
+                ))
+                position += self.sentinel_data.size
+            else:
+                items.append(self.copy_out(position, length))
+                position += length
+        struct.pack_into('<Q', self.shm.buf, 8, position)
+        return items
+
+    def close(self):
+        """Releases the shared memory; the ring's creator destroys it.
+        """
+        self.shm.close()
+        if self.owner == os.getpid():
+            self.shm.unlink()
+
+
 # pylint: disable=unsubscriptable-object
-Channel = Union[Connection, Queue]
+Channel = Union[Connection, Queue, SharedRing]
+
+
+# Batch frames are msgpack arrays of `bin` items (the encoded events):
+# (first byte, header structure) for arrays and `bin` items
+array_headers = ((0x90, None), (0xdc, struct.Struct('>H')), (0xdd, struct.Struct('>I')))
+bin_headers = ((0xc4, struct.Struct('>B')), (0xc5, struct.Struct('>H')), (0xc6, struct.Struct('>I')))
+
+
+def pack_batch(frames: list) -> bytes:
+    """Packs encoded events into a single msgpack array frame.
+
+    :param frames: Encoded events
+    """
+    count = len(frames)
+    if count < 16:
+        parts = [bytes((0x90 | count, ))]
+    else:
+        marker, header = array_headers[count < 1 << 16 and 1 or 2]
+        parts = [bytes((marker, )), header.pack(count)] # type: ignore
+    for frame in frames:
+        size = len(frame)
+        marker, header = bin_headers[size < 1 << 8 and 0 or size < 1 << 16 and 1 or 2]
+        parts += [bytes((marker, )), header.pack(size), frame]
+    return b''.join(parts)
+
+
+def unpack_batch(data: bytes) -> list|None:
+    """Unpacks a batch frame into encoded events.
+
+    The encoded events are views on ``data`` (not copies).
+
+    :param data: Received data
+    :returns: The encoded events, or ``None`` if ``data`` is not a
+        batch frame
+    """
+    if not data:
+        return None
+    view = memoryview(data)
+    marker, offset = data[0], 1
+    if 0x90 <= marker <= 0x9f:
+        count = marker & 0x0f
+    else:
+        for array_marker, header in array_headers[1:]:
+            if marker == array_marker:
+                count, = header.unpack_from(data, offset) # type: ignore
+                offset += header.size # type: ignore
+                break
+        else:
+            return None
+    frames = []
+    for _ in range(count):
+        for bin_marker, header in bin_headers:
+            if offset < len(data) and data[offset] == bin_marker:
+                size, = header.unpack_from(data, offset + 1)
+                offset += 1 + header.size
+                break
+        else:
+            return None
+        frames.append(view[offset:offset + size])
+        offset += size
+    return frames
 
 
 class MultiprocBase:
@@ -20,7 +276,8 @@ class MultiprocBase:
 
     def __init__(self, chan: Channel):
         """
-        :param chan: Multiprocessing's Pipe connection or Queue
+        :param chan: Multiprocessing's Pipe connection, Queue or
+            shared memory ring
         :ivar read: Channel read method (receive data)
         :ivar write: Channel write method (send data)
         """
@@ -31,9 +288,23 @@ class MultiprocBase:
         elif isinstance(chan, Queue):
             self.read = self.read_queue
             self.write = self.write_queue
+        elif isinstance(chan, SharedRing):
+            self.read = self.read_ring
+            self.write = self.write_ring
+            self.frames = deque() # type: deque
         else:
             raise Exception(f'Invalid channel type: {type(chan)}')
 
+    def ready(self) -> bool:
+        """Returns ``True`` if data can be read without waiting.
+        """
+        if isinstance(self.chan, Connection):
+            return self.chan.poll()
+        elif isinstance(self.chan, Queue):
+            return not self.chan.empty()
+        write, read = self.chan.positions()
+        return bool(self.frames) or write != read
+
     def read_pipe(self) -> bytes:
         """Receives data from a pipe's connection.
         """
@@ -54,9 +325,33 @@ class MultiprocBase:
         """
         return self.chan.put(data) # type: ignore
 
+    def read_ring(self) -> bytes:
+        """Receives data from a shared memory ring.
+
+        The ring's available frames are consumed at once and returned
+        one by one.
+        """
+        if not self.frames:
+            self.frames.extend(self.chan.get_many()) # type: ignore
+        return self.frames.popleft()
+
+    def write_ring(self, data: Any):
+        """Sends data to a shared memory ring.
+        """
+        return self.chan.put(data) # type: ignore
+
 
 class MultiprocSend(MultiprocBase, StreamingCommand):
     """Encodes and send events to a multiprocessing pipe or queue.
+
+    Events may be sent in batches: up to ``batch`` encoded events are
+    sent as a single msgpack array frame, after at most ``interval``
+    milliseconds (when set). Events are still encoded one by one; only
+    the channel writes are batched.
+
+    When ``interval`` is set, the frames are written by a dedicated
+    thread (in order), so neither a pending batch's timer nor a full
+    channel blocks the event loop.
     """
     
     _aliases_ = ['multiproc-send',]
@@ -74,34 +369,117 @@ class MultiprocSend(MultiprocBase, StreamingCommand):
     #         self
     #     )
     
-    def __init__(self, chan: Channel):
+    def __init__(self, chan: Channel, batch: int = 1, interval: float = 0):
         """
-        :param chan: Multiprocessing's Pipe connection or Queue
+        :param chan: Multiprocessing's Pipe connection, Queue or ring
+        :param batch: Maximum number of events per frame
+        :param interval: Maximum delay before sending a pending batch,
+            in milliseconds; ``0`` waits for a full batch
         """
         super().__init__(chan)
         self.encoder = m42pl.encoder('msgpack')()
+        self.batch = max(1, batch)
+        self.interval = interval
+        self.pending = [] # type: list[bytes]
+        self.timer = None # type: asyncio.TimerHandle|None
+        self.writer = interval and ThreadPoolExecutor(1) or None
+
+    def add(self, event) -> bytes|None:
+        """Encodes an event and returns the next frame to send, if any.
+
+        :param event: Event to send
+        :returns: The encoded event, the full pending batch, or ``None``
+            if the event has been added to the pending batch
+        """
+        data = self.encoder.encode(event)
+        if self.batch == 1:
+            return data
+        self.pending.append(data)
+        if len(self.pending) >= self.batch:
+            return self.take()
+        return None
+
+    def take(self) -> bytes|None:
+        """Returns the pending batch frame, if any, and cancels its timer.
+        """
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return None
+        pending, self.pending = self.pending, []
+        return pack_batch(pending)
+
+    def push(self, event):
+        """Encodes an event and sends it, or adds it to the pending
+        batch (blocking).
+
+        :param event: Event to send
+        """
+        frame = self.add(event)
+        if frame is not None:
+            self.write(frame)
+
+    def flush(self):
+        """Sends the pending batch (blocking).
+        """
+        frame = self.take()
+        if frame is not None:
+            self.write(frame)
+
+    async def send(self, data):
+        """Sends data, from the writer thread if any.
+
+        :param data: Data to send
+        """
+        if self.writer:
+            await asyncio.get_running_loop().run_in_executor(self.writer, self.write, data)
+        else:
+            self.write(data)
+
+    def expire(self):
+        """Sends the pending batch from the writer thread once its
+        ``interval`` has elapsed.
+        """
+        self.timer = None
+        frame = self.take()
+        if frame is not None:
+            self.writer.submit(self.write, frame) # type: ignore
 
     async def target(self, event, pipeline, context):
         try:
             # self.write(event['data'][self.msgpack_field])
-            self.write(
-                self.encoder.encode(event)
-            )
+            frame = self.add(event)
+            if frame is not None:
+                await self.send(frame)
+            elif self.interval and self.pending and self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(
+                    self.interval / 1000,
+                    self.expire
+                )
         except Exception as error:
             self.logger.exception(error)
             pass
         yield event
     
     async def __aexit__(self, *args, **kwargs):
-        """Sends a sentinel event at the pipeline's end.
+        """Sends the pending batch and a sentinel event at the
+        pipeline's end.
         """
+        frame = self.take()
+        if frame is not None:
+            await self.send(frame)
         self.logger.info(f'sending sentinel event')
-        self.write(self.chunk)
+        await self.send(self.chunk)
+        if self.writer:
+            self.writer.shutdown()
 
 
 class MultiprocReceive(MultiprocBase, GeneratingCommand):
     """Receives and decodes events from a multiprocessing pipe.
 
+    Batch frames (see ``MultiprocSend``) are unpacked transparently.
+
     :ivar producers_count: Number of producers sending data
     :ivar producers_closed: Number of closed producers
     """
@@ -123,7 +501,7 @@ class MultiprocReceive(MultiprocBase, GeneratingCommand):
     
     def __init__(self, chan: Channel):
         """
-        :param chan:    Multiprocessing's Pipe connection or Queue
+        :param chan:    Multiprocessing's Pipe connection, Queue or ring
         """
         super().__init__(chan)
         self.encoder = m42pl.encoder('msgpack')()
@@ -155,7 +533,12 @@ class MultiprocReceive(MultiprocBase, GeneratingCommand):
                     #     'meta': {},
                     #     'sign': None
                     # }
-                    yield self.encoder.decode(data)
+                    frames = unpack_batch(data)
+                    if frames is None:
+                        yield self.encoder.decode(data)
+                    else:
+                        for frame in frames:
+                            yield self.encoder.decode(frame)
             except EOFError:
                 self.logger.info(f'Channel has been closed')
                 break
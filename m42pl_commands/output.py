@@ -4,8 +4,10 @@ import m42pl
 from m42pl.fields import Field
 from m42pl.commands import DequeBufferingCommand, MergingCommand
 
+from .batch import Batchable, EventBatch
 
-class Output(DequeBufferingCommand, MergingCommand):
+
+class Output(DequeBufferingCommand, MergingCommand, Batchable):
     """Prints events on the standard output.
 
     :ivar count: Number of received events
@@ -62,6 +64,7 @@ class Output(DequeBufferingCommand, MergingCommand):
             context,
             await self.buffer.read(event, pipeline, context)
         )
+        self.link_batches(pipeline)
         # Prepare formatter
         try:
             self.encoder = m42pl.encoder(self.format)(indent=2)
@@ -78,8 +81,14 @@ class Output(DequeBufferingCommand, MergingCommand):
 
     async def target(self, pipeline):
         async for event in super().target(pipeline):
-            self.printer(event)
-            yield event
+            if isinstance(event, EventBatch):
+                for row in event.events():
+                    self.printer(row)
+                async for next_event in self.emit_batch(event):
+                    yield next_event
+            else:
+                self.printer(event)
+                yield event
 
 
 class NoOut(Output):
@@ -92,6 +101,9 @@ class NoOut(Output):
     def __init__(self, *args, **kwargs):
         super().__init__()
 
+    def batchable(self) -> bool:
+        return False
+
     async def setup(self, *args, **kwargs):
         pass
 
@@ -1,62 +1,530 @@
 from collections import OrderedDict
+from concurrent.futures import CancelledError
+from functools import partial
 from textwrap import dedent
+from threading import Thread
 import asyncio
+import multiprocessing
+import queue
 
 from m42pl.commands import StreamingCommand
 from m42pl.pipeline import InfiniteRunner
 from m42pl.fields import Field
-from m42pl.event import derive
+from m42pl.event import Event, derive
+
+from .multiproc_comm import MultiprocBase, MultiprocSend, MultiprocReceive, SharedRing
+
+
+class Done:
+    """Marks the end of an event's results in a branch.
+
+    :ivar branch: Branch index
+    """
+
+    __slots__ = ('branch', )
+
+    def __init__(self, branch: int):
+        self.branch = branch
+
+
+def marker(branch: int, error: str|None = None) -> Event:
+    """Returns the event sent by a worker process after an event's
+    results (see ``Done``).
+
+    :param branch:  Worker's branch index
+    :param error:   Branch's error, if any
+    """
+    return Event(data={
+        MultiprocBase.msgpack_field: {'done': branch, 'error': error}
+    })
+
+
+def serve(context, name: str, event, inputs, outputs, worker: int,
+            workers: int, batch: int = 1, branch: int = 0):
+    """Runs a branch in a worker process.
+
+    :param context:     Pipelines context
+    :param name:        Branch pipeline name
+    :param event:       Branch initial event
+    :param inputs:      Events queue (from the parent process)
+    :param outputs:     Results queue (to the parent process)
+    :param worker:      Worker index
+    :param workers:     Total number of workers
+    :param batch:       Maximum number of results per frame
+    :param branch:      Worker's branch index
+    """
+    asyncio.run(serve_branch(
+        context, name, event, inputs, outputs, worker, workers, batch, branch
+    ))
+
+
+async def serve_branch(context, name: str, event, inputs, outputs,
+                        worker: int, workers: int, batch: int = 1,
+                        branch: int = 0):
+    """Runs a branch until its input channel is closed.
+
+    Each event's results are followed by a marker event (see
+    ``marker``). Once the input channel is closed, the branch runner is
+    called with ``None`` (i.e. the pipeline's end) so the branch
+    flushes its pending results, which are also followed by a marker. A failing branch reports its error in the markers and
+    keeps consuming its input channel, so the parent process can raise
+    the error and never waits on the worker.
+
+    See ``serve`` for the parameters.
+    """
+    receive = MultiprocReceive(inputs)
+    send = MultiprocSend(outputs, batch)
+    error = None # type: str|None
+    try:
+        runner = InfiniteRunner(context.pipelines[name], context, event)
+        await runner.setup()
+    except Exception as exc:
+        error = f'{exc.__class__.__name__}: {exc}'
+    async def sources():
+        async for source in receive.target(event, None, context):
+            yield source
+        yield None
+    try:
+        async for source in sources():
+            if error is None:
+                try:
+                    async for result in runner(source):
+                        send.push(result)
+                except Exception as exc:
+                    error = f'{exc.__class__.__name__}: {exc}'
+            send.push(marker(branch, error))
+            # Send the pending results before waiting for new events
+            if source is not None and not receive.ready():
+                send.flush()
+    finally:
+        send.flush()
+        send.write((worker, workers))
 
 
 class Parallel(StreamingCommand):
-    """Runs multiple sub-pipelines using `asyncio`.
+    """Runs multiple sub-pipelines using `asyncio` or worker processes.
+
+    Each sub-pipeline (aka. branch) runs in its own long-lived task,
+    fed through an input queue. At most ``depth`` events are in flight
+    per branch: after sending an event, the command yields the branches
+    results while waiting for the branches which have ``depth`` events
+    in flight (backpressure). With ``depth=1`` (default), an event's
+    results are all yield before the next event is accepted; greater
+    depths pipeline the events, and the results of the latest
+    ``depth - 1`` events are then yield with the next events or at the
+    pipeline's end.
+
+    At the pipeline's end, the branches runners are called with
+    ``None`` (as ``foreach`` does) so the branches pipelines flush their
+    pending results (e.g. ``stats``, ``compact``), before they stop.
+
+    The branches results go through bounded queues (so a slow
+    downstream also slows down the branches) and are yield either:
+
+    * ``arrival`` (default): in their completion order
+    * ``roundrobin``: event by event, one branch after the other
+
+    With ``mode=process``, each branch runs in ``workers`` processes
+    instead, which receive the events in turn through the
+    ``multiproc-send`` / ``multiproc-receive`` msgpack channel; the
+    results are merged back in ``arrival`` order, through a
+    multiprocessing queue or, with ``channel=ring``, a shared memory
+    ring (see ``SharedRing``). With ``batch=<n>``, the workers send
+    their results by frames of up to ``<n>`` events. In this mode,
+    ``depth`` events per worker are kept in flight.
+
+    :cvar buffer:   Results queues size
     """
 
     _about_     = 'Run multiple sub-pipelines'
-    _syntax_    = '<pipeline> [, ...]'
+    _syntax_    = (
+        '[mode=<task|process>] [workers=<n>] [channel=<queue|ring>] [batch=<n>] '
+        '<pipeline> [, ...] '
+        '[with [depth=<n>] [order=<arrival|roundrobin>]]'
+    )
     _aliases_   = ['parallel', 'tee', ]
+    buffer      = 1024
     _schema_    = {'properties': {}}
     _grammar_   = OrderedDict(StreamingCommand._grammar_)
     _grammar_['start'] = dedent('''\
-        start : piperef (","? piperef)*
+        start : kwargs? piperef (","? piperef)* ("with" kwargs)?
     ''')
 
     class Transformer(StreamingCommand.Transformer):
         def start(self, items):
-            return (), {'pipelines': items}
+            kwargs = {}
+            for kwargs_list in [i for i in items if isinstance(i, list)]:
+                for kwarg in kwargs_list:
+                    kwargs.update(kwarg)
+            return (), {
+                'pipelines': [i for i in items if not isinstance(i, list)],
+                **kwargs
+            }
 
-    def __init__(self, pipelines: list):
+    def __init__(self, pipelines: list, depth: int = 1,
+                    order: str = 'arrival', mode: str = 'task',
+                    workers: int = 1, channel: str = 'queue',
+                    batch: int = 1):
         """
         :param pipelines:   Pipelines ID
+        :param depth:       Maximum number of events in flight per
+                            branch (per worker in ``process`` mode)
+        :param order:       Results order (``arrival`` or ``roundrobin``)
+        :param mode:        Branches mode (``task`` or ``process``)
+        :param workers:     Number of processes per branch
+                            (``process`` mode only)
+        :param channel:     Results channel (``queue`` or ``ring``)
+                            (``process`` mode only)
+        :param batch:       Maximum number of results per frame
+                            (``process`` mode only)
         """
-        super().__init__(pipelines)
+        super().__init__(pipelines, depth, order, mode, workers, channel, batch)
         self.runners = []
         self.pipelines = Field(pipelines)
+        self.depth = Field(depth, default=1, type=int)
+        self.order = Field(order, default=order)
+        self.mode = Field(mode, default=mode)
+        self.workers = Field(workers, default=1, type=int)
+        self.channel = Field(channel, default=channel)
+        self.batch = Field(batch, default=1, type=int)
+        # Branches tasks, input queues, results queues (a single shared
+        # one in `arrival` order) and events in flight
+        self.tasks = [] # type: list[asyncio.Task]
+        self.inputs = [] # type: list[asyncio.Queue]
+        self.results = [] # type: list[asyncio.Queue]
+        self.in_flight = [] # type: list[int]
+        self.turn = 0
+        self.error = None # type: Exception|None
+        # Branches processes, their input channels, and results reader
+        self.processes = [] # type: list[multiprocessing.Process]
+        self.senders = [] # type: list[list[MultiprocSend]]
+        self.reader = None # type: Thread|None
+        self.outputs = None # type: multiprocessing.Queue|SharedRing|None
+        self.sent = 0
 
     async def setup(self, event, pipeline, context):
-        for piperef in self.pipelines.name:
+        self.depth = max(1, await self.depth.read(event, pipeline, context))
+        self.order = await self.order.read(event, pipeline, context)
+        self.mode = await self.mode.read(event, pipeline, context)
+        self.workers = max(1, await self.workers.read(event, pipeline, context))
+        self.channel = await self.channel.read(event, pipeline, context)
+        self.batch = max(1, await self.batch.read(event, pipeline, context))
+        if self.order not in ('arrival', 'roundrobin'):
+            raise Exception(f'Unknown parallel order: {self.order}')
+        if self.mode == 'process':
+            if self.order != 'arrival':
+                raise Exception(f'Parallel process mode only supports arrival order')
+            if self.channel not in ('queue', 'ring'):
+                raise Exception(f'Unknown parallel channel: {self.channel}')
+            self.start_processes(event, context)
+            return
+        if self.mode != 'task':
+            raise Exception(f'Unknown parallel mode: {self.mode}')
+        for _, source in self.branches(context):
             # Add new pipeline runner
-            self.runners.append(InfiniteRunner(
-                context.pipelines[piperef.name],
-                context,
-                event
-            ))
+            self.runners.append(InfiniteRunner(source, context, event))
             # Setup latest added runner
             await self.runners[-1].setup()
+        # ---
+        # Start the branches
+        # In `arrival` order, all branches share the same results queue
+        self.in_flight = [0] * len(self.runners)
+        for branch, runner in enumerate(self.runners):
+            self.inputs.append(asyncio.Queue(self.depth))
+            if self.order == 'roundrobin' or not self.results:
+                self.results.append(asyncio.Queue(self.buffer))
+            self.tasks.append(asyncio.create_task(self.work(branch, runner)))
 
-    async def target(self, event, pipeline, context):
+    def branches(self, context) -> list:
+        """Returns the branches pipelines as ``(name, pipeline)`` tuples.
 
-        async def drain(runner):
-            """Runs a pipeline 'runner' (...).
-            """
-            async for item in runner(derive(event)):
-                await queue.put(item)
-
-        queue = asyncio.Queue(1)
-        tasks = [
-            asyncio.create_task(drain(runner))
-            for runner
-            in self.runners
+        :param context: Pipelines context
+        """
+        return [
+            (piperef.name, context.pipelines[piperef.name])
+            for piperef
+            in self.pipelines.name
         ]
-        while not all(task.done() for task in tasks):
-            yield await queue.get()
+
+    async def route(self, event, pipeline, context):
+        """Returns the indexes of the branches which receive an event.
+
+        :param event: Event to route
+        """
+        return range(len(self.senders or self.inputs))
+
+    def start_processes(self, event, context):
+        """Starts the branches worker processes and the results reader.
+
+        :param event:   Branches initial event
+        :param context: Pipelines context
+        """
+        names = [name for name, _ in self.branches(context)]
+        # The workers share the results channel
+        if self.channel == 'ring':
+            outputs = self.outputs = SharedRing(lock=True)
+        else:
+            outputs = self.outputs = multiprocessing.Queue()
+        for branch, name in enumerate(names):
+            self.senders.append([])
+            for _ in range(self.workers):
+                inputs = multiprocessing.Queue(self.depth)
+                self.senders[-1].append(MultiprocSend(inputs))
+                self.processes.append(multiprocessing.Process(
+                    target=serve,
+                    args=(
+                        context, name, event, inputs, outputs,
+                        len(self.processes), len(names) * self.workers,
+                        self.batch, branch
+                    ),
+                    daemon=True
+                ))
+        for process in self.processes:
+            process.start()
+        self.in_flight = [0] * len(names)
+        # Results are read in a thread as the channel's reads are blocking
+        self.results.append(asyncio.Queue(self.buffer))
+        self.reader = Thread(
+            target=asyncio.run,
+            args=(self.read_results(
+                MultiprocReceive(outputs),
+                asyncio.get_running_loop()
+            ), ),
+            daemon=True
+        )
+        self.reader.start()
+
+    async def read_results(self, receive: MultiprocReceive, loop):
+        """Reads the worker processes results until they are all closed.
+
+        The results are put in the results queue from the command's
+        event loop, waiting for free space (backpressure).
+
+        :param receive: Results channel
+        :param loop:    Command's event loop
+        """
+        async for event in receive.target(None, None, None):
+            done = event['data'].get(MultiprocBase.msgpack_field)
+            if done is None:
+                item = event
+            else:
+                if done['error'] and not self.error:
+                    self.error = Exception(
+                        f'Branch {done["done"]} failed: {done["error"]}'
+                    )
+                item = Done(done['done'])
+            # Stop reading once the command's event loop is gone
+            put = self.results[0].put(item)
+            try:
+                asyncio.run_coroutine_threadsafe(put, loop).result()
+            except (RuntimeError, CancelledError):
+                put.close()
+                return
+
+    def check(self):
+        """Raises if a worker process has died.
+        """
+        for process in self.processes:
+            if process.exitcode not in (None, 0):
+                raise Exception(
+                    f'Worker process {process.name} died '
+                    f'(exit code {process.exitcode})'
+                )
+
+    async def send(self, branch: int, worker: int, data):
+        """Sends data to a worker process.
+
+        The data is sent from a thread when the worker input channel is
+        full, to not block the event loop, checking the workers in
+        between (a dead worker never consumes its channel).
+
+        :param branch:  Branch index
+        :param worker:  Worker index in the branch
+        :param data:    Data to send
+        """
+        chan = self.senders[branch][worker].chan
+        try:
+            chan.put_nowait(data)
+            return
+        except queue.Full:
+            pass
+        loop = asyncio.get_running_loop()
+        while True:
+            self.check()
+            try:
+                await loop.run_in_executor(None, partial(chan.put, data, timeout=0.1))
+                return
+            except queue.Full:
+                pass
+
+    async def work(self, branch: int, runner):
+        """Runs a branch until it receives ``None``.
+
+        Each event's results are followed by a ``Done`` marker; ``None``
+        is forwarded to the branch runner (i.e. the pipeline's end) and
+        its results are also followed by a marker. A failing branch
+        keeps consuming its input queue so the command never waits on
+        it; its error is raised by ``collect``.
+
+        :param branch:  Branch index
+        :param runner:  Branch pipeline runner
+        """
+        inputs = self.inputs[branch]
+        results = self.results[branch % len(self.results)]
+        while True:
+            event = await inputs.get()
+            if not self.error:
+                try:
+                    async for item in runner(event):
+                        await results.put(item)
+                except Exception as error:
+                    self.error = error
+            await results.put(Done(branch))
+            if event is None:
+                return
+
+    async def collect(self, limit: int):
+        """Yields the available results, and waits for more while a
+        branch has more than ``limit`` events in flight.
+
+        :param limit: Maximum number of events in flight per branch
+        """
+        while True:
+            if self.error:
+                raise self.error
+            results = self.results[self.turn]
+            if results.empty() and max(self.in_flight, default=0) <= limit:
+                return
+            if self.processes:
+                # Dead workers never send their results
+                try:
+                    item = await asyncio.wait_for(results.get(), 1)
+                except asyncio.TimeoutError:
+                    self.check()
+                    continue
+            else:
+                item = await results.get()
+            if isinstance(item, Done):
+                self.in_flight[item.branch] -= 1
+                # In `roundrobin` order, move to the next branch
+                self.turn = (self.turn + 1) % len(self.results)
+            else:
+                yield item
+
+    async def end(self):
+        """Forwards the pipeline's end to the branches: their final
+        results are then collected as an event's results.
+        """
+        if self.mode == 'process':
+            for branch, senders in enumerate(self.senders):
+                for worker in range(len(senders)):
+                    await self.send(branch, worker, (0, 1))
+                    self.in_flight[branch] += 1
+        else:
+            for branch, inputs in enumerate(self.inputs):
+                await inputs.put(None)
+                self.in_flight[branch] += 1
+
+    async def close(self):
+        """Waits for the branches to stop once they have been ended
+        (see ``end``) and their results have been collected.
+        """
+        if self.mode == 'process':
+            loop = asyncio.get_running_loop()
+            while self.reader.is_alive(): # type: ignore
+                await loop.run_in_executor(None, self.reader.join, 0.1) # type: ignore
+                self.check()
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join)
+        else:
+            await asyncio.gather(*self.tasks)
+
+    def close_outputs(self):
+        """Sends a sentinel to the results channel on behalf of each
+        worker process.
+        """
+        workers = len(self.processes)
+        sentinels = [(worker, workers) for worker in range(workers)]
+        if isinstance(self.outputs, SharedRing):
+            self.outputs.put_many(sentinels, locked=False)
+        else:
+            for sentinel in sentinels:
+                self.outputs.put(sentinel) # type: ignore
+
+    async def stop_reader(self):
+        """Stops the results reader once the worker processes are stopped.
+
+        The reader may be waiting for free space in the results queue
+        or for the workers results: a sentinel is sent on behalf of each
+        worker and the results queue is drained until the reader ends.
+        """
+        if self.reader is None or not self.reader.is_alive():
+            return
+        loop = asyncio.get_running_loop()
+        sentinels = loop.run_in_executor(None, self.close_outputs)
+        while self.reader.is_alive():
+            while not self.results[0].empty():
+                self.results[0].get_nowait()
+            await loop.run_in_executor(None, self.reader.join, 0.1)
+        await sentinels
+
+    async def __aexit__(self, *args, **kwargs):
+        """Stops the branches which are still running, i.e. when the
+        pipeline has failed or has been cancelled before its end, and
+        releases the worker processes channels.
+        """
+        # Branches tasks
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        # Worker processes and results reader
+        loop = asyncio.get_running_loop()
+        try:
+            for process in self.processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join)
+            await self.stop_reader()
+        finally:
+            # Stopped workers never consume their pending inputs
+            for senders in self.senders:
+                for sender in senders:
+                    sender.chan.cancel_join_thread()
+                    sender.chan.close()
+            if isinstance(self.outputs, SharedRing):
+                self.outputs.close()
+            self.senders = []
+            self.outputs = None
+
+    async def __call__(self, event, pipeline, context, ending, *args, **kwargs):
+        """Ends the branches and flushes their results at the
+        pipeline's end.
+        """
+        async for next_event in super().__call__(event, pipeline, context, ending, *args, **kwargs):
+            yield next_event
+        if ending:
+            await self.end()
+            async for next_event in self.collect(0):
+                yield next_event
+            await self.close()
+
+    async def target(self, event, pipeline, context):
+        branches = await self.route(event, pipeline, context)
+        if self.mode == 'process':
+            # Encode once, send to the next worker of each branch
+            data = self.senders[0][0].encoder.encode(event)
+            for branch in branches:
+                await self.send(branch, self.sent % self.workers, data)
+                self.in_flight[branch] += 1
+            self.sent += 1
+            limit = self.depth * self.workers - 1
+        else:
+            for branch in branches:
+                await self.inputs[branch].put(derive(event))
+                self.in_flight[branch] += 1
+            limit = self.depth - 1
+        # Yield the results, waiting for the branches which have too
+        # many events in flight
+        async for next_event in self.collect(limit):
+            yield next_event
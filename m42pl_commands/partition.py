@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from textwrap import dedent
+
+from m42pl.commands import StreamingCommand
+from m42pl.pipeline import Pipeline
+from m42pl.fields import Field
+
+from .parallel import Parallel
+from .stats.signatures import hash64
+
+
+class Partition(Parallel):
+    """Runs several instances of a sub-pipeline, keyed by a field.
+
+    Each event is routed to one instance (aka. partition) according to
+    the hash of its key field (stable across processes and runs, see
+    ``hash64``): all the events with the same key are processed by the
+    same instance, so stateful commands (``stats``, ``delta``, ...) stay
+    correct as each instance owns a disjoint keys space.
+
+    The instances run as `asyncio` tasks (``mode=task``, default), each
+    one with its own copy of the sub-pipeline, or in worker processes
+    (``mode=process``). The results are yield in their arrival order.
+    """
+
+    _about_     = 'Run a sub-pipeline instance per events keys partition'
+    _syntax_    = (
+        'by <field> into <n> '
+        '[mode=<task|process>] [depth=<n>] '
+        '<pipeline>'
+    )
+    _aliases_   = ['partition', ]
+    _schema_    = {'properties': {}} # type: ignore
+    _grammar_   = OrderedDict(StreamingCommand._grammar_)
+    _grammar_['start'] = dedent('''\
+        start : "by" field "into" field kwargs? piperef
+    ''')
+
+    class Transformer(StreamingCommand.Transformer):
+        field = str
+
+        def start(self, items):
+            kwargs = {}
+            if len(items) > 3:
+                for kwarg in items[2]:
+                    kwargs.update(kwarg)
+            return (), {
+                'key': items[0],
+                'count': items[1],
+                'pipeline': items[-1],
+                **kwargs
+            }
+
+    def __init__(self, key: str, count: int, pipeline, mode: str = 'task',
+                    depth: int = 1):
+        """
+        :param key:         Partitioning field
+        :param count:       Number of partitions
+        :param pipeline:    Pipeline ID
+        :param mode:        Partitions mode (``task`` or ``process``)
+        :param depth:       Maximum number of events in flight per partition
+        """
+        super().__init__([pipeline, ], depth=depth, order='arrival',
+                            mode=mode, workers=1)
+        self.key = Field(key)
+        self.count = Field(count, default=count, type=int)
+
+    async def setup(self, event, pipeline, context):
+        count = await self.count.read(event, pipeline, context)
+        try:
+            self.count = int(count)
+        except (TypeError, ValueError):
+            self.count = 0
+        if self.count < 1:
+            raise Exception(f'Invalid partitions count: {count}')
+        await super().setup(event, pipeline, context)
+
+    def branches(self, context) -> list:
+        """Returns one copy of the sub-pipeline per partition.
+
+        :param context: Pipelines context
+        """
+        name = self.pipelines.name[0].name
+        source = context.pipelines[name].to_dict()
+        return [
+            (name, Pipeline.from_dict(source))
+            for _
+            in range(self.count)
+        ]
+
+    async def route(self, event, pipeline, context):
+        """Returns the index of the event's partition.
+        """
+        key = await self.key.read(event, pipeline, context)
+        return (hash64(key) % self.count, )
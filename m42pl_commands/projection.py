@@ -0,0 +1,133 @@
+"""Fields projection.
+
+Projection commands (``fields``, ``rename``, ``tags``) compile their
+fields into direct dict-path accessors when the fields are plain paths
+(e.g. ``a`` or ``a.b``), and apply them synchronously instead of
+awaiting a ``Field`` read, write or delete per field.
+
+Runs of adjacent projection commands are also fused: the first command
+of a run applies the operations of the whole run in a single pass, and
+the next ones forward the events they receive as-is.
+"""
+
+from .batch import EventBatch, plain
+
+
+def getter(path: str):
+    """Returns a function which reads a field from an event's data.
+
+    Missing fields are read as ``None``.
+
+    :param path: Field path
+    """
+    keys = path.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda data: data.get(key)
+    def get(data):
+        for key in keys:
+            if not isinstance(data, dict):
+                return None
+            data = data.get(key)
+        return data
+    return get
+
+
+def setter(path: str):
+    """Returns a function which writes a field to an event's data.
+
+    Missing parent fields are created.
+
+    :param path: Field path
+    """
+    *parents, last = path.split('.')
+    def set(data, value):
+        for key in parents:
+            child = data.get(key)
+            if not isinstance(child, dict):
+                child = data[key] = {}
+            data = child
+        data[last] = value
+    return set
+
+
+def deleter(path: str):
+    """Returns a function which deletes a field from an event's data.
+
+    :param path: Field path
+    """
+    *parents, last = path.split('.')
+    def delete(data):
+        for key in parents:
+            data = data.get(key)
+            if not isinstance(data, dict):
+                return
+        data.pop(last, None)
+    return delete
+
+
+def plains(*names) -> bool:
+    """Returns ``True`` if all the given fields names are plain paths.
+    """
+    return all(plain(name) for name in names)
+
+
+class Projection:
+    """Projection commands.
+
+    Implementations set ``projection`` to their compiled operation (a
+    function which takes and returns an event), or to ``None`` if their
+    fields are not plain paths.
+
+    :ivar projection:   Compiled operation
+    :ivar fused:        ``True`` if the command is applied by a previous
+                        command
+    :ivar after:        Operations of the following fused commands
+    """
+
+    projection = None
+    fused = False
+    after = [] # type: list
+
+    def fuse(self, pipeline):
+        """Fuses the run of adjacent projection commands which starts
+        with this command.
+
+        :param pipeline: Current pipeline
+        """
+        if self.fused or self.projection is None:
+            return
+        commands = list(getattr(pipeline, 'commands', []))
+        run = [self, ]
+        for index, command in enumerate(commands):
+            if command is self:
+                for following in commands[index + 1:]:
+                    if not (isinstance(following, Projection)
+                            and following.projection is not None):
+                        break
+                    run.append(following)
+                break
+        for position, command in enumerate(run):
+            command.after = [c.projection for c in run[position + 1:]]
+            command.fused = position > 0
+
+    def project(self, event, operations: list):
+        """Applies operations to an event.
+
+        :param event:       Event to update
+        :param operations:  Operations to apply
+        """
+        for operation in operations:
+            event = operation(event)
+        return event
+
+    async def emit_projected(self, batch: EventBatch):
+        """Yields a batch, or its rows updated with the following fused
+        commands operations.
+
+        :param batch: Batch to yield
+        """
+        async for event in self.emit_batch(batch): # type: ignore
+            if not isinstance(event, EventBatch):
+                event = self.project(event, self.after)
+            yield event
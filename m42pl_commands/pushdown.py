@@ -0,0 +1,112 @@
+"""Predicates pushdown.
+
+Filtering commands (e.g. ``where``) may push simple predicates down to
+the generating command which precedes them, so that the records which
+would be rejected anyway are discarded before an event is built.
+
+Pushed predicates are only a pre-filter: the filtering command still
+evaluates its whole expression.
+"""
+
+import ast
+
+
+# Pushable operators and their tests, as `{operator: test(value, const)}`
+operators = {
+    '==':           lambda value, const: value == const,
+    'in':           lambda value, const: const in value,
+    'startswith':   lambda value, const: value.startswith(const),
+}
+
+
+def path(node) -> str|None:
+    """Returns the field path of a name or attribute chain node.
+
+    :param node: AST node
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = path(node.value)
+        return parent and f'{parent}.{node.attr}' or None
+    return None
+
+
+def predicate(node) -> tuple|None:
+    """Returns the predicate of a simple test node, or ``None``.
+
+    Supported tests are ``<field> == '<string>'``,
+    ``'<string>' in <field>`` and ``<field>.startswith('<string>')``.
+
+    :param node: AST node
+    """
+    def const(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        return None
+    # Comparisons
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left, right = node.left, node.comparators[0]
+        if isinstance(node.ops[0], ast.Eq):
+            if path(left) and const(right) is not None:
+                return (path(left), '==', const(right))
+            if path(right) and const(left) is not None:
+                return (path(right), '==', const(left))
+        if isinstance(node.ops[0], ast.In):
+            if path(right) and const(left) is not None:
+                return (path(right), 'in', const(left))
+    # Methods calls
+    if (isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == 'startswith'
+            and path(node.func.value)
+            and len(node.args) == 1 and not node.keywords
+            and const(node.args[0]) is not None):
+        return (path(node.func.value), 'startswith', const(node.args[0]))
+    return None
+
+
+def predicates(expression: str) -> list:
+    """Returns the pushable predicates of a filter expression.
+
+    Each term of the expression's top-level ``and`` must hold for an
+    event to pass the filter: the simple ones are returned as
+    ``(field path, operator, string)`` tuples.
+
+    :param expression: Filter expression
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return []
+    terms = [tree.body]
+    if isinstance(tree.body, ast.BoolOp) and isinstance(tree.body.op, ast.And):
+        terms = tree.body.values
+    return [p for p in map(predicate, terms) if p is not None]
+
+
+def matcher(operator: str, const: str):
+    """Returns a function which tests a value against a predicate.
+
+    :param operator:    Predicate operator
+    :param const:       Predicate constant
+    """
+    test = operators[operator]
+    return lambda value: test(value, const)
+
+
+class Pushdown:
+    """Generating commands which accept pushed-down predicates.
+
+    Implementations keep the predicates they can test before building
+    their events, and ignore the others.
+    """
+
+    def pushdown(self, predicates: list) -> list:
+        """Receives predicates from the next (filtering) command.
+
+        :param predicates: Predicates as
+            ``(field path, operator, string)`` tuples
+        :returns: The accepted predicates
+        """
+        return []
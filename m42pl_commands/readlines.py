@@ -1,17 +1,29 @@
+import re
+
 from m42pl.commands import GeneratingCommand
 from m42pl.event import Event, derive
 from m42pl.fields import Field
 
+from .pushdown import Pushdown, matcher
+
 
-class ReadLines(GeneratingCommand):
+class ReadLines(GeneratingCommand, Pushdown):
     """Reads a text file line by line.
 
+    Lines may be pre-filtered with ``contains`` (substring) and
+    ``regex``, or with the predicates pushed down by a following
+    ``where`` on the line's text; filtered lines are skipped before an
+    event is built.
+
     To read a whole text file at once, see ``ReadFile``.
     """
 
     _about_     = 'Read a file line by line'
     _aliases_   = ['readlines', 'readline']
-    _syntax_    = '[path=]{file path} [field=]{dest field}'
+    _syntax_    = (
+        '[path=]{file path} [field=]{dest field} '
+        '[contains=<string>] [regex=<pattern>]'
+    )
     _schema_    = {
         'properties': {
             '{dest field}': {
@@ -23,29 +35,55 @@ class ReadLines(GeneratingCommand):
             }
         }
     }
-    
-    def __init__(self, path: str, field: str = 'line'):
+
+    def __init__(self, path: str, field: str = 'line', contains: str = None,
+                    regex: str = None):
         """
-        :param path: Source file path
-        :param dest: Destination field
+        :param path:        Source file path
+        :param dest:        Destination field
+        :param contains:    Keep only the lines which contains this string
+        :param regex:       Keep only the lines which matches this regex
         """
-        super().__init__(path, field)
+        super().__init__(path, field, contains, regex)
         self.path = Field(path)
         self.field = Field(field, default='line')
+        self.contains = Field(contains, default=None)
+        self.regex = Field(regex, default=None)
+        # Lines filters
+        self.filters = []
+
+    def pushdown(self, predicates: list) -> list:
+        accepted = [
+            (path, operator, const)
+            for path, operator, const
+            in predicates
+            if path == f'{self.field.name}.text'
+        ]
+        # Rebuild the filters: predicates may be pushed more than once
+        self.filters = [matcher(op, const) for _, op, const in accepted]
+        return accepted
 
     async def target(self, event, pipeline, context):
+        filters = list(self.filters)
+        contains = await self.contains.read(event, pipeline, context)
+        if contains:
+            filters.append(matcher('in', contains))
+        regex = await self.regex.read(event, pipeline, context)
+        if regex:
+            filters.append(re.compile(regex).search)
         try:
             with open(await self.path.read(event, pipeline, context), 'r') as fd:
                 line = 0
                 for chunk in fd.readlines():
                     for text in chunk.splitlines():
-                        yield await self.field.write(
-                            derive(event),
-                            {
-                                'text': text,
-                                'line': line
-                            }
-                        )
+                        if all(test(text) for test in filters):
+                            yield await self.field.write(
+                                derive(event),
+                                {
+                                    'text': text,
+                                    'line': line
+                                }
+                            )
                         line += 1
         except Exception:
             yield event
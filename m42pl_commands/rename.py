@@ -1,11 +1,15 @@
 from collections import OrderedDict
+from itertools import chain
 from textwrap import dedent
 
 from m42pl.commands import StreamingCommand
 from m42pl.fields import Field
 
+from .batch import Batchable, EventBatch, missing, plain
+from .projection import Projection, getter, setter, deleter, plains
 
-class Rename(StreamingCommand):
+
+class Rename(StreamingCommand, Batchable, Projection):
     _about_     = 'Rename fields'
     _syntax_    = '<existing_field> [as] <new_field> [, ...]'
     _aliases_   = ['rename',]
@@ -35,8 +39,71 @@ class Rename(StreamingCommand):
             for old, new
             in fields
         ]
+        # Compiled projection (plain fields paths only)
+        if plains(*chain(*fields)):
+            self.projection = self.compile(fields)
+
+    @staticmethod
+    def compile(fields: list):
+        """Returns the compiled renaming of plain fields paths.
+
+        :param fields: Fields renaming tuples
+        """
+        accessors = [
+            (getter(old), setter(new), deleter(old))
+            for old, new
+            in fields
+        ]
+        def rename(event):
+            for get, set, delete in accessors:
+                value = get(event['data'])
+                set(event['data'], value)
+                delete(event['data'])
+            return event
+        return rename
+
+    def batchable(self) -> bool:
+        return all(
+            plain(old.name, nested=False) and plain(new.name, nested=False)
+            for old, new
+            in self.fields
+        )
+
+    async def setup(self, event, pipeline, context):
+        self.link_batches(pipeline)
+        self.fuse(pipeline)
+
+    def rename_batch(self, batch: EventBatch) -> EventBatch:
+        """Renames a batch's columns.
+
+        Rows in which the source field is missing are left untouched.
+        """
+        for old, new in self.fields:
+            column = batch.columns.pop(old.name, None)
+            if column is None:
+                continue
+            target = batch.columns.get(new.name)
+            if target is None or missing not in column:
+                batch.columns[new.name] = column
+            else:
+                batch.columns[new.name] = [
+                    previous if value is missing else value
+                    for value, previous
+                    in zip(column, target)
+                ]
+        return batch
 
     async def target(self, event, pipeline, context):
+        if isinstance(event, EventBatch):
+            async for next_event in self.emit_projected(self.rename_batch(event)):
+                yield next_event
+            return
+        if self.fused:
+            yield event
+            return
+        if self.projection:
+            yield self.project(event, [self.projection, *self.after])
+            return
         for old, new in self.fields:
             # TODO: Add a `pop()` method to the field API.
             # This will become:
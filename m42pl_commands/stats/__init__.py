@@ -1,26 +1,47 @@
 from re import L
 from textwrap import dedent
-from itertools import chain
+from itertools import chain, repeat, islice, groupby
 from collections import OrderedDict
+from operator import itemgetter
+from time import monotonic, time
+from datetime import datetime
+from math import floor
+import heapq
+import os
+import pickle
+import re
+import shutil
+import tempfile
 
-from hashlib import blake2b
-# import xxhash
-
-from tabulate import tabulate
 import curses
 
+# NumPy is optional: stats micro-batches are vectorized only when it is
+# available, and are processed event by event otherwise
+try:
+    import numpy as np
+except ImportError:
+    np = None # type: ignore
+
 from typing import Any
 
 from m42pl.commands import StreamingCommand, MergingCommand, BufferingCommand, DequeBufferingCommand
 from m42pl.fields import Field, FieldsMap
 from m42pl.event import Event, signature
 
+from ..batch import Batchable, EventBatch, plain
+from ..compact import Compact
+
 # Stats functors
 # Each stats functions (aka. functors) is defined in its own module.
 # The module 'functions' (imported here as 'stats_functions') holds a
 # a dict named 'names' which map a stats function name with its class.
 from . import functions as stats_functions
 
+# Group signatures strategies
+# The module 'signatures' holds a dict named 'names' which map a
+# signature strategy name with its function.
+from . import signatures
+
 
 class PreStatsMerge(StreamingCommand, MergingCommand):
     """Force-merges the pipeline before running ``StreamStats``.
@@ -32,7 +53,7 @@ class PreStatsMerge(StreamingCommand, MergingCommand):
     _schema_    = {'properties': {}} # type: ignore
 
 
-class StreamStats(StreamingCommand):
+class StreamStats(StreamingCommand, Batchable):
     """Aggregates events over functions results by fields values.
 
     ``StreamStats`` performs a *streaming aggregation* on the incoming
@@ -45,6 +66,40 @@ class StreamStats(StreamingCommand):
     receive an event with the same signature as a previous one, we
     should update our calculation to take this new event value into
     account.
+
+    The partial results may be throttled with the ``emit`` option:
+
+    * ``event`` (default): yields a new result for each event
+    * ``every:<n>``: yields the updated groups every ``n`` events
+    * ``interval:<seconds>``: yields the updated groups at most every
+      ``seconds`` seconds
+    * ``final``: yields the groups only at the pipeline's end
+
+    In all modes but ``event``, only the latest result of each updated
+    group is yield, and the pending results are flushed at the
+    pipeline's end. The functors values are computed only when a group
+    is yield. The ``interval`` mode is checked when events are received:
+    an idle stream flushes its pending groups with its next event or at
+    the pipeline's end.
+    When the pipeline runs in several chunks, the ``event`` mode falls
+    back to ``final``: the functors partial states are then shipped to
+    ``PostStatsMerge`` only with the flushed groups.
+
+    The number of groups kept in memory may be bounded with the
+    ``spill`` option: when it is exceeded, the least recently updated
+    groups are spilled to a sorted run file, as functors partial
+    states. A spilled group which receives new events restarts from
+    empty slots, its partial results covering only the events received
+    since it was spilled; at the pipeline's end, the run files are
+    merged back with the in-memory groups and the exact result of each
+    spilled group is yield. The ``spill`` budget is a number of groups,
+    not a memory size: a group's size depends on its functors (e.g.
+    ``values`` and ``list`` keep up to ``max`` values per group). The
+    run files are removed once merged, or if the spill, the merge or
+    the pipeline fails.
+
+    Columnar batches (see ``EventBatch``) are aggregated as a whole,
+    as done by ``BatchStreamStats`` for its micro-batches.
     """
 
     _about_     = 'Performs statistical operations on an events stream'
@@ -59,9 +114,19 @@ class StreamStats(StreamingCommand):
     def __init__(self, functions: list, fields: list, **kwargs):
         """
         :param functions: Aggregation functions list
-            e.g. `[('function_name', 'source_field', 'dest_field')]`
+            e.g. `[('function_name', 'source_field', 'dest_field', ['param', ...])]`
         :param fields: Aggregation fields list
         :kwargs merge: ``True`` when merging stats results
+        :kwargs signature: Group signature strategy (``tuple`` or
+            ``hash``); Defaults to ``hash`` when merging stats results
+            and to ``tuple`` otherwise
+        :kwargs emit: Partial results emit mode (``event``, ``final``,
+            ``every:<n>`` or ``interval:<seconds>``); Defaults to
+            ``event``
+        :kwargs spill: Maximum number of groups kept in memory; Defaults
+            to ``0`` (no limit)
+        :kwargs spilldir: Spilled groups directory; Defaults to the
+            system's temporary directory
         """
         super().__init__(functions, fields)
         # ---
@@ -71,89 +136,765 @@ class StreamStats(StreamingCommand):
             for f
             in fields
         ]
+        # Windowed stats are aggregated by window first
+        if kwargs.get('span'):
+            self.aggr_fields = [
+                Field('window.start'),
+                Field('window.end'),
+                *self.aggr_fields
+            ]
+        # ---
+        # Group signature strategy
+        # Only the merge boundary has to pay for a process-stable hash
+        self.signature = Field(
+            kwargs.get('signature'),
+            default=kwargs.get('signature') or (
+                kwargs.get('merge', False) and 'hash' or 'tuple'
+            )
+        )
+        # ---
+        # Partial results emit mode
+        self.emit = Field(
+            kwargs.get('emit'),
+            default=kwargs.get('emit') or 'event'
+        )
+        # Pending groups (group key -> aggregation fields values),
+        # received events count and latest emit time
+        self.pending = {} # type: dict[tuple, list]
+        self.received = 0
+        self.emitted = monotonic()
+        # ---
+        # Groups spilling
+        self.spill = Field(
+            kwargs.get('spill'),
+            default=kwargs.get('spill') or 0,
+            type=int
+        )
+        self.spilldir = Field(
+            kwargs.get('spilldir'),
+            default=kwargs.get('spilldir')
+        )
+        # Spilled groups run files and their directory
+        self.runs = [] # type: list[str]
+        self.rundir = None # type: str|None
         # ---
         # Aggreation results
-        self.aggregates = {} # type: dict
+        # Flat table which maps a group key (the tuple of aggregation
+        # fields values) with the functors slots (one per functor).
+        self.aggregates = {} # type: dict[tuple, list]
         # ---
         # Stated fields map (aka. functions calling map)
         self.stated_fields = {}
+        # Functors source fields, read once per event
+        self.source_fields = {} # type: dict[str, Field]
         for function in functions:
-            # Extract and format function name, source field and destination field names
-            function_name, source_field, dest_field, *_ = chain(function, [None] * 3)
+            # Extract and format function name, source field, destination field names and parameters
+            function_name, source_field, dest_field, params, *_ = chain(function, [None] * 4)
+            params = params or []
             source_field = Field(source_field)
-            dest_field = dest_field and Field(dest_field) or Field(f'{function_name}({source_field.name or ""})')
-            # Post stats use dest_field as source
-            if kwargs.get('merge', False):
-                source_field = dest_field
+            dest_field = dest_field and Field(dest_field) or Field(f'{function_name}({", ".join([source_field.name or "", *params])})')
             # Add destination field and function call
             if function_name in stats_functions.names:
-                self.stated_fields[dest_field] = stats_functions.names[function_name](source_field, self.aggr_fields, dest_field, self.aggregates)
+                self.stated_fields[dest_field] = stats_functions.names[function_name](source_field, self.aggr_fields, dest_field, self.aggregates, params)
             else:
                 raise Exception(f'Unknown stats function: {function_name}')
+            if source_field.name and source_field.name not in self.source_fields:
+                self.source_fields[source_field.name] = source_field
+        # ---
+        # Functors calling list, as (slot index, destination field,
+        # functor, source field name)
+        self.functors = [
+            (slot, field, function, function.source_field.name)
+            for slot, (field, function)
+            in enumerate(self.stated_fields.items())
+        ]
+
+    async def setup(self, event, pipeline, context):
+        strategy = await self.signature.read(event, pipeline, context)
+        if strategy not in signatures.names:
+            raise Exception(f'Unknown stats signature: {strategy}')
+        self.signature = signatures.names[strategy]
+        # ---
+        # Partial states are attached to the stated events only when
+        # there is several chunks to merge
+        self.partials = getattr(self, '_chunks', 1) > 1
+        # ---
+        # Parse emit mode
+        emit = str(await self.emit.read(event, pipeline, context))
+        self.emit_mode, _, param = emit.partition(':')
+        try:
+            if self.emit_mode == 'every':
+                self.emit_every = int(param)
+            elif self.emit_mode == 'interval':
+                self.emit_interval = float(param)
+            elif self.emit_mode not in ('event', 'final'):
+                raise ValueError(self.emit_mode)
+        except ValueError:
+            raise Exception(f'Invalid stats emit mode: {emit}')
+        # The partial states are shipped only when the groups are
+        # flushed: shipping them with every event would copy the whole
+        # slots (e.g. the distinct values sets) on each update
+        if self.partials and self.emit_mode == 'event':
+            self.emit_mode = 'final'
+        # ---
+        # Groups spilling
+        self.spill_groups = await self.spill.read(event, pipeline, context)
+        self.spill_dir = await self.spilldir.read(event, pipeline, context)
+        if self.spill_groups and self.spill_groups < 2:
+            raise Exception(f'Invalid stats spill size: {self.spill_groups}')
+
+    async def __call__(self, event, pipeline, context, ending, *args, **kwargs):
+        """Flushes the pending and spilled groups results at the
+        pipeline's end.
+        """
+        async for next_event in super().__call__(event, pipeline, context, ending, *args, **kwargs):
+            yield next_event
+        if ending:
+            async for next_event in self.unspill():
+                yield next_event
+            async for next_event in self.flush():
+                yield next_event
 
-    # async def setup(self, event, pipeline, context):
-    #     await super().setup(event, pipeline, context)
+    def batchable(self) -> bool:
+        return all(
+            plain(field.name)
+            for field
+            in chain(self.aggr_fields, self.source_fields.values())
+        )
 
     async def target(self, event, pipeline, context, *args, **kwargs):
+        if isinstance(event, EventBatch):
+            async for stated_event in self.target_batch(event):
+                yield stated_event
+            return
         # ---
-        # Create new event which will holds the aggregated values
-        stated_event = Event(meta={
-            'stats': {}
-        })
+        # Read aggregation fields values and build group key
+        by = [
+            await field.read(event, pipeline, context)
+            for field
+            in self.aggr_fields
+        ]
+        key = self.group_key(by)
+        # ---
+        # Read the functors source fields once
+        values = {
+            name: await field.read(event, pipeline, context)
+            for name, field
+            in self.source_fields.items()
+        }
         # ---
-        # Prepare event signature
-        signature = blake2b()
-        # signature = xxhash.xxh64()
+        # Update the group's slots
+        slots = self.group_slots(key)
+        for slot, _, function, source in self.functors:
+            slots[slot] = function(slots[slot], values.get(source))
         # ---
-        # Read aggregation fields values and update signature
-        for field in self.aggr_fields:
-            # Read aggregation field value
-            value = await field.read(event, pipeline, context)
-            # Update signature
-            signature.update(str(value).encode())
-            # Write aggregation field value to new event
-            await field.write(stated_event, value)
+        # Done
+        if self.emit_mode == 'event':
+            stated_event = await self.stated(by, key)
+            event['sign'] = stated_event['sign']
+            yield stated_event
+        else:
+            self.pending[key] = by
+            async for stated_event in self.throttle(1):
+                yield stated_event
+        if self.spill_groups and len(self.aggregates) > self.spill_groups:
+            self.spill_cold()
+
+    async def throttle(self, count: int):
+        """Yields the pending groups results if the emit mode is due.
+
+        :param count: Number of events received since the last call
+        """
+        self.received += count
+        if ((self.emit_mode == 'every' and self.received >= self.emit_every)
+                or (self.emit_mode == 'interval'
+                    and monotonic() - self.emitted >= self.emit_interval)):
+            async for stated_event in self.flush():
+                yield stated_event
+
+    async def flush(self):
+        """Yields and clears the pending groups results.
+        """
+        pending, self.pending = self.pending, {}
+        self.received = 0
+        self.emitted = monotonic()
+        for key, by in pending.items():
+            yield await self.stated(by, key)
+
+    async def target_batch(self, batch: EventBatch):
+        """Aggregates a columnar batch.
+
+        :param batch: Batch to aggregate
+        """
+        if not len(batch):
+            return
+        # ---
+        # Build a group code per row from the aggregation columns
+        groups = {} # type: dict[tuple, int]
+        bys = []
+        codes = []
+        by_columns = [batch.column(field.name, None) for field in self.aggr_fields]
+        for by in (by_columns and zip(*by_columns) or repeat((), len(batch))):
+            key = self.group_key(by)
+            if key not in groups:
+                groups[key] = len(groups)
+                bys.append(list(by))
+            codes.append(groups[key])
+        columns = {
+            name: batch.column(name, None)
+            for name
+            in self.source_fields
+        }
+        async for stated_event in self.aggregate(groups, bys, codes, columns):
+            yield stated_event
+
+    async def aggregate(self, groups: dict, bys: list, codes: list,
+                            columns: dict):
+        """Updates the groups slots from columns and yields the stated
+        events.
+
+        Vectorized functors (see ``StatsFunction.batch``) run as NumPy
+        grouped reductions when the source column is numeric; other
+        functors fallback to the per-event path.
+
+        :param groups:  Group code, by group key
+        :param bys:     Aggregation fields values, by group code
+        :param codes:   Group code, by row
+        :param columns: Functors source fields values, by field name
+        """
         # ---
-        # Update source event and new event signatures
-        # event['sign'] = signature.hexdigest()
-        # stated_event['sign'] = signature.hexdigest()
-        event['sign'] = stated_event['sign'] = signature.hexdigest()
+        # Convert numeric columns to arrays
+        arrays = {}
+        if np is not None:
+            codes_array = np.asarray(codes)
+            for name, column in columns.items():
+                array = np.asarray(column)
+                if array.dtype.kind in 'iuf':
+                    arrays[name] = array
         # ---
-        # Compute and add the stated fields to the new event
-        for field, function in self.stated_fields.items():
-            await field.write(stated_event, await function(event, pipeline, context))
+        # Update the groups slots, functor by functor
+        keys = list(groups)
+        slots = [self.group_slots(key) for key in keys]
+        for slot, _, function, source in self.functors:
+            # Vectorized path
+            if (np is not None and function.vectorized
+                    and (not function.numeric or source in arrays)):
+                updates = function.batch(
+                    [group[slot] for group in slots],
+                    codes_array,
+                    arrays.get(source),
+                    len(keys)
+                )
+                for code, dataset in enumerate(updates):
+                    slots[code][slot] = dataset
+            # Per-event path
+            else:
+                for code, value in zip(codes, columns.get(source, repeat(None))):
+                    slots[code][slot] = function(slots[code][slot], value)
         # ---
         # Done
-        yield stated_event
+        if self.emit_mode == 'event':
+            for by, key in zip(bys, keys):
+                yield await self.stated(by, key)
+        else:
+            for by, key in zip(bys, keys):
+                self.pending[key] = by
+            async for stated_event in self.throttle(len(codes)):
+                yield stated_event
+        if self.spill_groups and len(self.aggregates) > self.spill_groups:
+            self.spill_cold()
+
+    def group_slots(self, key: tuple) -> list:
+        """Returns the functors slots of a group, creating them if needed.
+
+        :param key: Group key
+        """
+        # When spilling is enabled, the groups are kept ordered from
+        # the least to the most recently updated
+        if self.spill_groups:
+            slots = self.aggregates.pop(key, None)
+            if slots is None:
+                slots = [None] * len(self.functors)
+            self.aggregates[key] = slots
+            return slots
+        slots = self.aggregates.get(key)
+        if slots is None:
+            slots = self.aggregates[key] = [None] * len(self.functors)
+        return slots
+
+    def spill_cold(self):
+        """Spills the least recently updated groups to a new run file.
+
+        Half of the in-memory groups are spilled at once, as records
+        ``(sort key, group key, functors partial states)`` sorted by
+        sort key. A spilled group's pending result is dropped: its exact
+        result is yield by ``unspill`` at the pipeline's end.
+        """
+        count = len(self.aggregates) - self.spill_groups // 2
+        records = []
+        for key in list(islice(self.aggregates, count)):
+            records.append((
+                repr(key),
+                key,
+                self.states_of(self.aggregates.pop(key))
+            ))
+            self.pending.pop(key, None)
+        records.sort(key=itemgetter(0))
+        if self.rundir is None:
+            self.rundir = tempfile.mkdtemp(
+                prefix='m42pl-stats-',
+                dir=self.spill_dir
+            )
+        path = os.path.join(self.rundir, f'run-{len(self.runs):06d}')
+        try:
+            with open(path, 'wb') as run:
+                for record in records:
+                    pickle.dump(record, run, pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            # The spilled groups are lost: the results would be wrong
+            self.drop_runs()
+            raise
+        self.runs.append(path)
+        self.logger.info(f'spilled {len(records)} groups to {path}')
+
+    async def unspill(self):
+        """Merges the spilled groups back and yields their results.
+
+        The run files are merged by sort key; the partial states of
+        each spilled group are merged with the ones of its in-memory
+        slots, if any.
+        """
+        if not self.runs:
+            return
+        runs = [self.read_run(path) for path in self.runs]
+        try:
+            merged = heapq.merge(*runs, key=itemgetter(0))
+            for _, records in groupby(merged, key=itemgetter(0)):
+                partials = []
+                for _, key, states in records:
+                    partials.append(states)
+                slots = self.aggregates.pop(key, None)
+                if slots is not None:
+                    partials.append(self.states_of(slots))
+                self.pending.pop(key, None)
+                states = self.merge_states(partials)
+                yield await self.stated(list(key), key, self.results_of(states), states)
+        finally:
+            for run in runs:
+                run.close()
+            self.drop_runs()
+
+    def drop_runs(self):
+        """Removes the spilled groups run files.
+        """
+        if self.rundir is not None:
+            shutil.rmtree(self.rundir, ignore_errors=True)
+        self.runs, self.rundir = [], None
+
+    async def __aexit__(self, *args, **kwargs):
+        self.drop_runs()
+
+    @staticmethod
+    def read_run(path: str):
+        """Yields the records of a spilled groups run file.
+
+        :param path: Run file path
+        """
+        with open(path, 'rb') as run:
+            while True:
+                try:
+                    yield pickle.load(run)
+                except EOFError:
+                    return
+
+    async def stated(self, by: list, key: tuple, results: list = None,
+                        states: list = None) -> Event:
+        """Returns a new event which holds a group's aggregated values.
+
+        :param by:      Aggregation fields values
+        :param key:     Group key
+        :param results: Functors results, by slot; Defaults to the
+                        values of the group's slots
+        :param states:  Functors partial states, by slot; Defaults to
+                        the partial states of the group's slots
+        """
+        if results is None:
+            slots = self.aggregates[key]
+            results = [
+                function.value(slots[slot])
+                for slot, _, function, _
+                in self.functors
+            ]
+        stated_event = Event(meta={
+            'stats': {}
+        })
+        # Write aggregation fields values
+        for field, value in zip(self.aggr_fields, by):
+            await field.write(stated_event, value)
+        # Write stated fields values
+        for slot, field, function, _ in self.functors:
+            await field.write(stated_event, results[slot])
+        # Attach the functors partial states (see ``PostStatsMerge``)
+        if self.partials:
+            stated_event['meta']['stats'] = {
+                'chunk': self._chunk,
+                'chunks': self._chunks,
+                'states': states or self.states_of(self.aggregates[key])
+            }
+        stated_event['sign'] = self.signature(key)
+        return stated_event
+
+    def states_of(self, slots: list) -> list:
+        """Returns the functors partial states of a group's slots.
+
+        :param slots: Group's slots
+        """
+        return [
+            function.state(slots[slot])
+            for slot, _, function, _
+            in self.functors
+        ]
+
+    def merge_states(self, partials: list) -> list:
+        """Merges several functors partial states lists, slot by slot.
+
+        :param partials: Functors partial states lists
+        """
+        merged = [None] * len(self.functors)
+        for slot, _, function, _ in self.functors:
+            for states in partials:
+                if merged[slot] is None:
+                    merged[slot] = states[slot]
+                elif states[slot] is not None:
+                    merged[slot] = function.merge(merged[slot], states[slot])
+        return merged
+
+    def results_of(self, states: list) -> list:
+        """Returns the functors results from their partial states.
+
+        :param states: Functors partial states, by slot
+        """
+        return [
+            function.result(states[slot]) if states[slot] is not None else None
+            for slot, _, function, _
+            in self.functors
+        ]
+
+    @staticmethod
+    def group_key(values: list) -> tuple:
+        """Returns a hashable group key from aggregation fields values.
+
+        Unhashable values (lists, dicts, ...) are replaced by their
+        string representation.
+
+        :param values: Aggregation fields values
+        """
+        try:
+            key = tuple(values)
+            hash(key)
+            return key
+        except TypeError:
+            return tuple(
+                isinstance(v, (list, dict, set)) and str(v) or v
+                for v
+                in values
+            )
+
+
+class BatchStreamStats(StreamStats, DequeBufferingCommand):
+    """Aggregates micro-batches of events.
 
+    ``BatchStreamStats`` buffers the incoming events and aggregates
+    them as a whole: the group keys and functors source fields are
+    read into columns, then each functor updates all the batch groups
+    at once. Vectorized functors (see ``StatsFunction.batch``) run as
+    NumPy grouped reductions when the source column is numeric; other
+    functors fallback to the per-event path.
 
-class PostStatsBuffer(DequeBufferingCommand):
-    """Buffers events yields by ``StreamStats``.
+    Only one event per group and per micro-batch is yield.
     """
 
-    _about_     = 'Buffers StreamStats events'
-    _syntax_    = '[[size=]<buffer size>] [[showchunk=]<yes|no>]'
-    _aliases_   = ['_post_stats_buffer', ]
-    _schema_    = {'properties': {}}
+    _about_     = 'Performs statistical operations on events micro-batches'
+    _syntax_    = StreamStats._syntax_
+    _aliases_   = ['_batch_stream_stats',]
+    _schema_    = StreamStats._schema_
 
     def __init__(self, *args, **kwargs):
-        super().__init__()
+        """
+        :kwargs batch: Micro-batch size
+        """
+        super().__init__(*args, **kwargs)
+        self.batch = Field(
+            kwargs.get('batch'),
+            default=kwargs.get('batch', 1024),
+            type=int
+        )
 
     async def setup(self, event, pipeline, context):
-        await super().setup(
+        await StreamStats.setup(self, event, pipeline, context)
+        await DequeBufferingCommand.setup(
+            self,
             event,
             pipeline,
             context,
-            10
+            await self.batch.read(event, pipeline, context)
         )
+        self.context = context
 
     async def target(self, pipeline):
-        async for event in super().target(pipeline):
-            yield event
+        # ---
+        # Read the micro-batch as columns: a group code per event
+        # (batch-local), and the functors source fields values.
+        groups = {} # type: dict[tuple, int]
+        bys = []
+        codes = []
+        columns = {name: [] for name in self.source_fields}
+        batches = []
+        async for event in DequeBufferingCommand.target(self, pipeline):
+            # Columnar batches are aggregated on their own
+            if isinstance(event, EventBatch):
+                batches.append(event)
+                continue
+            by = [
+                await field.read(event, pipeline, self.context)
+                for field
+                in self.aggr_fields
+            ]
+            key = self.group_key(by)
+            if key not in groups:
+                groups[key] = len(groups)
+                bys.append(by)
+            codes.append(groups[key])
+            for name, field in self.source_fields.items():
+                columns[name].append(await field.read(event, pipeline, self.context))
+        if codes:
+            async for stated_event in self.aggregate(groups, bys, codes, columns):
+                yield stated_event
+        for batch in batches:
+            async for stated_event in self.target_batch(batch):
+                yield stated_event
+
+
+class WindowStreamStats(StreamStats):
+    """Aggregates events over time windows.
+
+    Events are dispatched in time buckets according to their time field
+    (or to their processing time if no time field is given). Buckets
+    are kept in a ring of per-bucket aggregation tables, indexed by
+    their start time divided by their width: when the events time
+    watermark passes a window's end, the window is closed and yield,
+    and the buckets which are no longer part of any window are evicted.
+    Events which belongs to an evicted bucket are dropped.
+
+    * In ``tumbling`` mode, buckets and windows have the same duration
+      (``span``) and each window is yield once.
+    * In ``sliding`` mode, buckets last ``slide`` seconds (defaults to
+      a quarter of ``span``) and each window covers the latest ``span``
+      seconds; windows are closed every ``slide`` seconds, from the
+      oldest open window up to the watermark, and are computed from the
+      functors partial states of their buckets. Windows without any
+      event are not yield.
+
+    Windows are written to the ``window.start`` and ``window.end``
+    fields, which also prefix the group key.
+    """
+
+    _about_     = 'Performs statistical operations over time windows'
+    _syntax_    = StreamStats._syntax_
+    _aliases_   = ['_window_stream_stats',]
+    _schema_    = StreamStats._schema_
+
+    def __init__(self, *args, **kwargs):
+        """
+        :kwargs span:   Window duration, in seconds or as a duration
+                        string (e.g. ``30s``, ``5m``, ``1h``)
+        :kwargs window: Window mode (``tumbling`` or ``sliding``);
+                        Defaults to ``tumbling``
+        :kwargs slide:  Sliding windows step, which must divide ``span``;
+                        Defaults to ``span / 4``
+        :kwargs time:   Event time field (epoch seconds or ISO 8601
+                        string); Defaults to the processing time
+        """
+        super().__init__(*args, **kwargs)
+        self.span = Field(kwargs.get('span'), default=kwargs.get('span'))
+        self.window = Field(
+            kwargs.get('window'),
+            default=kwargs.get('window') or 'tumbling'
+        )
+        self.slide = Field(kwargs.get('slide'), default=kwargs.get('slide'))
+        self.time = kwargs.get('time') and Field(kwargs['time']) or None
+        # Buckets ring, as {bucket index: {group key: (by, slots)}}
+        self.buckets = {} # type: dict[int, dict[tuple, tuple]]
+        # Eviction boundary (bucket index), latest closed window end
+        # (bucket index) and events time watermark
+        self.closed = float('-inf')
+        self.ended = float('-inf')
+        self.watermark = float('-inf')
+
+    def batchable(self) -> bool:
+        return False
+
+    async def setup(self, event, pipeline, context):
+        await super().setup(event, pipeline, context)
+        self.span = self.duration(await self.span.read(event, pipeline, context))
+        self.window = await self.window.read(event, pipeline, context)
+        if self.window == 'tumbling':
+            self.width = self.span
+        elif self.window == 'sliding':
+            slide = await self.slide.read(event, pipeline, context)
+            self.width = slide and self.duration(slide) or self.span / 4
+            if self.width > self.span:
+                raise Exception('Stats window slide must be lower than its span')
+        else:
+            raise Exception(f'Unknown stats window mode: {self.window}')
+        # Number of buckets per window; windows must be made of whole
+        # buckets for their start to match their span
+        self.panes = max(1, round(self.span / self.width))
+        if abs(self.panes * self.width - self.span) > 1e-9 * self.span:
+            raise Exception('Stats window span must be a multiple of its slide')
+
+    @staticmethod
+    def duration(value) -> float:
+        """Returns a duration in seconds.
+
+        :param value: Duration as a number of seconds or as a string
+                      (e.g. ``30``, ``30s``, ``5m``, ``1h``, ``1d``)
+        """
+        units = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+        match = re.fullmatch(r'\s*([0-9.]+)\s*([smhdw]?)\s*', str(value))
+        if not match or float(match.group(1)) <= 0:
+            raise Exception(f'Invalid stats window duration: {value}')
+        return float(match.group(1)) * units[match.group(2)]
+
+    async def event_time(self, event, pipeline, context) -> float:
+        """Returns an event's time, in seconds.
+
+        Falls back to the processing time if the event has no valid
+        time field.
+        """
+        if self.time:
+            value = await self.time.read(event, pipeline, context)
+            if isinstance(value, (int, float)):
+                return float(value)
+            if isinstance(value, str):
+                try:
+                    return datetime.fromisoformat(value).timestamp()
+                except ValueError:
+                    pass
+        return time()
+
+    async def target(self, event, pipeline, context, *args, **kwargs):
+        # ---
+        # Get event's bucket, drop events of evicted buckets
+        event_time = await self.event_time(event, pipeline, context)
+        index = floor(event_time / self.width)
+        if index < self.closed:
+            return
+        # ---
+        # Read aggregation fields values and functors source fields
+        by = [
+            await field.read(event, pipeline, context)
+            for field
+            in self.aggr_fields[2:]
+        ]
+        key = self.group_key(by)
+        values = {
+            name: await field.read(event, pipeline, context)
+            for name, field
+            in self.source_fields.items()
+        }
+        # ---
+        # Update the group's slots in the event's bucket
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            bucket = self.buckets[index] = {}
+        if key not in bucket:
+            bucket[key] = (by, [None] * len(self.functors))
+        slots = bucket[key][1]
+        for slot, _, function, source in self.functors:
+            slots[slot] = function(slots[slot], values.get(source))
+        # ---
+        # Close the elapsed buckets
+        if event_time > self.watermark:
+            self.watermark = event_time
+            async for stated_event in self.close(self.watermark):
+                yield stated_event
+
+    async def close(self, watermark: float):
+        """Closes the windows which ends before ``watermark``, yields
+        them and evicts the expired buckets.
+
+        Windows are closed slide by slide, from the oldest open window
+        up to the watermark; the steps without any bucket are skipped.
+
+        :param watermark: Events time watermark
+        """
+        while self.buckets:
+            # Next window end, as a bucket index
+            end = max(self.ended + 1, min(self.buckets) + 1)
+            if end * self.width > watermark:
+                break
+            self.ended = end
+            # ---
+            # Yield the window, merging the buckets it covers
+            window_start, window_end = end * self.width - self.span, end * self.width
+            groups = {} # type: dict[tuple, tuple]
+            for index in range(end - self.panes, end):
+                for key, (by, slots) in self.buckets.get(index, {}).items():
+                    if key not in groups:
+                        groups[key] = (by, [])
+                    groups[key][1].append(self.states_of(slots))
+            for key, (by, partials) in groups.items():
+                states = self.merge_states(partials)
+                yield await self.stated(
+                    [window_start, window_end, *by],
+                    (window_start, window_end, *key),
+                    self.results_of(states),
+                    states
+                )
+            # ---
+            # Evict the buckets which are not part of any further window
+            self.closed = end - self.panes + 1
+            for expired in [i for i in self.buckets if i < self.closed]:
+                self.buckets.pop(expired)
+
+    async def flush(self):
+        """Closes all the buckets at the pipeline's end.
+        """
+        async for stated_event in self.close(float('inf')):
+            yield stated_event
+
+
+class PostStatsBuffer(Compact):
+    """Keeps the latest iteration of each ``StreamStats`` group.
+
+    See ``Compact``; the buffer is flushed every ``compact`` events, or
+    every ``compactinterval`` seconds.
+    """
+
+    _about_     = 'Buffers StreamStats events'
+    _syntax_    = Compact._syntax_
+    _aliases_   = ['_post_stats_buffer', ]
+    _schema_    = {'properties': {}}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(
+            kwargs.get('compact'),
+            kwargs.get('compactinterval', 0.0)
+        )
 
 
 class PostStatsMerge(StreamStats, MergingCommand):
     """Force-merges the pipeline after running ``StreamStats``.
+
+    When the pipeline runs in several chunks, each ``StreamStats``
+    attaches its functors partial states to its stated events. The
+    latest partial states of each group are kept by chunk, and merged
+    using the functors ``merge`` method: a chunk's newer partial result
+    replaces its previous one instead of being added to it.
+
+    Stated events without partial states (i.e. from a single chunk)
+    are already exact and are forwarded as-is, with their signature.
     """
 
     _about_     = 'Force-merges the pipeline after running StreamStats'
@@ -162,7 +903,53 @@ class PostStatsMerge(StreamStats, MergingCommand):
     _schema_    = {'properties': {}} # type: ignore
 
     def __init__(self, *args, **kwargs):
+        # The partial results are throttled by the aggregation stage
+        kwargs.pop('emit', None)
         super().__init__(*args, merge=True, **kwargs)
+        # Partial states by group key and by chunk
+        self.states = {} # type: dict[tuple, dict[int, list]]
+        # Windowed stats: latest window end by chunk
+        self.windowed = bool(kwargs.get('span'))
+        self.watermarks = {} # type: dict[int, float]
+
+    def batchable(self) -> bool:
+        return False
+
+    async def setup(self, event, pipeline, context):
+        await super().setup(event, pipeline, context)
+        self.partials = False
+
+    async def target(self, event, pipeline, context, *args, **kwargs):
+        partial = (event.get('meta') or {}).get('stats') or {}
+        # ---
+        # Forward single chunk results: they are never merged across
+        # processes, so they keep the aggregation stage's signature
+        if 'states' not in partial:
+            yield event
+            return
+        by = [
+            await field.read(event, pipeline, context)
+            for field
+            in self.aggr_fields
+        ]
+        key = self.group_key(by)
+        # ---
+        # Update the chunk's partial states and merge all chunks
+        chunks = self.states.setdefault(key, {})
+        chunks[partial['chunk']] = partial['states']
+        results = self.results_of(self.merge_states(list(chunks.values())))
+        # ---
+        # Evict the windows which ends before every chunk's latest window
+        # end: the chunks close their windows by increasing end, so
+        # these windows are final (windowed stats only)
+        if self.windowed:
+            chunk = partial['chunk']
+            self.watermarks[chunk] = max(self.watermarks.get(chunk, by[1]), by[1])
+            if len(self.watermarks) >= partial.get('chunks', 1):
+                watermark = min(self.watermarks.values())
+                for old in [k for k in self.states if k[1] < watermark]:
+                    self.states.pop(old)
+        yield await self.stated(by, key, results)
 
 
 class Stats(StreamingCommand):
@@ -191,7 +978,7 @@ class Stats(StreamingCommand):
     #_grammar_.pop('arguments_rules')
     _grammar_['stats_rules'] = dedent('''\
         stats_function_name     : NAME
-        stats_function_body     : ( "(" field? ")" )?
+        stats_function_body     : ( "(" ((kwarg | field) ","?)* ")" )?
         stats_function_alias    : ("as" field)?
         stats_function          : stats_function_name stats_function_body stats_function_alias
         stats_functions         : (stats_function ","?)+
@@ -203,12 +990,24 @@ class Stats(StreamingCommand):
 
     class Transformer(StreamingCommand.Transformer):
         stats_function_name     = lambda self, items: str(items[0])
-        stats_function_body     = lambda self, items: len(items) and str(items[0]) or None
+        stats_function_body     = lambda self, items: [
+                                    isinstance(i, dict)
+                                    and ', '.join(f'{k}={v}' for k, v in i.items())
+                                    or str(i)
+                                    for i in items
+                                ]
         stats_function_alias    = lambda self, items: len(items) and str(items[0]) or None
-        stats_function          = tuple
         stats_functions         = list
         field                   = str
         stats_fields            = list
+
+        def stats_function(self, items):
+            # Function body is made of the source field and the
+            # function's parameters, e.g. `percentile(<field>, 95)`;
+            # keyword parameters are passed as `<key>=<value>`
+            name, body, alias = items
+            return (name, len(body) and body[0] or None, alias, body[1:])
+
         # start           = lambda self, items: (tuple(), {
         #                         'functions': items[0],
         #                         'fields': len(items) > 1 and items[1] or []
@@ -236,29 +1035,44 @@ class Stats(StreamingCommand):
         * `PreStatsMerge` forces pipeline merge before performing
           the statistical operations.
         * `StreamStats` performs the actual statistical operations.
-          Ultimately, we should switch to NumPy or Pandas instead of
-          using a self-made implementation of the statistical functions.
+          When a micro-batch size is given (`with batch=<size>`),
+          `BatchStreamStats` is used instead and vectorizes the
+          functors using NumPy. When a window span is given
+          (`with span=<duration>`), `WindowStreamStats` is used instead
+          and aggregates events over time windows.
         * `PostStatsMerge` receives the events yields by each parallel
           `StreamStats` commands and aggregates them.
         * `PostStatsBuffer` buffers and keep the latest iteration of
           each unique event to reduce the pressure over the next
-          commands.
+          commands. It is added only when a compaction size is given
+          (`with compact=<size>`).
         """
         return (
             # PreStatsMerge(),
-            StreamStats(*args, **kwargs),
-            # PostStatsBuffer(*args, **kwargs),
+            (
+                kwargs.get('span') and WindowStreamStats
+                or kwargs.get('batch') and BatchStreamStats
+                or StreamStats
+            )(*args, **kwargs),
             PostStatsMerge(*args, **kwargs),
-            # PostStatsBuffer(**kwargs)
+            *(kwargs.get('compact') and [PostStatsBuffer(**kwargs)] or [])
         )
 
 
 class StatsTable(BufferingCommand):
     """Prints stats table on the standard output.
+
+    The table is rendered incrementally: rows are tracked by event
+    signature and only the rows updated since the latest refresh are
+    redrawn. The whole table is redrawn only when a column is added or
+    widened. Refreshes are rate-limited to one every ``refresh``
+    seconds.
+
+    Only the latest event of each updated row is yield.
     """
 
     _about_     = 'Prints statistical table'
-    _syntax_    = '[[buffer=]<buffer size>]'
+    _syntax_    = '[[buffer=]<buffer size>] [[refresh=]<seconds>]'
     _aliases_   = [
         'print_stats',
         'output_stats',
@@ -267,13 +1081,24 @@ class StatsTable(BufferingCommand):
     ]
     _schema_    = {'properties': {}} # type: ignore
 
-    def __init__(self, buffer: int = 126):
+    def __init__(self, buffer: int = 126, refresh: float = 0.2):
         """
-        :param buffer: Internal buffer size
+        :param buffer:  Internal buffer size
+        :param refresh: Minimum delay between two table refreshes,
+                        in seconds
         """
-        super().__init__(buffer)
+        super().__init__(buffer, refresh)
         self.buffer = Field(buffer, default=126)
-        self.events: dict[str, Any] = {}
+        self.refresh = Field(refresh, default=0.2, type=float)
+        # Rows data and line number, by signature
+        self.rows: dict[str, dict[str, Any]] = {}
+        self.lines: dict[str, int] = {}
+        # Columns names and widths
+        self.widths: dict[str, int] = {}
+        # Rows to redraw, whole table redraw flag and latest refresh time
+        self.dirty: set[str] = set()
+        self.redraw = False
+        self.refreshed = 0.0
 
     async def setup(self, event, pipeline, context):
         await super().setup(
@@ -281,6 +1106,7 @@ class StatsTable(BufferingCommand):
             pipeline, 
             await self.buffer.read(event, pipeline, context)
         )
+        self.refresh = await self.refresh.read(event, pipeline, context)
         # Init curses
         self.logger.info('initialize curses')
         self.stdscr = curses.initscr()
@@ -290,23 +1116,105 @@ class StatsTable(BufferingCommand):
         self.stdscr.addstr(0, 0, 'Pipeline running')
 
     async def target(self, pipeline, *args, **kwargs):
-        # Get new events from queue and update table
+        # Keep the latest event of each row from the queue
+        updated = {}
         async for event in super().target(pipeline):
-            self.events[signature(event)] = event
-            yield event
+            updated[signature(event)] = event
+        # Update changed rows and yield their events for further
+        # processing
+        for sign, event in updated.items():
+            if self.update(sign, event.get('data', {})):
+                yield event
         # Update table
-        table = []
-        for _, event in self.events.items():
-            table.append(event.get('data', {}))
-        # Print table
-        self.stdscr.addstr(2, 0, tabulate(table, headers='keys'))
+        if monotonic() - self.refreshed >= self.refresh:
+            self.render()
+
+    def update(self, sign: str, row: dict) -> bool:
+        """Updates a row, to be drawn at the next refresh.
+
+        :param sign:    Row signature
+        :param row:     Row data
+        :returns:       ``False`` if the row is unchanged
+        """
+        if self.rows.get(sign) == row:
+            return False
+        if sign not in self.lines:
+            self.lines[sign] = len(self.lines)
+        self.rows[sign] = row
+        self.dirty.add(sign)
+        self.measure(row)
+        return True
+
+    @staticmethod
+    def cell(value) -> str:
+        """Returns a table cell's text.
+
+        :param value: Cell value
+        """
+        return value is not None and str(value) or ''
+
+    def measure(self, row: dict):
+        """Updates the columns widths from a row.
+
+        :param row: Row data
+        """
+        for name, value in row.items():
+            width = max(len(name), len(self.cell(value)))
+            if width > self.widths.get(name, -1):
+                self.widths[name] = width
+                self.redraw = True
+
+    def line(self, row: dict) -> str:
+        """Returns a row's text line (numbers are right-aligned).
+
+        :param row: Row data
+        """
+        return '  '.join(
+            isinstance(row.get(name), (int, float))
+            and self.cell(row.get(name)).rjust(width)
+            or self.cell(row.get(name)).ljust(width)
+            for name, width
+            in self.widths.items()
+        )
+
+    def draw(self, y: int, text: str):
+        """Draws a line of text, clipped to the screen size.
+
+        :param y:       Line number
+        :param text:    Line text
+        """
+        height, width = self.stdscr.getmaxyx()
+        if y < height:
+            try:
+                self.stdscr.addstr(y, 0, text[:width - 1])
+                self.stdscr.clrtoeol()
+            except curses.error:
+                pass
+
+    def render(self):
+        """Draws the updated rows (or the whole table) and refreshes the
+        screen.
+        """
+        if self.redraw:
+            self.stdscr.move(2, 0)
+            self.stdscr.clrtobot()
+            self.draw(2, self.line({name: name for name in self.widths}))
+            self.draw(3, '  '.join('-' * width for width in self.widths.values()))
+            dirty = self.rows # type: Any
+        else:
+            dirty = self.dirty
+        for sign in dirty:
+            self.draw(4 + self.lines[sign], self.line(self.rows[sign]))
+        self.dirty = set()
+        self.redraw = False
         self.stdscr.refresh()
-        # Yield events for further processing
-        for _, event in self.events.items():
-            yield event
+        self.refreshed = monotonic()
 
     async def __aexit__(self, *args, **kwargs) -> None:
         try:
+            # Draw the latest updates
+            if self.dirty or self.redraw:
+                self.render()
             # Wait for user to quit
             self.stdscr.addstr(
                 0, 0, 'Pipeline complete, press any key to leave'
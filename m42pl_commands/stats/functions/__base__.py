@@ -1,12 +1,44 @@
 from m42pl.fields import Field
 
+# NumPy is optional: it is required only by vectorized functors
+try:
+    import numpy as np
+except ImportError:
+    np = None # type: ignore
+
 
 class StatsFunction:
     """Base stats function (aka. functor).
+
+    Functors do not walk nor own the aggregation structure: the caller
+    (``StreamStats``) keeps a single flat table which maps each group
+    key (the tuple of aggregation fields values) to a list of slots,
+    one slot per functor. The caller reads the functor's source field
+    once per event and hands the functor its slot along with the value.
+
+    Functors may also implement a vectorized ``batch`` method, used by
+    ``BatchStreamStats`` to update all the groups of a micro-batch at
+    once.
+
+    Functors only update their slots on each event: their value (i.e.
+    the stated field value) is computed by ``value``, only when a group
+    is actually yield (see the ``emit`` option of ``StreamStats``).
+
+    To merge the results of parallel ``StreamStats`` (see
+    ``PostStatsMerge``), functors expose their slot as a serialisable
+    partial ``state``, and implement ``merge`` (combines two partial
+    states) and ``result`` (returns the value of a partial state).
+
+    :cvar vectorized:   ``True`` if the functor implements ``batch``
+    :cvar numeric:      ``True`` if ``batch`` requires a numeric source
+                        column
     """
+
+    vectorized = False
+    numeric = True
     
     def __init__(self, source_field: Field, aggr_fields: list,
-            dest_field: Field, aggregates: dict):
+            dest_field: Field, aggregates: dict, params: list = []):
         """
         :param source_field:    Aggregation function source field (must exist).
                                 Ex: "| stats min(<source field>) by ...
@@ -17,59 +49,81 @@ class StatsFunction:
         :param dest_field:      Aggregation function result field (created or overwriten).
                                 Ex: "| stats min(<source_field>) as <dest_field> by <aggr_fields>"
                                 
-        :param aggregates:      Aggregations structure.
+        :param aggregates:      Aggregations table (group key -> slots).
+
+        :param params:          Aggregation function parameters.
+                                Ex: "| stats percentile(<source_field>, <params>) ...
+                                Keyword parameters (``<key>=<value>``) are
+                                moved to ``options``.
+                                Ex: "| stats values(<source_field>, max=10) ...
         """
         self.source_field = source_field
         self.aggr_fields = aggr_fields
         self.dest_field = dest_field
         self.aggregates = aggregates
-
-    async def __call__(self, event, pipeline, context):
-        aggregates = self.aggregates
-        # ---
-        # Update aggregation table structure with event's fields values
-        # for each aggregation level
-        for field in self.aggr_fields:
-            # ---
-            # Create aggregation level, e.g. 'users' key in
-            # {
-            #   users: { ... }
-            # }
-            if field.name not in aggregates:
-                aggregates[field.name] = {}
-            # Dive into aggregation level
-            aggregates = aggregates[field.name]
-            # ---
-            # Create aggregation key, e.g. 'john' and 'jane' keys in
-            # {
-            #   users: {
-            #       john: {},
-            #       jane: {},
-            #       ...
-            # }
-            field_value = str(await field.read(event, pipeline, context))
-            if field_value not in aggregates:
-                aggregates[field_value] = {}
-            # ---
-            # Point to final aggregation level
-            aggregates = aggregates[field_value]
-        # ---
-        # Create the latest aggregation level which contains the stats
-        # function results.
-        if not self.dest_field.name in aggregates:
-            aggregates[self.dest_field.name] = None
-        # ---
-        # Run the stats function and let it update its own aggregation level.
-        # The stats function **must** returns:
-        # tuple[0]: its aggregation level
-        # tuple[1]: the event's new value
-        aggregates[self.dest_field.name], value = await self.target(
-            event,
-            aggregates[self.dest_field.name],
-            pipeline,
-            context
+        self.params = [p for p in params if '=' not in str(p)]
+        self.options = dict(
+            str(p).split('=', 1)
+            for p
+            in params
+            if '=' in str(p)
         )
-        return value
 
-    async def target(self, *args, **kwargs):
+    def __call__(self, dataset, value):
+        """Updates the functor's slot with a new value.
+
+        The stats function **must** returns its updated slot (dataset).
+
+        :param dataset: Functor's slot for the current group
+                        (``None`` for a new group)
+        :param value:   Source field value
+        """
+        return self.target(dataset, value)
+
+    def target(self, dataset, value):
         raise NotImplementedError()
+
+    def batch(self, datasets: list, codes, column, size: int) -> list:
+        """Updates the functor's slots with a micro-batch of values.
+
+        :param datasets:    Functor's slots, by group code
+        :param codes:       Events group codes (NumPy array)
+        :param column:      Source field values (NumPy array), or
+                            ``None`` if the column is not numeric
+        :param size:        Number of groups in the micro-batch
+        :returns:           The updated slots, by group code
+        """
+        raise NotImplementedError()
+
+    def state(self, dataset):
+        """Returns a serialisable partial state from a slot.
+
+        :param dataset: Functor's slot
+        """
+        return dataset
+
+    def merge(self, state_a, state_b):
+        """Merges two non-null partial states.
+
+        :param state_a: First partial state
+        :param state_b: Second partial state
+        """
+        raise NotImplementedError()
+
+    def value(self, dataset):
+        """Returns the functor's value from its slot.
+
+        The value is computed only when a stated event is built, and
+        must be safe to be written to it (i.e. mutable accumulators must
+        be copied).
+
+        :param dataset: Functor's slot
+        """
+        return dataset
+
+    def result(self, state):
+        """Returns the functor's value from a (merged) partial state.
+
+        :param state: Partial state
+        """
+        return state
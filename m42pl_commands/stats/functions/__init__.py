@@ -1,11 +1,15 @@
 from .count import Count
 from.distinctcount import DistinctCount
+from .approxdistinctcount import ApproxDistinctCount
 from .values import Values
 from ._list import List
-from .minmax import Min, Max
+from .minmax import Min, Max, Range
 from .firstlast import First, Last
 from .sum import Sum
 from .average import Average
+from .variance import Variance, Stdev
+from .percentile import Percentile, Median, P90, P95, P99
+from .topk import TopK
 
 from .aggregates import Aggregates
 
@@ -16,16 +20,31 @@ names = {
     'count': Count,
     'dc': DistinctCount,
     'distinctcount': DistinctCount,
+    'dc_approx': ApproxDistinctCount,
+    'estdc': ApproxDistinctCount,
     'values': Values,
     'list': List,
     'min': Min,
     'max': Max,
+    'range': Range,
     'first': First,
     'last': Last,
     'sum': Sum,
     'average': Average,
     'avg': Average,
     'mean': Average,
+    'var': Variance,
+    'variance': Variance,
+    'stdev': Stdev,
+    'stddev': Stdev,
+    'percentile': Percentile,
+    'median': Median,
+    'p50': Median,
+    'p90': P90,
+    'p95': P95,
+    'p99': P99,
+    'topk': TopK,
+    'top': TopK,
     # ---
     'aggregates': Aggregates
 }
@@ -1,17 +1,34 @@
 from .__base__ import StatsFunction
+from .accumulators import RingList
 
 
 class List(StatsFunction):
     """Returns the list of all values for a given field.
+
+    Only the latest 100 values are kept by default; the maximum number
+    of values may be set with ``max``, e.g. ``list(<field>, max=1000)``
+    (``max=0`` for no limit).
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
-        if not isinstance(dataset, list):
-            dataset = list()
-        if isinstance(event_value, list):
-            for i in event_value:
-                dataset.append(i)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max = int(self.options.get('max', 100))
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, RingList):
+            dataset = RingList(self.max)
+        if isinstance(value, list):
+            for i in value:
+                dataset.add(i)
         else:
-            dataset.append(event_value)
-        return (dataset, dataset)
+            dataset.add(value)
+        return dataset
+
+    def value(self, dataset):
+        return dataset.snapshot() if isinstance(dataset, RingList) else dataset
+
+    def state(self, dataset):
+        return dataset.snapshot() if isinstance(dataset, RingList) else None
+
+    def merge(self, state_a, state_b):
+        return RingList(self.max, [*state_a, *state_b]).snapshot()
@@ -0,0 +1,182 @@
+"""Numerically stable running accumulators used by the stats functions.
+
+Accumulators are small ``__slots__`` objects updated in-place, so that
+an update does not allocate any new object.
+"""
+
+from collections import deque
+
+
+class KahanSum:
+    """Compensated running sum (Kahan-Babuska-Neumaier).
+
+    The rounding error of each addition is accumulated separately and
+    added back to the sum on read.
+    """
+
+    __slots__ = ('sum', 'compensation')
+
+    def __init__(self, total: float = 0.0, compensation: float = 0.0):
+        """
+        :param total:           Initial sum
+        :param compensation:    Initial rounding error
+        """
+        self.sum = float(total)
+        self.compensation = float(compensation)
+
+    def add(self, value: float):
+        """Adds a value to the sum.
+
+        :param value: Value to add
+        """
+        total = self.sum + value
+        if abs(self.sum) >= abs(value):
+            self.compensation += (self.sum - total) + value
+        else:
+            self.compensation += (value - total) + self.sum
+        self.sum = total
+
+    def value(self) -> float:
+        """Returns the compensated sum.
+        """
+        return self.sum + self.compensation
+
+    def merge(self, total: float, compensation: float):
+        """Merges another accumulator's state into this one.
+
+        :param total:           Other accumulator's sum
+        :param compensation:    Other accumulator's rounding error
+        """
+        self.add(total)
+        self.compensation += compensation
+
+    def state(self) -> tuple:
+        """Returns the accumulator's state, as ``(sum, compensation)``.
+        """
+        return (self.sum, self.compensation)
+
+
+class Welford:
+    """Running count, mean and sum of squared deviations (Welford).
+
+    Two accumulators are merged using Chan et al. parallel algorithm.
+    """
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        """
+        :param count:   Initial number of values
+        :param mean:    Initial mean
+        :param m2:      Initial sum of squared deviations from the mean
+        """
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float):
+        """Adds a value.
+
+        :param value: Value to add
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, count: int, mean: float, m2: float):
+        """Adds the moments of another set of values.
+
+        :param count:   Number of values
+        :param mean:    Values mean
+        :param m2:      Values sum of squared deviations from the mean
+        """
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def variance(self):
+        """Returns the sample variance, or ``None`` if there is less
+        than two values.
+        """
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    def state(self) -> tuple:
+        """Returns the accumulator serialisable state.
+        """
+        return (self.count, self.mean, self.m2)
+
+
+class UniqueValues:
+    """Insertion-ordered set of values, optionally capped.
+
+    Values are indexed in a dict (unhashable values are indexed by
+    their representation), so that membership is O(1).
+    """
+
+    __slots__ = ('index', 'max')
+
+    def __init__(self, max: int = 0, values: list = []):
+        """
+        :param max:     Maximum number of values (``0`` for no limit)
+        :param values:  Initial values
+        """
+        self.index = {} # type: dict
+        self.max = max
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        """Adds a value if it is not known yet and the cap is not reached.
+
+        :param value: Value to add
+        """
+        try:
+            if value in self.index:
+                return
+            key = value
+        except TypeError:
+            key = repr(value)
+            if key in self.index:
+                return
+        if self.max and len(self.index) >= self.max:
+            return
+        self.index[key] = value
+
+    def snapshot(self) -> list:
+        """Returns a copy of the values list.
+        """
+        return list(self.index.values())
+
+
+class RingList:
+    """List of the latest values, optionally capped (ring buffer).
+    """
+
+    __slots__ = ('values', )
+
+    def __init__(self, max: int = 0, values: list = []):
+        """
+        :param max:     Maximum number of values (``0`` for no limit);
+                        The oldest values are dropped first
+        :param values:  Initial values
+        """
+        self.values = deque(values, maxlen=max or None)
+
+    def add(self, value):
+        """Adds a value.
+
+        :param value: Value to add
+        """
+        self.values.append(value)
+
+    def snapshot(self) -> list:
+        """Returns a copy of the values list.
+        """
+        return list(self.values)
@@ -1,5 +1,3 @@
-from m42pl.event import signature
-
 from .__base__ import StatsFunction
 
 
@@ -7,5 +5,18 @@ class Aggregates(StatsFunction):
     """Returns the internal aggregation structures.
     """
 
-    async def __call__(self, event, pipeline, context):
-        return self.aggregates
+    def target(self, dataset, value):
+        return dataset
+
+    def value(self, dataset):
+        return {
+            str(key): slots
+            for key, slots
+            in self.aggregates.items()
+        }
+
+    def state(self, dataset):
+        return None
+
+    def result(self, state):
+        return None
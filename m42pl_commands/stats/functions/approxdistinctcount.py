@@ -0,0 +1,35 @@
+from .__base__ import StatsFunction
+from .sketches import HyperLogLog
+
+
+class ApproxDistinctCount(StatsFunction):
+    """Estimates the number of distinct value for a given field.
+
+    Unlike ``DistinctCount``, the distinct values are not kept: each
+    group holds a HyperLogLog sketch whose size depends only on the
+    precision (first parameter, defaults to 12, i.e. 4KB per group).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.precision = len(self.params) and int(self.params[0]) or 12
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, HyperLogLog):
+            dataset = HyperLogLog(self.precision)
+        dataset.add(value)
+        return dataset
+
+    def value(self, dataset):
+        return dataset.cardinality()
+
+    def state(self, dataset):
+        return isinstance(dataset, HyperLogLog) and dataset.state() or None
+
+    def merge(self, state_a, state_b):
+        return HyperLogLog.from_state(state_a).merge(
+            HyperLogLog.from_state(state_b)
+        ).state()
+
+    def result(self, state):
+        return HyperLogLog.from_state(state).cardinality()
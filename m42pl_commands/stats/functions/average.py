@@ -1,25 +1,50 @@
-from .__base__ import StatsFunction
+from .__base__ import StatsFunction, np
+from .accumulators import Welford
 
 
 class Average(StatsFunction):
-    """Returns the list of unique values for a given field.
+    """Returns the average value of a given field.
 
-    Dataset format:
-    - [0] (float): the previous average
-    - [1] (int): the number of events
+    Dataset is a ``Welford`` accumulator; non-numeric values are
+    ignored.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
-        if not isinstance(dataset, tuple):
-            dataset = (0.0, 0)
-        try:
-            dataset = (
-                # New average
-                ((dataset[0] * dataset[1]) + event_value) / (dataset[1] + 1),
-                # Number of events
-                dataset[1] + 1
-            )
-        except Exception:
-            pass
-        return (dataset, dataset[0])
+    vectorized = True
+
+    def value(self, dataset: Welford):
+        """Returns the functor's result from its accumulator.
+
+        :param dataset: Functor's accumulator
+        """
+        return dataset.mean
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, Welford):
+            dataset = Welford()
+        if isinstance(value, (int, float)):
+            dataset.add(value)
+        return dataset
+
+    def batch(self, datasets, codes, column, size):
+        # Groups moments: every group has at least one value
+        counts = np.bincount(codes, minlength=size)
+        means = np.bincount(codes, weights=column, minlength=size) / counts
+        m2s = np.bincount(codes, weights=(column - means[codes]) ** 2, minlength=size)
+        updates = []
+        for dataset, count, mean, m2 in zip(datasets, counts.tolist(), means.tolist(), m2s.tolist()):
+            if not isinstance(dataset, Welford):
+                dataset = Welford()
+            dataset.merge(count, mean, m2)
+            updates.append(dataset)
+        return updates
+
+    def state(self, dataset):
+        return dataset.state() if isinstance(dataset, Welford) else None
+
+    def merge(self, state_a, state_b):
+        merged = Welford(*state_a)
+        merged.merge(*state_b)
+        return merged.state()
+
+    def result(self, state):
+        return self.value(Welford(*state))
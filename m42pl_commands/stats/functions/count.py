@@ -1,17 +1,27 @@
-from m42pl.event import signature
-
-from .__base__ import StatsFunction
+from .__base__ import StatsFunction, np
 
 
 class Count(StatsFunction):
     """Count the number of events.
     """
+
+    vectorized = True
+    numeric = False
     
-    async def target(self, event, dataset, pipeline, context):
-        if not isinstance(dataset, dict):
-            return ({signature(event): 1}, 1)
-        if signature(event) not in dataset:
-            dataset[signature(event)] = 1
-        else:
-            dataset[signature(event)] += 1
-        return (dataset, dataset[signature(event)])
+    def target(self, dataset, value):
+        if not isinstance(dataset, int):
+            dataset = 0
+        dataset += 1
+        return dataset
+
+    def batch(self, datasets, codes, column, size):
+        updates = []
+        for dataset, count in zip(datasets, np.bincount(codes, minlength=size).tolist()):
+            if not isinstance(dataset, int):
+                dataset = 0
+            dataset += count
+            updates.append(dataset)
+        return updates
+
+    def merge(self, state_a, state_b):
+        return state_a + state_b
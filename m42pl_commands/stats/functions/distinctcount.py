@@ -5,9 +5,20 @@ class DistinctCount(StatsFunction):
     """Counts the number of distinct value for a given field.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
+    def target(self, dataset, value):
         if not isinstance(dataset, set):
-            return set({event_value, }), 1
-        dataset.add(event_value)
-        return (dataset, len(dataset))
+            return set({value, })
+        dataset.add(value)
+        return dataset
+
+    def value(self, dataset):
+        return len(dataset)
+
+    def state(self, dataset):
+        return isinstance(dataset, set) and list(dataset) or None
+
+    def merge(self, state_a, state_b):
+        return [*set(state_a).union(state_b)]
+
+    def result(self, state):
+        return len(state)
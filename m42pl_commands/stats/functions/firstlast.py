@@ -5,17 +5,21 @@ class First(StatsFunction):
     """Returns the first value of a given field.
     """
 
-    async def target(self, event, dataset, pipeline, context):
+    def target(self, dataset, value):
         if dataset is None:
-            value = await self.source_field.read(event, pipeline, context)
-            return (value, value)
-        return (dataset, dataset)
+            return value
+        return dataset
+
+    def merge(self, state_a, state_b):
+        return state_a
 
 
 class Last(StatsFunction):
     """Returns the last value of a given field.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        value = await self.source_field.read(event, pipeline, context)
-        return (value, value)
+    def target(self, dataset, value):
+        return value
+
+    def merge(self, state_a, state_b):
+        return state_b
@@ -1,27 +1,101 @@
-from .__base__ import StatsFunction
+from .__base__ import StatsFunction, np
 
 
 class Min(StatsFunction):
     """Returns the minimum value for the given field.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
+    vectorized = True
+
+    def target(self, dataset, value):
         if not isinstance(dataset, (int, float)):
             dataset = None
-        if isinstance(event_value, (int, float)) and (dataset is None or event_value < dataset):
-            return (event_value, event_value)
-        return (dataset, dataset)
+        if isinstance(value, (int, float)) and (dataset is None or value < dataset):
+            return value
+        return dataset
+
+    def batch(self, datasets, codes, column, size):
+        # Every group has at least one value: starting from the column's
+        # maximum yields the exact groups minimums
+        minimums = np.full(size, column.max(), dtype=column.dtype)
+        np.minimum.at(minimums, codes, column)
+        return [
+            self.target(dataset, value)
+            for dataset, value
+            in zip(datasets, minimums.tolist())
+        ]
+
+    def merge(self, state_a, state_b):
+        return self.target(state_a, state_b)
 
 
 class Max(StatsFunction):
     """Returns the maximum value for the given field.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
+    vectorized = True
+
+    def target(self, dataset, value):
         if not isinstance(dataset, (int, float)):
             dataset = None
-        if isinstance(event_value, (int, float)) and (dataset is None or event_value > dataset):
-            return (event_value, event_value)
-        return (dataset, dataset)
+        if isinstance(value, (int, float)) and (dataset is None or value > dataset):
+            return value
+        return dataset
+
+    def batch(self, datasets, codes, column, size):
+        # Every group has at least one value: starting from the column's
+        # minimum yields the exact groups maximums
+        maximums = np.full(size, column.min(), dtype=column.dtype)
+        np.maximum.at(maximums, codes, column)
+        return [
+            self.target(dataset, value)
+            for dataset, value
+            in zip(datasets, maximums.tolist())
+        ]
+
+    def merge(self, state_a, state_b):
+        return self.target(state_a, state_b)
+
+
+class Range(StatsFunction):
+    """Returns the difference between the maximum and minimum values
+    of a given field.
+
+    Dataset format:
+    - [0] (int|float): the minimum value
+    - [1] (int|float): the maximum value
+    """
+
+    vectorized = True
+
+    def target(self, dataset, value):
+        if isinstance(value, (int, float)):
+            if not isinstance(dataset, list):
+                dataset = [value, value]
+            elif value < dataset[0]:
+                dataset[0] = value
+            elif value > dataset[1]:
+                dataset[1] = value
+        return dataset
+
+    def value(self, dataset):
+        return self.result(dataset)
+
+    def batch(self, datasets, codes, column, size):
+        minimums = np.full(size, column.max(), dtype=column.dtype)
+        maximums = np.full(size, column.min(), dtype=column.dtype)
+        np.minimum.at(minimums, codes, column)
+        np.maximum.at(maximums, codes, column)
+        updates = []
+        for dataset, minimum, maximum in zip(datasets, minimums.tolist(), maximums.tolist()):
+            updates.append(self.target(self.target(dataset, minimum), maximum))
+        return updates
+
+    def state(self, dataset):
+        return list(dataset) if isinstance(dataset, list) else None
+
+    def merge(self, state_a, state_b):
+        return [min(state_a[0], state_b[0]), max(state_a[1], state_b[1])]
+
+    def result(self, state):
+        return state[1] - state[0] if state else None
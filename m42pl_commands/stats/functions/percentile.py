@@ -0,0 +1,81 @@
+from .__base__ import StatsFunction
+from .sketches import DDSketch
+
+
+class Percentile(StatsFunction):
+    """Returns the estimated percentile of a given field.
+
+    Values are summarized in a DDSketch (bounded memory, 1% relative
+    accuracy); the percentile is given as the first parameter, between
+    0 and 100, e.g. ``percentile(<field>, 95)``.
+
+    :cvar quantile: Fixed quantile (between 0 and 1) for the
+                    ``median`` and ``p<n>`` functors
+    """
+
+    quantile = None # type: float|None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.quantile is None:
+            if not len(self.params):
+                raise Exception('Missing percentile, e.g. "percentile(<field>, 95)"')
+            try:
+                percentile = float(self.params[0])
+            except (TypeError, ValueError):
+                percentile = float('nan')
+            if not 0 <= percentile <= 100:
+                raise Exception(
+                    f'Invalid percentile: {self.params[0]} '
+                    '(expected a number between 0 and 100)'
+                )
+            self.quantile = percentile / 100
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, DDSketch):
+            dataset = DDSketch()
+        if isinstance(value, (int, float)):
+            dataset.add(value)
+        return dataset
+
+    def value(self, dataset):
+        return dataset.quantile(self.quantile)
+
+    def state(self, dataset):
+        return isinstance(dataset, DDSketch) and dataset.state() or None
+
+    def merge(self, state_a, state_b):
+        return DDSketch.from_state(state_a).merge(
+            DDSketch.from_state(state_b)
+        ).state()
+
+    def result(self, state):
+        return DDSketch.from_state(state).quantile(self.quantile)
+
+
+class Median(Percentile):
+    """Returns the estimated median of a given field.
+    """
+
+    quantile = 0.5
+
+
+class P90(Percentile):
+    """Returns the estimated 90th percentile of a given field.
+    """
+
+    quantile = 0.9
+
+
+class P95(Percentile):
+    """Returns the estimated 95th percentile of a given field.
+    """
+
+    quantile = 0.95
+
+
+class P99(Percentile):
+    """Returns the estimated 99th percentile of a given field.
+    """
+
+    quantile = 0.99
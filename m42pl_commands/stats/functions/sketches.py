@@ -0,0 +1,429 @@
+"""Bounded-memory and mergeable data structures (aka. sketches) used
+by the approximate stats functions.
+
+Sketches are updated in-place and expose a serialisable ``state``
+(to be exchanged between chunks) from which they can be rebuilt with
+``from_state``.
+"""
+
+from heapq import heapify, heappush, heapreplace, nlargest
+from math import log, ceil
+
+from typing import Any
+
+from ..signatures import hash64
+
+
+def hashable(value):
+    """Returns a hashable form of a value.
+
+    Lists (e.g. tuples decoded from a serialised state) are converted
+    to tuples and other unhashable values to their string
+    representation.
+
+    :param value: Value to convert
+    """
+    if isinstance(value, list):
+        return tuple(hashable(item) for item in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return str(value)
+
+
+class HyperLogLog:
+    """HyperLogLog cardinality estimator.
+
+    The sketch is a fixed-size array of ``2 ** precision`` one-byte
+    registers; its relative standard error is ``1.04 / sqrt(2 **
+    precision)`` (i.e. ~1.6% with the default precision of 12, for 4KB
+    of registers).
+
+    The registers harmonic sum and zeros count are maintained on
+    update so that ``cardinality`` is O(1).
+    """
+
+    __slots__ = ('precision', 'registers', 'harmonic', 'zeros')
+
+    def __init__(self, precision: int = 12, registers: bytes = b''):
+        """
+        :param precision:   Number of bits used to index the registers,
+                            between 4 and 18
+        :param registers:   Initial registers
+        """
+        if not 4 <= precision <= 18:
+            raise Exception(f'Invalid HyperLogLog precision: {precision}')
+        self.precision = precision
+        self.registers = bytearray(registers or 1 << precision)
+        self.harmonic = sum(2.0 ** -r for r in self.registers)
+        self.zeros = self.registers.count(0)
+
+    def add(self, value):
+        """Adds a value to the sketch.
+
+        :param value: Value to add
+        """
+        x = hash64(value)
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        current = self.registers[index]
+        if rank > current:
+            self.registers[index] = rank
+            self.harmonic += 2.0 ** -rank - 2.0 ** -current
+            if current == 0:
+                self.zeros -= 1
+
+    def cardinality(self) -> int:
+        """Returns the estimated number of distinct values.
+        """
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / self.harmonic
+        # Small range correction (linear counting)
+        if estimate <= 2.5 * m and self.zeros:
+            estimate = m * log(m / self.zeros)
+        return round(estimate)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Returns a new sketch which is the union of two sketches.
+
+        :param other: Sketch to merge with (same precision)
+        """
+        if other.precision != self.precision:
+            raise Exception('Cannot merge HyperLogLog of different precisions')
+        return HyperLogLog(
+            self.precision,
+            bytes(map(max, self.registers, other.registers))
+        )
+
+    def state(self) -> tuple:
+        """Returns the sketch serialisable state.
+        """
+        return (self.precision, bytes(self.registers))
+
+    @classmethod
+    def from_state(cls, state) -> 'HyperLogLog':
+        """Rebuilds a sketch from its serialisable state.
+
+        :param state: Sketch state, as returned by ``state``
+        """
+        return cls(*state)
+
+
+class DDSketch:
+    """Quantiles sketch with relative accuracy guarantees (DDSketch).
+
+    Values are counted in logarithmically-sized buckets: any quantile
+    is estimated within ``accuracy`` of its real value (relative
+    error). Positive and negative values are stored separately, and
+    the number of buckets per store is bounded by ``max_buckets`` (the
+    lowest buckets are collapsed together when needed).
+
+    Sketches with the same accuracy merge exactly by summing their
+    buckets counts.
+
+    The sorted buckets keys used by ``quantile`` are cached until a new
+    bucket is created.
+    """
+
+    __slots__ = ('accuracy', 'max_buckets', 'gamma', 'log_gamma',
+                    'positive', 'negative', 'zeros', 'count', 'sorted')
+
+    def __init__(self, accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        :param accuracy:    Relative accuracy, between 0 and 1
+        :param max_buckets: Maximum number of buckets per store
+        """
+        if not 0 < accuracy < 1:
+            raise Exception(f'Invalid DDSketch accuracy: {accuracy}')
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = log(self.gamma)
+        self.positive = {} # type: dict[int, int]
+        self.negative = {} # type: dict[int, int]
+        self.zeros = 0
+        self.count = 0
+        self.sorted = None # type: tuple|None
+
+    def key(self, value: float) -> int:
+        """Returns the bucket key of a strictly positive value.
+
+        :param value: Value to index
+        """
+        return ceil(log(value) / self.log_gamma)
+
+    def value(self, key: int) -> float:
+        """Returns the representative value of a bucket.
+
+        :param key: Bucket key
+        """
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def collapse(self, store: dict):
+        """Collapses a store's lowest buckets to fit ``max_buckets``.
+
+        :param store: Buckets store
+        """
+        if len(store) > self.max_buckets:
+            keys = sorted(store)
+            lowest = keys[len(keys) - self.max_buckets]
+            for key in keys[:len(keys) - self.max_buckets]:
+                store[lowest] += store.pop(key)
+
+    def add(self, value: float, count: int = 1):
+        """Adds a value to the sketch.
+
+        :param value: Value to add
+        :param count: Value's number of occurrences
+        """
+        if value > 0:
+            store, key = self.positive, self.key(value)
+        elif value < 0:
+            store, key = self.negative, self.key(-value)
+        else:
+            self.zeros += count
+            self.count += count
+            return
+        if key in store:
+            store[key] += count
+        else:
+            store[key] = count
+            self.collapse(store)
+            self.sorted = None
+        self.count += count
+
+    def keys(self) -> tuple:
+        """Returns the negative buckets keys (by decreasing order) and
+        the positive buckets keys (by increasing order).
+        """
+        if self.sorted is None:
+            self.sorted = (
+                sorted(self.negative, reverse=True),
+                sorted(self.positive)
+            )
+        return self.sorted
+
+    def quantile(self, q: float):
+        """Returns the estimated quantile ``q`` (between 0 and 1).
+
+        :param q: Quantile
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        negative, positive = self.keys()
+        # Negative values, from the lowest (highest absolute value)
+        for key in negative:
+            seen += self.negative[key]
+            if seen > rank:
+                return -self.value(key)
+        # Zeros
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        # Positive values
+        for key in positive:
+            seen += self.positive[key]
+            if seen > rank:
+                return self.value(key)
+        return self.value(positive[-1])
+
+    def merge(self, other: 'DDSketch') -> 'DDSketch':
+        """Returns a new sketch which is the union of two sketches.
+
+        :param other: Sketch to merge with (same accuracy)
+        """
+        if other.accuracy != self.accuracy:
+            raise Exception('Cannot merge DDSketch of different accuracies')
+        merged = DDSketch.from_state(self.state())
+        for store, other_store in ((merged.positive, other.positive),
+                                    (merged.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+            merged.collapse(store)
+        merged.zeros += other.zeros
+        merged.count += other.count
+        return merged
+
+    def state(self) -> tuple:
+        """Returns the sketch serialisable state.
+
+        Buckets are serialised as lists of ``(key, count)`` pairs.
+        """
+        return (
+            self.accuracy,
+            self.max_buckets,
+            self.zeros,
+            list(self.positive.items()),
+            list(self.negative.items())
+        )
+
+    @classmethod
+    def from_state(cls, state) -> 'DDSketch':
+        """Rebuilds a sketch from its serialisable state.
+
+        :param state: Sketch state, as returned by ``state``
+        """
+        accuracy, max_buckets, zeros, positive, negative = state
+        sketch = cls(accuracy, max_buckets)
+        sketch.zeros = zeros
+        sketch.positive = {key: count for key, count in positive}
+        sketch.negative = {key: count for key, count in negative}
+        sketch.count = zeros + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class SpaceSaving:
+    """Heavy hitters (top-k) sketch using the Space-Saving algorithm.
+
+    At most ``capacity`` values are monitored, each with a count and a
+    maximum over-estimation error. When a new value arrives and the
+    sketch is full, it replaces the least counted value and inherits
+    its count as error. Any value whose real count exceeds
+    ``total / capacity`` is guaranteed to be monitored.
+
+    The least counted value is found with a min-heap which holds one
+    ``(count, sequence, value)`` entry per monitored value. The entries
+    are not updated when a value's count increases: as counts never
+    decrease, an outdated entry is updated only when it reaches the
+    heap's top (see ``least``), so an eviction costs ``O(log capacity)``
+    (amortized).
+    """
+
+    __slots__ = ('capacity', 'counters', 'total', 'heap', 'sequence')
+
+    def __init__(self, capacity: int = 64):
+        """
+        :param capacity: Maximum number of monitored values
+        """
+        self.capacity = capacity
+        self.counters = {} # type: dict[Any, list[int]]
+        self.total = 0
+        # Counters min-heap; the entries sequence numbers break the
+        # counts ties, so values are never compared
+        self.heap = [] # type: list[tuple]
+        self.sequence = 0
+
+    def index(self):
+        """Rebuilds the counters heap (after the counters have been
+        replaced).
+        """
+        self.heap = [
+            (counter[0], sequence, value)
+            for sequence, (value, counter)
+            in enumerate(self.counters.items())
+        ]
+        heapify(self.heap)
+        self.sequence = len(self.heap)
+
+    def least(self) -> tuple:
+        """Returns the heap entry of the least counted value, as
+        ``(count, sequence, value)``.
+        """
+        while True:
+            count, _, value = self.heap[0]
+            current = self.counters[value][0]
+            if count == current:
+                return self.heap[0]
+            heapreplace(self.heap, (current, self.sequence, value))
+            self.sequence += 1
+
+    def add(self, value, count: int = 1):
+        """Adds a value to the sketch.
+
+        :param value: Value to add (must be hashable, see ``hashable``)
+        :param count: Value's number of occurrences
+        """
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[value] = [count, 0]
+            heappush(self.heap, (count, self.sequence, value))
+            self.sequence += 1
+        else:
+            minimum, _, evicted = self.least()
+            del self.counters[evicted]
+            self.counters[value] = [minimum + count, minimum]
+            heapreplace(self.heap, (minimum + count, self.sequence, value))
+            self.sequence += 1
+        self.total += count
+
+    def minimum(self) -> int:
+        """Returns the count of the least counted value if the sketch is
+        full, 0 otherwise.
+        """
+        if len(self.counters) < self.capacity:
+            return 0
+        return self.least()[0]
+
+    def top(self, k: int) -> list:
+        """Returns the ``k`` most counted values, ranked.
+
+        :param k: Number of values to return
+        """
+        return [
+            {'value': value, 'count': count, 'error': error}
+            for value, (count, error)
+            in nlargest(k, self.counters.items(), key=lambda i: i[1][0])
+        ]
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Returns a new sketch which is the union of two sketches.
+
+        Values monitored by only one sketch are given the other
+        sketch's minimum count as (over-estimated) count and error.
+
+        :param other: Sketch to merge with
+        """
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        minimums = (self.minimum(), other.minimum())
+        for value in {**self.counters, **other.counters}:
+            count, error = 0, 0
+            for sketch, minimum in zip((self, other), minimums):
+                counter = sketch.counters.get(value, (minimum, minimum))
+                count += counter[0]
+                error += counter[1]
+            merged.counters[value] = [count, error]
+        # Keep only the most counted values
+        if len(merged.counters) > merged.capacity:
+            merged.counters = dict(nlargest(
+                merged.capacity,
+                merged.counters.items(),
+                key=lambda i: i[1][0]
+            ))
+        merged.total = self.total + other.total
+        merged.index()
+        return merged
+
+    def state(self) -> tuple:
+        """Returns the sketch serialisable state.
+
+        Counters are serialised as lists of ``(value, count, error)``.
+        """
+        return (
+            self.capacity,
+            self.total,
+            [(value, *counter) for value, counter in self.counters.items()]
+        )
+
+    @classmethod
+    def from_state(cls, state) -> 'SpaceSaving':
+        """Rebuilds a sketch from its serialisable state.
+
+        :param state: Sketch state, as returned by ``state``
+        """
+        capacity, total, counters = state
+        sketch = cls(capacity)
+        sketch.total = total
+        sketch.counters = {
+            hashable(value): [count, error]
+            for value, count, error
+            in counters
+        }
+        sketch.index()
+        return sketch
@@ -1,16 +1,45 @@
-from .__base__ import StatsFunction
+from .__base__ import StatsFunction, np
+from .accumulators import KahanSum
 
 
 class Sum(StatsFunction):
-    """Returns the list of unique values for a given field.
+    """Returns the sum of the values of a given field.
+
+    Dataset is a ``KahanSum`` accumulator; values which cannot be
+    converted to ``float`` are ignored.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
-        if not isinstance(dataset, float):
-            dataset = 0.0
-        try:
-            dataset += float(event_value)
-        except Exception:
-            pass
-        return (dataset, dataset)
+    vectorized = True
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, KahanSum):
+            dataset = KahanSum()
+        if isinstance(value, (int, float)):
+            dataset.add(value)
+        else:
+            try:
+                dataset.add(float(value))
+            except (TypeError, ValueError):
+                pass
+        return dataset
+
+    def value(self, dataset):
+        return dataset.value()
+
+    def batch(self, datasets, codes, column, size):
+        return [
+            self.target(dataset, value)
+            for dataset, value
+            in zip(datasets, np.bincount(codes, weights=column, minlength=size).tolist())
+        ]
+
+    def state(self, dataset):
+        return dataset.state() if isinstance(dataset, KahanSum) else None
+
+    def merge(self, state_a, state_b):
+        merged = KahanSum(*state_a)
+        merged.merge(*state_b)
+        return merged.state()
+
+    def result(self, state):
+        return KahanSum(*state).value()
@@ -0,0 +1,44 @@
+from .__base__ import StatsFunction
+from .sketches import SpaceSaving, hashable
+
+
+class TopK(StatsFunction):
+    """Returns the most frequent values of a given field.
+
+    Values are counted in a Space-Saving sketch, which monitors at most
+    ``capacity`` values whatever the field cardinality. The number of
+    values to return is given as the first parameter (defaults to 10)
+    and the sketch capacity as the second one (defaults to four times
+    the number of values), e.g. ``topk(<field>, 20)``.
+
+    Results are ranked by count; each result's ``error`` is the
+    maximum over-estimation of its ``count``.
+
+    Unhashable values are counted in their hashable form (lists as
+    tuples, other values as strings).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.k = len(self.params) and int(self.params[0]) or 10
+        self.capacity = len(self.params) > 1 and int(self.params[1]) or self.k * 4
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, SpaceSaving):
+            dataset = SpaceSaving(self.capacity)
+        dataset.add(hashable(value))
+        return dataset
+
+    def value(self, dataset):
+        return dataset.top(self.k)
+
+    def state(self, dataset):
+        return isinstance(dataset, SpaceSaving) and dataset.state() or None
+
+    def merge(self, state_a, state_b):
+        return SpaceSaving.from_state(state_a).merge(
+            SpaceSaving.from_state(state_b)
+        ).state()
+
+    def result(self, state):
+        return SpaceSaving.from_state(state).top(self.k)
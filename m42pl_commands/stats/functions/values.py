@@ -1,18 +1,34 @@
 from .__base__ import StatsFunction
+from .accumulators import UniqueValues
 
 
 class Values(StatsFunction):
     """Returns the list of unique values for a given field.
+
+    At most 100 values are kept by default; the maximum number of
+    values may be set with ``max``, e.g. ``values(<field>, max=1000)``
+    (``max=0`` for no limit). Further values are ignored.
     """
 
-    async def target(self, event, dataset, pipeline, context):
-        event_value = await self.source_field.read(event, pipeline, context)
-        if not isinstance(dataset, list):
-            dataset = list()
-        if isinstance(event_value, list):
-            for i in event_value:
-                if i not in dataset:
-                    dataset.append(i)
-        elif event_value not in dataset:
-            dataset.append(event_value)
-        return (dataset, dataset)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max = int(self.options.get('max', 100))
+
+    def target(self, dataset, value):
+        if not isinstance(dataset, UniqueValues):
+            dataset = UniqueValues(self.max)
+        if isinstance(value, list):
+            for i in value:
+                dataset.add(i)
+        else:
+            dataset.add(value)
+        return dataset
+
+    def value(self, dataset):
+        return dataset.snapshot() if isinstance(dataset, UniqueValues) else dataset
+
+    def state(self, dataset):
+        return dataset.snapshot() if isinstance(dataset, UniqueValues) else None
+
+    def merge(self, state_a, state_b):
+        return UniqueValues(self.max, [*state_a, *state_b]).snapshot()
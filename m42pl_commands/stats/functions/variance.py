@@ -0,0 +1,20 @@
+from math import sqrt
+
+from .average import Average
+
+
+class Variance(Average):
+    """Returns the sample variance of a given field.
+    """
+
+    def value(self, dataset):
+        return dataset.variance()
+
+
+class Stdev(Average):
+    """Returns the sample standard deviation of a given field.
+    """
+
+    def value(self, dataset):
+        variance = dataset.variance()
+        return variance if variance is None else sqrt(variance)
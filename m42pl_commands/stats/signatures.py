@@ -0,0 +1,71 @@
+"""Group signatures strategies.
+
+A group signature identifies a stats group (i.e. a set of aggregation
+fields values) and is written to the stated events ``sign`` field.
+
+* The ``tuple`` strategy returns the group key as-is; it costs nothing
+  but is only meaningful within the current process.
+* The ``hash`` strategy returns a 64 bits non-cryptographic hash of the
+  group key, which is stable across processes; it should be paid only
+  at the merge boundary (i.e. by ``PostStatsMerge``).
+"""
+
+from hashlib import blake2b
+
+# xxhash is optional: fallback to a 64 bits blake2b digest
+try:
+    import xxhash
+except ImportError:
+    xxhash = None # type: ignore
+
+
+def canonical(value):
+    """Returns a value with its numbers in canonical form, so that the
+    values which are equal in Python (e.g. ``1``, ``1.0`` and ``True``)
+    have the same ``repr``.
+
+    :param value: Value to normalise
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if type(value) in (tuple, list):
+        return type(value)(canonical(item) for item in value)
+    return value
+
+
+def hash64(value) -> int:
+    """Returns a 64 bits hash of a value, stable across processes.
+
+    Equal numbers have the same hash (see ``canonical``).
+
+    :param value: Value to hash
+    """
+    data = repr(canonical(value)).encode()
+    if xxhash:
+        return xxhash.xxh64_intdigest(data)
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'big')
+
+
+def tuple_signature(key: tuple) -> tuple:
+    """Returns the group key itself.
+
+    :param key: Group key
+    """
+    return key
+
+
+def hash_signature(key: tuple) -> str:
+    """Returns a 64 bits hash of the group key.
+
+    :param key: Group key
+    """
+    return f'{hash64(key):016x}'
+
+
+# Signatures strategies mapping
+names = {
+    'tuple': tuple_signature,
+    'hash': hash_signature
+}
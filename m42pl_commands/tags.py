@@ -1,8 +1,10 @@
 from m42pl.commands import StreamingCommand
 from m42pl.fields import Field, FieldsMap
 
+from .projection import Projection, getter, plains
 
-class Tags(StreamingCommand):
+
+class Tags(StreamingCommand, Projection):
     """Tags event.
     """
     _about_     = 'Tags events with key/value pairs'
@@ -26,8 +28,36 @@ class Tags(StreamingCommand):
             ])
         )
         self.tags = Field('tags')
-    
+        # Compiled projection (plain fields paths only)
+        if plains(*kwargs.values()):
+            self.projection = self.compile(kwargs)
+
+    @staticmethod
+    def compile(fields: dict):
+        """Returns the compiled tagging of plain fields paths.
+
+        :param fields: Tags fields paths, by tag name
+        """
+        getters = [(name, getter(path)) for name, path in fields.items()]
+        def tag(event):
+            event['data']['tags'] = {
+                name: get(event['data'])
+                for name, get
+                in getters
+            }
+            return event
+        return tag
+
+    async def setup(self, event, pipeline, context):
+        self.fuse(pipeline)
+
     async def target(self, event, pipeline, context):
+        if self.fused:
+            yield event
+            return
+        if self.projection:
+            yield self.project(event, [self.projection, *self.after])
+            return
         yield await self.tags.write(
             event,
             (await self.fields.read(event, pipeline, context)).__dict__
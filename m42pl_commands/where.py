@@ -1,18 +1,169 @@
+import ast
+import operator
+import re
+from functools import reduce
 from textwrap import dedent
 from collections import OrderedDict
 
-from m42pl.commands import StreamingCommand
+# NumPy is optional: micro-batches are filtered event by event when it
+# is not available
+try:
+    import numpy as np
+except ImportError:
+    np = None # type: ignore
+
+from m42pl.commands import StreamingCommand, DequeBufferingCommand
 from m42pl.utils.eval import Evaluator
 from m42pl.fields import Field
 
+from .batch import Batchable, EventBatch, references
+from .pushdown import Pushdown, predicates
+
+
+# Vectorizable comparison operators
+comparators = {
+    ast.Eq:     operator.eq,
+    ast.NotEq:  operator.ne,
+    ast.Lt:     operator.lt,
+    ast.LtE:    operator.le,
+    ast.Gt:     operator.gt,
+    ast.GtE:    operator.ge
+}
+
+# Columns values types which compare as NumPy arrays as they do in
+# Python (e.g. a mixed int and str column is converted to a str array,
+# where `1 == '1'` becomes true)
+uniform = ({int}, {float}, {int, float}, {bool}, {str})
 
-class Where(StreamingCommand):
+
+def truthy(values):
+    """Returns the truthiness of a NumPy column's values, as in Python
+    (i.e. empty strings and zeros are false).
+
+    :param values: Column values (NumPy array)
+    """
+    if values.dtype.kind == 'U':
+        return np.char.str_len(values) > 0
+    return values != 0
+
+
+def compile_mask(expression: str):
+    """Compiles a simple filter expression to a NumPy mask function.
+
+    Supported expressions are comparisons between top-level fields and
+    constants (``==``, ``!=``, ``<``, ``<=``, ``>`` and ``>=``) and
+    fields truthiness, combined with ``and``, ``or`` and ``not``.
+
+    The returned function takes a column reader (which returns a
+    field's values list) and the number of rows, and returns a boolean
+    mask, or ``None`` if the fields cannot be compared as NumPy arrays
+    (missing values, mixed types, nested values, ...): the caller must
+    then evaluate the expression event by event.
+
+    :param expression: Filter expression
+    :returns: Mask function, or ``None`` if the expression is not
+        supported
+    """
+    if np is None:
+        return None
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return None
+    names = set()
+
+    def kind(value) -> str:
+        """Returns an operand's kind (``U`` for strings, ``n`` for
+        numbers).
+        """
+        if isinstance(value, np.ndarray):
+            return value.dtype.kind == 'U' and 'U' or 'n'
+        return isinstance(value, str) and 'U' or 'n'
+
+    def compare(function, left, right):
+        if kind(left) != kind(right):
+            raise TypeError('incompatible operands')
+        return function(left, right)
+
+    def operand(node):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+            return lambda columns: columns[node.id]
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            return lambda columns: node.value
+        raise ValueError(node)
+
+    def test(node):
+        # Boolean operators
+        if isinstance(node, ast.BoolOp):
+            parts = [test(value) for value in node.values]
+            combine = isinstance(node.op, ast.And) and np.logical_and or np.logical_or
+            return lambda columns: reduce(combine, [part(columns) for part in parts])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            part = test(node.operand)
+            return lambda columns: np.logical_not(part(columns))
+        # Comparisons, including chained ones (e.g. `1 < x < 3`)
+        if isinstance(node, ast.Compare):
+            pairs = []
+            left = operand(node.left)
+            for op, right in zip(node.ops, node.comparators):
+                if type(op) not in comparators:
+                    raise ValueError(op)
+                right = operand(right)
+                pairs.append((comparators[type(op)], left, right))
+                left = right
+            return lambda columns: reduce(np.logical_and, [
+                compare(function, left(columns), right(columns))
+                for function, left, right
+                in pairs
+            ])
+        # Field truthiness
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+            return lambda columns: truthy(columns[node.id])
+        raise ValueError(node)
+
+    try:
+        function = test(tree.body)
+    except ValueError:
+        return None
+
+    def mask(column, size: int):
+        columns = {}
+        for name in names:
+            values = column(name)
+            types = set(map(type, values))
+            if types and types not in uniform:
+                return None
+            columns[name] = np.asarray(values)
+            if columns[name].dtype.kind not in 'biufU':
+                return None
+        try:
+            return np.broadcast_to(function(columns), (size,))
+        except TypeError:
+            return None
+
+    return mask
+
+
+class Where(StreamingCommand, Batchable):
     """Filters event using an evaluation expression.
+
+    When the expression is prefixed with a micro-batch size (e.g.
+    ``where batch=1024 status >= 500``), ``BatchWhere`` is used instead.
+
+    The expression's simple tests are pushed down to the previous
+    command if it supports it (see ``Pushdown``).
+
+    Columnar batches (see ``EventBatch``) are filtered at once, as
+    NumPy masks for simple expressions (see ``compile_mask``) or row by
+    row otherwise, each row's data holding only the fields read by the
+    expression.
     """
 
     _about_     = 'Filter events using an eval expression'
     _aliases_   = ['where', 'filter']
-    _syntax_    = '<expression>'
+    _syntax_    = '[batch=<size>] <expression>'
     _schema_    = {'properties': {}} # type: ignore
 
     _grammar_   = {'start': dedent('''\
@@ -21,18 +172,135 @@ class Where(StreamingCommand):
 
     class Transformer(StreamingCommand.Transformer):
         def start(self, items):
+            match = re.fullmatch(r'\s*batch\s*=(?!=)\s*(\d+)\s+(.+)', str(items[0]), re.S)
+            if match:
+                return (), {
+                    'expression': match.group(2),
+                    'batch': int(match.group(1))
+                }
             return (), {'expression': str(items[0])}
-        
+
+    def __new__(cls, *args, **kwargs):
+        if cls is Where and kwargs.get('batch'):
+            return (BatchWhere(*args, **kwargs), )
+        return super().__new__(cls)
+
     def __init__(self, expression: str):
         """
         :param expression: Conditional expression
         """
         super().__init__(expression)
+        self.expression = expression
         self.expr = Evaluator(expression)
+        self.mask = compile_mask(expression)
+        # Fields read by the expression, for the per-row batches path
+        self.names = references(expression)
+
+    async def setup(self, event, pipeline, context):
+        self.push(pipeline)
+        self.link_batches(pipeline)
+
+    def push(self, pipeline):
+        """Pushes the expression's predicates down to the previous
+        command.
+
+        :param pipeline: Current pipeline
+        """
+        commands = list(getattr(pipeline, 'commands', []))
+        for index, command in enumerate(commands):
+            if command is self:
+                if index > 0 and isinstance(commands[index - 1], Pushdown):
+                    accepted = commands[index - 1].pushdown(predicates(self.expression))
+                    if accepted:
+                        self.logger.info(f'pushed down predicates: {accepted}')
+                break
+
+    def filter_batch(self, batch: EventBatch) -> EventBatch:
+        """Selects a batch's rows which matches the expression.
+
+        :param batch: Batch to filter
+        """
+        mask = self.mask and self.mask(batch.column, len(batch))
+        if mask is None:
+            mask = [self.expr(data) for _, data in batch.records(self.names)]
+        batch.select(mask)
+        return batch
 
     async def target(self, event, pipeline, context):
+        if isinstance(event, EventBatch):
+            async for next_event in self.emit_batch(self.filter_batch(event)):
+                yield next_event
+            return
         try:
             if self.expr(event['data']):
                 yield event
         except Exception:
             raise
+
+
+class BatchWhere(Where, DequeBufferingCommand):
+    """Filters micro-batches of events.
+
+    Simple expressions (see ``compile_mask``) are evaluated as NumPy
+    masks over the micro-batch columns; other expressions, and
+    micro-batches which cannot be converted to arrays, are filtered
+    event by event.
+    """
+
+    _about_     = 'Filter events micro-batches using an eval expression'
+    _aliases_   = ['_batch_where', ]
+    _syntax_    = Where._syntax_
+    _schema_    = Where._schema_
+
+    def __init__(self, expression: str, batch: int = 1024):
+        """
+        :param expression:  Conditional expression
+        :param batch:       Micro-batch size
+        """
+        super().__init__(expression)
+        self.batch = Field(batch, default=1024, type=int)
+
+    async def setup(self, event, pipeline, context):
+        await DequeBufferingCommand.setup(
+            self,
+            event,
+            pipeline,
+            context,
+            await self.batch.read(event, pipeline, context)
+        )
+        self.push(pipeline)
+        self.link_batches(pipeline)
+
+    async def target(self, pipeline):
+        events = []
+        async for event in DequeBufferingCommand.target(self, pipeline):
+            if isinstance(event, EventBatch):
+                async for next_event in self.filter_events(events):
+                    yield next_event
+                async for next_event in self.emit_batch(self.filter_batch(event)):
+                    yield next_event
+                events = []
+            else:
+                events.append(event)
+        async for next_event in self.filter_events(events):
+            yield next_event
+
+    async def filter_events(self, events: list):
+        """Yields the events which matches the expression.
+
+        :param events: Events to filter
+        """
+        mask = self.mask and self.mask(
+            lambda name: [event['data'].get(name) for event in events],
+            len(events)
+        )
+        # Vectorized path
+        if mask is not None:
+            for event, keep in zip(events, mask):
+                if keep:
+                    yield event
+        # Per-event path
+        else:
+            for event in events:
+                if self.expr(event['data']):
+                    yield event
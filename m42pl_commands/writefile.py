@@ -8,8 +8,10 @@ from m42pl.event import Event
 from m42pl.fields import Field
 from m42pl.utils import formatters
 
+from .batch import Batchable, EventBatch
 
-class _Write(StreamingCommand):
+
+class _Write(StreamingCommand, Batchable):
     """Base class for ``write`` commands.
 
     Commands themselves are defined at the end of this module.
@@ -70,7 +72,22 @@ class _Write(StreamingCommand):
             return await self.field.read(event, pipeline, context)
         return self.formatter(event)
 
+    async def setup(self, event, pipeline, context):
+        self.link_batches(pipeline)
+
     async def target(self, event, pipeline, context):
+        if isinstance(event, EventBatch):
+            for row in event.events():
+                await self.write(row, pipeline, context)
+            async for next_event in self.emit_batch(event):
+                yield next_event
+        else:
+            await self.write(event, pipeline, context)
+            yield event
+
+    async def write(self, event, pipeline, context):
+        """Writes an event to its file.
+        """
         # Get data and deduce open mode first
         data = await self.format(event, pipeline, context)
         mode = isinstance(data, bytes) and self.mode + 'b' or self.mode
@@ -91,8 +108,6 @@ class _Write(StreamingCommand):
         #     self.cache[path].write(data)
         # else:
         #     print(data, file=self.cache[path])
-        # Done
-        yield event
 
     def cleanup(self):
         """Closes the open file descriptors.
@@ -5,11 +5,15 @@ import zmq
 from m42pl.commands import GeneratingCommand
 from m42pl.fields import Field
 
+from ..pushdown import Pushdown
 from .__base__ import Consumer
 
 
-class Subscribe(Consumer):
+class Subscribe(Consumer, Pushdown):
     """Receives ZMQ messages and yields events.
+
+    When no topic is given, a topic equality or prefix test pushed down
+    by a following ``where`` is used as the subscription topic.
     """
 
     _aliases_   = ['zmq_sub', 'zmq_subscribe']
@@ -32,12 +36,32 @@ class Subscribe(Consumer):
         self.args.update(**{
             'topic': Field(topic, default=['', ], seqn=True)
         })
+        # Pushed-down topic prefix and subscribed topics
+        self.pushed = None # type: str|None
+        self.topics = [] # type: list[str]
+
+    def pushdown(self, predicates: list) -> list:
+        for predicate in predicates:
+            path, operator, const = predicate
+            if (path == f'{self.field.name}.topic'
+                    and operator in ('==', 'startswith')):
+                self.pushed = const
+                # Already subscribed to all topics: narrow subscription
+                if self.topics == ['', ]:
+                    self.socket.setsockopt_string(zmq.SUBSCRIBE, const)
+                    self.socket.setsockopt_string(zmq.UNSUBSCRIBE, '')
+                    self.topics = [const, ]
+                return [predicate, ]
+        return []
 
     async def setup(self, event, pipeline, context):
         await super().setup(zmq.SUB, event, pipeline, context)
         # Configure topic (envelope filtering)
-        self.logger.info(f'registering topics: {self.args.topic}')
-        for topic in self.args.topic:
+        self.topics = list(self.args.topic)
+        if self.topics == ['', ] and self.pushed is not None:
+            self.topics = [self.pushed, ]
+        self.logger.info(f'registering topics: {self.topics}')
+        for topic in self.topics:
             self.socket.setsockopt_string(zmq.SUBSCRIBE, topic)
     
     async def target(self, event, pipeline, context):
@@ -19,5 +19,9 @@ setup(
     'jinja2>=3.0.3',
     'tabulate>=0.8.9',
     'types-tabulate>=0.8.3'
-  ]
+  ],
+  extras_require={
+    'numpy': ['numpy>=1.21'],
+    'xxhash': ['xxhash>=3.0']
+  }
 )
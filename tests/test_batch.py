@@ -0,0 +1,84 @@
+import unittest
+from textwrap import dedent
+
+from m42pl.utils.unittest import BufferingCommand, TestScript
+from m42pl.event import Event
+
+from m42pl_commands.batch import EventBatch
+
+
+class Batch(unittest.TestCase, BufferingCommand):
+    """Test unit for the `batch` command.
+
+    The batches go through batch-aware commands and must yield the same
+    events as the per-event pipeline.
+    """
+
+    command_alias = 'batch'
+    script_begin = dedent('''\
+        | make count=5 showinfo=yes
+        | eval x = id * 2
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='round_trip',
+            source=dedent('''\
+                | batch 2
+                | unbatch
+            '''),
+            expected=[Event({'id': i, 'x': i * 2}) for i in range(5)],
+            fields_in=['id', 'x']
+        ),
+
+        TestScript(
+            name='batch_aware_commands',
+            source=dedent('''\
+                | batch 2
+                | eval y = x + 1
+                | where y > 3
+                | unbatch
+            '''),
+            expected=[Event({'id': i, 'x': i * 2, 'y': i * 2 + 1}) for i in range(2, 5)],
+            fields_in=['id', 'x', 'y']
+        ),
+
+    ]
+
+
+class Columns(unittest.TestCase):
+    """Test unit for the `EventBatch` columns.
+    """
+
+    def events(self) -> list:
+        return [
+            Event({'a': 1, 'b': {'c': 'x'}}, meta={'m': 0}, sign='s0'),
+            Event({'a': 2}, sign='s1'),
+            Event({'b': {'c': 'z'}}, meta={'m': 2}),
+        ]
+
+    def test_round_trip(self):
+        events = self.events()
+        rows = list(EventBatch.from_events(events).events())
+        self.assertEqual([row['data'] for row in rows], [e['data'] for e in events])
+        self.assertEqual([row['meta'] for row in rows], [e['meta'] or {} for e in events])
+        self.assertEqual([row['sign'] for row in rows], [e['sign'] for e in events])
+
+    def test_selection(self):
+        batch = EventBatch.from_events(self.events())
+        batch.select([True, False, True])
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.column('b.c', None), ['x', 'z'])
+        batch.assign('d', [10, 30])
+        self.assertEqual(
+            [index for index, _ in batch.records({'d'})],
+            [0, 2]
+        )
+        self.assertEqual(
+            [row['data'] for row in batch.events()],
+            [{'a': 1, 'b': {'c': 'x'}, 'd': 10}, {'b': {'c': 'z'}, 'd': 30}]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from m42pl.event import Event
+
+from m42pl_commands.compact import Compact
+
+
+class Compaction(unittest.TestCase):
+    """Test unit for the `compact` command's flushes.
+    """
+
+    def run_compact(self, signs: str, times: list = None, **kwargs) -> list:
+        """Returns the events values yield after each event (and at the
+        pipeline's end), for events with the given signatures received
+        at the given times (in seconds).
+        """
+        times = times or [0] * (len(signs) + 1)
+        clock = [0]
+        async def run():
+            command = Compact(**kwargs)
+            await command.setup(Event(), None, None)
+            flushes = []
+            events = [Event({'v': i}, sign=sign) for i, sign in enumerate(signs)]
+            for now, event, ending in zip(
+                    times,
+                    [*events, None],
+                    [*(False for _ in events), True]):
+                clock[0] = now
+                flushes.append([
+                    next_event['data']['v']
+                    async for next_event
+                    in command(event, None, None, ending)
+                ])
+            return flushes
+        with mock.patch('m42pl_commands.compact.monotonic', lambda: clock[0]):
+            return asyncio.run(run())
+
+    def test_size(self):
+        self.assertEqual(
+            self.run_compact('abacab', size=3),
+            [[], [], [2, 1], [], [], [3, 4, 5], []]
+        )
+
+    def test_interval(self):
+        self.assertEqual(
+            self.run_compact('abab', times=[1, 5, 12, 13, 14], interval=10),
+            [[], [], [2, 1], [], [3]]
+        )
+        # An idle stream is only flushed at the pipeline's end
+        self.assertEqual(
+            self.run_compact('aba', times=[1, 5, 8, 60], interval=10),
+            [[], [], [], [2, 1]]
+        )
+
+    def test_final(self):
+        self.assertEqual(
+            self.run_compact('abacab'),
+            [[], [], [], [], [], [], [4, 5, 3]]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
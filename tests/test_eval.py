@@ -1,9 +1,12 @@
 import unittest
+import asyncio
 from textwrap import dedent
 
 from m42pl.utils.unittest import StreamingCommand, TestScript
 from m42pl.event import Event
 
+from m42pl_commands.eval import Eval as EvalCommand
+
 
 class Eval(unittest.TestCase, StreamingCommand):
     """Test unit for the `eval` command.
@@ -90,10 +93,89 @@ class Eval(unittest.TestCase, StreamingCommand):
             expected=[Event({
                 'result': 42
             })]
+        ),
+
+        TestScript(
+            name='fused_failure',
+            source=dedent('''\
+                | make count=3 showinfo=yes
+                | eval a = 10 / (id - 1), b = id + 1, c = tostring(id)
+            '''),
+            expected=[
+                Event({'id': 0, 'a': -10.0, 'b': 1, 'c': '0'}),
+                Event({'id': 1, 'a': None, 'b': 2, 'c': '1'}),
+                Event({'id': 2, 'a': 10.0, 'b': 3, 'c': '2'})
+            ],
+            fields_in=['id', 'a', 'b', 'c']
         )
 
     ]
 
 
+class Fusion(unittest.TestCase):
+    """Test unit for the `eval` command's fused stages.
+
+    A fused stage must yield the same events as one `eval` per
+    assignment, even when some of its assignments fail.
+    """
+
+    fields = {
+        'a': '10 / (id - 1)',
+        'b': 'id * 2',
+        'c': 'tostring(b)',
+        'd': 'a + b'
+    }
+
+    def run_evals(self, commands: list, events: list) -> list:
+        async def run():
+            for command in commands:
+                for event in events:
+                    async for _ in command.target(event, None, None):
+                        pass
+        asyncio.run(run())
+        return [event['data'] for event in events]
+
+    def test_stages(self):
+        command = EvalCommand(self.fields)
+        # `c` reads `b` and `d` reads `a`: two stages of two assignments
+        self.assertEqual(
+            [[field.name for field, *_ in stage[1]] for stage in command.stages],
+            [['a', 'b'], ['c', 'd']]
+        )
+
+    def test_parity(self):
+        fused = self.run_evals(
+            [EvalCommand(self.fields)],
+            [Event({'id': i}) for i in range(4)]
+        )
+        unfused = self.run_evals(
+            [EvalCommand({field: expr}) for field, expr in self.fields.items()],
+            [Event({'id': i}) for i in range(4)]
+        )
+        self.assertEqual(fused, unfused)
+        self.assertIsNone(fused[1]['a'])
+        self.assertEqual(fused[1]['b'], 2)
+
+    def test_failure_keeps_stage(self):
+        command = EvalCommand({'a': '1 / id', 'b': 'id + 1'})
+        events = self.run_evals([command], [Event({'id': i}) for i in range(3)])
+        self.assertEqual(
+            [(data['a'], data['b']) for data in events],
+            [(None, 1), (1.0, 2), (0.5, 3)]
+        )
+        # The stage is still fused after the failure
+        self.assertIsNotNone(command.stages[0][0])
+
+    def test_evaluated_once(self):
+        calls = []
+        command = EvalCommand({
+            'a': 'calls.append(0) or 1',
+            'b': '1 / id',
+            'c': 'calls.append(0) or 3'
+        })
+        self.run_evals([command], [Event({'id': 0, 'calls': calls})])
+        self.assertEqual(len(calls), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
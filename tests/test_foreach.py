@@ -0,0 +1,44 @@
+import unittest
+from textwrap import dedent
+
+from m42pl.utils.unittest import StreamingCommand, TestScript
+from m42pl.event import Event
+
+
+class Foreach(unittest.TestCase, StreamingCommand):
+    """Test unit for the `foreach` command.
+    """
+
+    command_alias = 'foreach'
+    script_begin = dedent('''\
+        | make count=6 showinfo=yes
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='sequential',
+            source=dedent('''\
+                | foreach [
+                    | eval y = id * 2
+                ]
+            '''),
+            expected=[Event({'id': i, 'y': i * 2}) for i in range(6)],
+            fields_in=['id', 'y']
+        ),
+
+        TestScript(
+            name='concurrent_ordered',
+            source=dedent('''\
+                | foreach concurrency=3 [
+                    | eval y = id * 2
+                ]
+            '''),
+            expected=[Event({'id': i, 'y': i * 2}) for i in range(6)],
+            fields_in=['id', 'y']
+        ),
+
+    ]
+
+
+if __name__ == '__main__':
+    unittest.main()
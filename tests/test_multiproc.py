@@ -0,0 +1,146 @@
+import unittest
+import asyncio
+import multiprocessing
+
+from m42pl.event import Event
+
+from m42pl_commands.multiproc_comm import (
+    SharedRing, MultiprocSend, MultiprocReceive, pack_batch, unpack_batch,
+    attach
+)
+
+
+def write_frames(ring: SharedRing, writer: int, count: int):
+    """Writes ``count`` frames by batches of 7, then a sentinel.
+    """
+    frames = [f'{writer}:{i}'.encode() for i in range(count)]
+    for start in range(0, count, 7):
+        ring.put_many(frames[start:start + 7])
+    ring.put((writer, 3))
+
+
+def read_frame(ring: SharedRing):
+    """Reads the ring's frames (and becomes its reader).
+    """
+    ring.get_many()
+    ring.close()
+
+
+class Framing(unittest.TestCase):
+    """Test unit for the multiprocessing batch frames and shared ring.
+    """
+
+    def test_batch_round_trip(self):
+        for count, size in ((1, 0), (15, 255), (16, 256), (300, 3), (2, 70000)):
+            frames = [bytes([i % 256]) * size for i in range(count)]
+            self.assertEqual(unpack_batch(pack_batch(frames)), frames)
+
+    def test_not_a_batch(self):
+        # A msgpack map (i.e. a single encoded event)
+        self.assertIsNone(unpack_batch(b'\x81\xa1a\x01'))
+        # An array of integers
+        self.assertIsNone(unpack_batch(b'\x92\x01\x02'))
+
+    def test_ring_round_trip(self):
+        ring = SharedRing(size=64)
+        try:
+            received = []
+            # Frames wrap around the buffer's end
+            for i in range(20):
+                ring.put_many([bytes([i]) * 10, (i, 20)])
+                received += ring.get_many()
+            self.assertEqual(
+                received,
+                [item for i in range(20) for item in (bytes([i]) * 10, (i, 20))]
+            )
+        finally:
+            ring.close()
+
+    def test_ring_frame_too_large(self):
+        ring = SharedRing(size=64)
+        try:
+            with self.assertRaises(Exception):
+                ring.put(b'x' * 64)
+        finally:
+            ring.close()
+
+    def test_send_receive(self):
+        async def run(batch: int, interval: float):
+            chan = multiprocessing.Queue()
+            send, receive = MultiprocSend(chan, batch, interval), MultiprocReceive(chan)
+            for i in range(50):
+                async for _ in send.target(Event({'i': i}), None, None):
+                    pass
+            await send.__aexit__()
+            return [
+                event['data']['i']
+                async for event
+                in receive.target(None, None, None)
+            ]
+        for batch, interval in ((1, 0), (16, 0), (7, 10)):
+            self.assertEqual(asyncio.run(run(batch, interval)), list(range(50)))
+
+
+class Ring(unittest.TestCase):
+    """Test unit for the shared memory ring across processes.
+    """
+
+    def test_writers(self):
+        # The ring is much smaller than the frames: writers wait for
+        # the reader and the frames wrap around the buffer's end
+        ring = SharedRing(size=128, lock=True)
+        try:
+            writers = [
+                multiprocessing.Process(target=write_frames, args=(ring, writer, 300))
+                for writer in range(3)
+            ]
+            for writer in writers:
+                writer.start()
+            received, sentinels = {0: [], 1: [], 2: []}, 0
+            while sentinels < 3:
+                for item in ring.get_many():
+                    if isinstance(item, tuple):
+                        sentinels += 1
+                    else:
+                        writer, i = item.decode().split(':')
+                        received[int(writer)].append(int(i))
+            for writer in writers:
+                writer.join()
+            # Each writer's frames are received in order
+            self.assertEqual(received, {w: list(range(300)) for w in range(3)})
+        finally:
+            ring.close()
+
+    def test_single_reader(self):
+        ring = SharedRing(size=64)
+        try:
+            ring.put(b'a')
+            reader = multiprocessing.Process(target=read_frame, args=(ring, ))
+            reader.start()
+            reader.join()
+            self.assertEqual(reader.exitcode, 0)
+            ring.put(b'b')
+            with self.assertRaises(Exception):
+                ring.get_many()
+        finally:
+            ring.close()
+
+    def test_owner_unlinks(self):
+        ring = SharedRing(size=64)
+        name = ring.shm.name
+        try:
+            # A process which attaches to the ring does not destroy it
+            reader = multiprocessing.Process(target=read_frame, args=(ring, ))
+            ring.put(b'a')
+            reader.start()
+            reader.join()
+            attached = attach(name)
+            attached.close()
+        finally:
+            ring.close()
+        with self.assertRaises(FileNotFoundError):
+            attach(name)
+
+
+if __name__ == '__main__':
+    unittest.main()
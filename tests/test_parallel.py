@@ -0,0 +1,149 @@
+import unittest
+import asyncio
+import types
+from textwrap import dedent
+
+from m42pl.utils.unittest import StreamingCommand, TestScript
+from m42pl.event import Event
+
+from m42pl_commands.parallel import Parallel
+
+
+class Runner:
+    """Branch runner which yields ``count`` results per event, waiting
+    ``delay`` seconds before each, and fails on the event ``fail``.
+
+    At the pipeline's end, the runner yields the number of events it
+    has received.
+    """
+
+    def __init__(self, count: int = 1, delay: float = 0, fail: int|None = None):
+        self.count = count
+        self.delay = delay
+        self.fail = fail
+        self.received = 0
+
+    async def __call__(self, event):
+        if event is None:
+            yield Event({'received': self.received})
+            return
+        self.received += 1
+        if event['data']['id'] == self.fail:
+            raise Exception(f'Branch failed on event {self.fail}')
+        for i in range(self.count):
+            await asyncio.sleep(self.delay)
+            yield Event({'id': event['data']['id'], 'i': i})
+
+
+class Tasks(unittest.TestCase):
+    """Test unit for the `parallel` command's task mode.
+    """
+
+    async def start(self, *runners, **kwargs) -> Parallel:
+        command = Parallel([], **kwargs)
+        command.runners = list(runners)
+        await command.setup(Event({}), None, types.SimpleNamespace(pipelines={}))
+        return command
+
+    async def send(self, command: Parallel, count: int) -> list:
+        results = []
+        for i in range(count):
+            async for event in command.target(Event({'id': i}), None, None):
+                results.append(event)
+        async for event in command.collect(0):
+            results.append(event)
+        return results
+
+    def test_results(self):
+        async def run():
+            command = await self.start(Runner(1), Runner(2), depth=2)
+            try:
+                results = await self.send(command, 3)
+                await command.end()
+                async for event in command.collect(0):
+                    results.append(event)
+                await command.close()
+            finally:
+                await command.__aexit__()
+            return command, results
+        command, results = asyncio.run(run())
+        self.assertEqual(
+            sorted(
+                (event['data']['id'], event['data']['i'])
+                for event in results
+                if 'received' not in event['data']
+            ),
+            sorted([(i, 0) for i in range(3)] + [(i, j) for i in range(3) for j in range(2)])
+        )
+        # Each branch has been ended after its events
+        self.assertEqual(
+            [event['data']['received'] for event in results[-2:]],
+            [3, 3]
+        )
+        self.assertTrue(all(task.done() for task in command.tasks))
+
+    def test_error(self):
+        async def run():
+            command = await self.start(Runner(1), Runner(1, fail=1))
+            try:
+                with self.assertRaisesRegex(Exception, 'failed on event 1'):
+                    await self.send(command, 3)
+            finally:
+                await command.__aexit__()
+            return command
+        command = asyncio.run(run())
+        self.assertTrue(all(task.done() for task in command.tasks))
+
+    def test_cancel(self):
+        async def run():
+            command = await self.start(Runner(1, delay=10), Runner(1, delay=10))
+            sending = asyncio.create_task(self.send(command, 3))
+            await asyncio.sleep(0.05)
+            sending.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await sending
+            await asyncio.wait_for(command.__aexit__(), 1)
+            return command
+        command = asyncio.run(run())
+        self.assertTrue(all(task.done() for task in command.tasks))
+
+
+class Processes(unittest.TestCase, StreamingCommand):
+    """Test unit for the `parallel` command's process mode.
+
+    A single worker process keeps the results in the events order.
+    """
+
+    command_alias = 'parallel'
+    script_begin = dedent('''\
+        | make count=5 showinfo=yes
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='process_queue',
+            source=dedent('''\
+                | parallel mode=process [
+                    | eval y = id * 2
+                ]
+            '''),
+            expected=[Event({'id': i, 'y': i * 2}) for i in range(5)],
+            fields_in=['id', 'y']
+        ),
+
+        TestScript(
+            name='process_ring_batch',
+            source=dedent('''\
+                | parallel mode=process channel=ring batch=4 [
+                    | eval y = id * 2
+                ]
+            '''),
+            expected=[Event({'id': i, 'y': i * 2}) for i in range(5)],
+            fields_in=['id', 'y']
+        ),
+
+    ]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import asyncio
+import os
+import subprocess
+import sys
+
+from m42pl.event import Event
+
+from m42pl_commands.partition import Partition
+from m42pl_commands.stats.signatures import hash64
+
+
+class Partitioning(unittest.TestCase):
+    """Test unit for the `partition` command's events routing.
+    """
+
+    def route(self, key, count: int = 4) -> int:
+        command = Partition('k', count, 'main')
+        command.count = count
+        return asyncio.run(command.route(Event({'k': key}), None, None))[0]
+
+    def test_route(self):
+        for key in ('a', 42, 1.5, ('a', 1)):
+            self.assertEqual(self.route(key), hash64(key) % 4)
+            self.assertEqual(self.route(key), self.route(key))
+
+    def test_equal_numbers(self):
+        self.assertEqual(self.route(1), self.route(1.0))
+        self.assertEqual(self.route(1), self.route(True))
+        self.assertEqual(hash64((1, 'a')), hash64((1.0, 'a')))
+        self.assertNotEqual(hash64(1), hash64(1.5))
+
+    def test_unhashable_keys(self):
+        for key in (['a', 1], {'a': 1}):
+            self.assertIn(self.route(key), range(4))
+
+    def test_stable_across_processes(self):
+        code = (
+            'from m42pl_commands.stats.signatures import hash64; '
+            'print(hash64("key"))'
+        )
+        outputs = {
+            subprocess.check_output(
+                [sys.executable, '-c', code],
+                env={**os.environ, 'PYTHONHASHSEED': seed}
+            )
+            for seed in ('1', '2')
+        }
+        self.assertEqual(len(outputs), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
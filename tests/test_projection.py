@@ -0,0 +1,122 @@
+import unittest
+import asyncio
+import copy
+import types
+
+from m42pl.event import Event
+
+from m42pl_commands.projection import getter, setter, deleter
+from m42pl_commands.fields import Fields
+from m42pl_commands.rename import Rename
+from m42pl_commands.tags import Tags
+
+
+class Accessors(unittest.TestCase):
+    """Test unit for the compiled dict-path accessors.
+    """
+
+    def test_getter(self):
+        data = {'a': 1, 'b': {'c': 2}, 'd': 3}
+        self.assertEqual(getter('a')(data), 1)
+        self.assertEqual(getter('b.c')(data), 2)
+        self.assertIsNone(getter('x')(data))
+        self.assertIsNone(getter('b.x.y')(data))
+        self.assertIsNone(getter('d.x')(data))
+
+    def test_setter(self):
+        data = {'d': 3}
+        setter('a')(data, 1)
+        setter('b.c')(data, 2)
+        setter('d.e')(data, 4)
+        self.assertEqual(data, {'a': 1, 'b': {'c': 2}, 'd': {'e': 4}})
+
+    def test_deleter(self):
+        data = {'a': 1, 'b': {'c': 2, 'e': 3}, 'd': 3}
+        deleter('b.c')(data)
+        deleter('x.y')(data)
+        deleter('d.x')(data)
+        deleter('a')(data)
+        self.assertEqual(data, {'b': {'e': 3}, 'd': 3})
+
+
+class Projections(unittest.TestCase):
+    """Test unit for the `fields`, `rename` and `tags` projections.
+
+    The compiled and fused projections must give the same events as the
+    ``Field`` API.
+    """
+
+    events = [
+        {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': 'x'},
+        {'a': 4, 'e': 'y'},
+        {'b': {'d': 5}},
+    ]
+
+    def commands(self) -> list:
+        return [
+            Rename([('a', 'z'), ('b.c', 'y.c')]),
+            Fields('-', ['b.d']),
+            Tags(first='z', second='y.c'),
+            Fields('+', ['z', 'y', 'tags']),
+        ]
+
+    def run_commands(self, commands: list) -> list:
+        async def run():
+            results = []
+            for data in copy.deepcopy(self.events):
+                events = [Event(data, sign=None)]
+                for command in commands:
+                    events = [
+                        next_event
+                        for event in events
+                        async for next_event
+                        in command.target(event, None, None)
+                    ]
+                results += [event['data'] for event in events]
+            return results
+        return asyncio.run(run())
+
+    def test_compiled(self):
+        commands = self.commands()
+        self.assertTrue(all(command.projection for command in commands))
+        compiled = self.run_commands(commands)
+        # Field API
+        commands = self.commands()
+        for command in commands:
+            command.projection = None
+            if isinstance(command, Fields):
+                command.filter = command.mode.name == '+' and command.keep or command.remove
+        self.assertEqual(compiled, self.run_commands(commands))
+        self.assertEqual(compiled[0], {
+            'z': 1,
+            'y': {'c': 2},
+            'tags': {'first': 1, 'second': 2}
+        })
+
+    def test_fused(self):
+        unfused = self.run_commands(self.commands())
+        commands = self.commands()
+        pipeline = types.SimpleNamespace(commands=commands)
+        for command in commands:
+            command.fuse(pipeline)
+        self.assertEqual(
+            [command.fused for command in commands],
+            [False, True, True, True]
+        )
+        self.assertEqual(len(commands[0].after), 3)
+        self.assertEqual(self.run_commands(commands), unfused)
+
+    def test_not_plain(self):
+        commands = [Fields('+', ['a', '{b}']), Rename([('a', 'b'), ('{c}', 'd')])]
+        self.assertTrue(all(command.projection is None for command in commands))
+        # Runs are broken by the commands which are not compiled
+        commands = [Rename([('a', 'b')]), Tags(t='{c}'), Fields('-', ['b'])]
+        pipeline = types.SimpleNamespace(commands=commands)
+        for command in commands:
+            command.fuse(pipeline)
+        self.assertEqual(commands[0].after, [])
+        self.assertFalse(commands[2].fused)
+
+
+if __name__ == '__main__':
+    unittest.main()
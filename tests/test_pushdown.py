@@ -0,0 +1,38 @@
+import unittest
+
+from m42pl_commands.pushdown import predicates
+from m42pl_commands.readlines import ReadLines
+
+
+class Pushdown(unittest.TestCase):
+    """Test unit for the predicates pushdown.
+    """
+
+    def test_predicates(self):
+        self.assertEqual(
+            predicates("line.text == 'a' and 'b' in line.text and x > 1"),
+            [('line.text', '==', 'a'), ('line.text', 'in', 'b')]
+        )
+        self.assertEqual(
+            predicates("line.text.startswith('#')"),
+            [('line.text', 'startswith', '#')]
+        )
+
+    def test_or_is_not_pushed(self):
+        self.assertEqual(predicates("line.text == 'a' or x == 'b'"), [])
+
+    def test_readlines_filters(self):
+        command = ReadLines('/dev/null')
+        accepted = command.pushdown(predicates(
+            "'b' in line.text and other == 'c'"
+        ))
+        self.assertEqual(accepted, [('line.text', 'in', 'b')])
+        # Pushing again replaces the filters
+        command.pushdown(predicates("'b' in line.text"))
+        self.assertEqual(len(command.filters), 1)
+        self.assertTrue(command.filters[0]('abc'))
+        self.assertFalse(command.filters[0]('xyz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
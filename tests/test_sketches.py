@@ -0,0 +1,163 @@
+import unittest
+import random
+
+from m42pl_commands.stats.functions.sketches import (
+    HyperLogLog, DDSketch, SpaceSaving
+)
+
+
+class HyperLogLogSketch(unittest.TestCase):
+    """Test unit for the HyperLogLog sketch.
+    """
+
+    def sketch(self, values) -> HyperLogLog:
+        sketch = HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_small_cardinality(self):
+        self.assertEqual(self.sketch([]).cardinality(), 0)
+        self.assertEqual(self.sketch(['a', 'b', 'a', 1, 1]).cardinality(), 3)
+
+    def test_error_bound(self):
+        # Relative standard error is ~1.6%: allow 4 standard errors
+        for count in (1000, 50000):
+            estimate = self.sketch(range(count)).cardinality()
+            self.assertLess(abs(estimate - count) / count, 0.065)
+
+    def test_merge(self):
+        left, right = self.sketch(range(0, 6000)), self.sketch(range(4000, 10000))
+        merged = left.merge(right)
+        self.assertEqual(
+            merged.cardinality(),
+            self.sketch(range(10000)).cardinality()
+        )
+        self.assertEqual(
+            HyperLogLog.from_state(merged.state()).cardinality(),
+            merged.cardinality()
+        )
+
+    def test_merge_precision(self):
+        with self.assertRaises(Exception):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+
+class DDSketchSketch(unittest.TestCase):
+    """Test unit for the DDSketch quantiles sketch.
+    """
+
+    def sketch(self, values) -> DDSketch:
+        sketch = DDSketch()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertAccurate(self, sketch: DDSketch, values: list):
+        values = sorted(values)
+        for q in (0, 0.1, 0.5, 0.9, 0.99, 1):
+            expected = values[int(q * (len(values) - 1))]
+            self.assertLessEqual(
+                abs(sketch.quantile(q) - expected),
+                sketch.accuracy * abs(expected) + 1e-9
+            )
+
+    def test_empty(self):
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+    def test_relative_accuracy(self):
+        rng = random.Random(42)
+        values = [rng.lognormvariate(0, 2) * rng.choice((-1, 1)) for _ in range(5000)]
+        values += [0.0] * 100
+        self.assertAccurate(self.sketch(values), values)
+
+    def test_merge(self):
+        rng = random.Random(7)
+        left = [rng.uniform(1, 1000) for _ in range(2000)]
+        right = [rng.uniform(-50, 5000) for _ in range(3000)]
+        merged = self.sketch(left).merge(self.sketch(right))
+        self.assertEqual(merged.count, 5000)
+        self.assertAccurate(merged, left + right)
+        self.assertAccurate(DDSketch.from_state(merged.state()), left + right)
+
+    def test_collapse(self):
+        sketch = DDSketch(max_buckets=16)
+        for value in range(1, 10000):
+            sketch.add(value)
+        self.assertLessEqual(len(sketch.positive), 16)
+        self.assertEqual(sketch.count, 9999)
+        # The highest quantiles are still accurate
+        self.assertLessEqual(abs(sketch.quantile(1) - 9999), 9999 * sketch.accuracy)
+
+
+class SpaceSavingSketch(unittest.TestCase):
+    """Test unit for the Space-Saving top-k sketch.
+    """
+
+    def stream(self, seed: int) -> list:
+        rng = random.Random(seed)
+        return [int(rng.paretovariate(1)) for _ in range(5000)]
+
+    def sketch(self, values) -> SpaceSaving:
+        sketch = SpaceSaving(16)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertBounded(self, sketch: SpaceSaving, values: list):
+        counts = {value: values.count(value) for value in set(values)}
+        self.assertEqual(sketch.total, len(values))
+        self.assertLessEqual(len(sketch.counters), sketch.capacity)
+        for value, (count, error) in sketch.counters.items():
+            self.assertLessEqual(count - error, counts[value])
+            self.assertLessEqual(counts[value], count)
+        # Values above `total / capacity` are always monitored
+        for value, count in counts.items():
+            if count > len(values) / sketch.capacity:
+                self.assertIn(value, sketch.counters)
+
+    def test_bounds(self):
+        values = self.stream(1)
+        sketch = self.sketch(values)
+        self.assertBounded(sketch, values)
+        self.assertEqual(sketch.top(1)[0]['value'], 1)
+
+    def test_eviction(self):
+        # Same counts as a linear scan for the least counted value
+        values = self.stream(4)
+        counters = {}
+        for value in values:
+            if value in counters:
+                counters[value] += 1
+            elif len(counters) < 16:
+                counters[value] = 1
+            else:
+                evicted = min(counters, key=counters.get)
+                counters[value] = counters.pop(evicted) + 1
+        self.assertEqual(
+            sorted(count for count, _ in self.sketch(values).counters.values()),
+            sorted(counters.values())
+        )
+
+    def test_merge(self):
+        left, right = self.stream(2), self.stream(3)
+        merged = self.sketch(left).merge(self.sketch(right))
+        self.assertBounded(merged, left + right)
+        # The merged sketch keeps counting
+        for value in right:
+            merged.add(value)
+        self.assertBounded(merged, left + right + right)
+
+    def test_state(self):
+        sketch = SpaceSaving(4)
+        for value in (('a', 1), ('a', 1), 'b'):
+            sketch.add(value)
+        # Tuples are decoded as lists from serialised states
+        state = [[list(value) if isinstance(value, tuple) else value, *rest]
+                    for value, *rest in sketch.state()[2]]
+        restored = SpaceSaving.from_state((4, sketch.total, state))
+        self.assertEqual(restored.top(1), sketch.top(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
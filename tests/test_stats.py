@@ -0,0 +1,529 @@
+import unittest
+import asyncio
+import random
+import statistics
+from hashlib import blake2b
+from textwrap import dedent
+from unittest import mock
+
+from m42pl.utils.unittest import StreamingCommand, TestScript
+from m42pl.event import Event
+from m42pl.fields import Field
+
+from m42pl_commands.stats import StreamStats, WindowStreamStats, PostStatsMerge, StatsTable
+from m42pl_commands.stats.functions import names
+from m42pl_commands.stats.functions.__base__ import np
+from m42pl_commands.stats.functions.accumulators import KahanSum, Welford
+from m42pl_commands.stats import signatures
+
+
+class Stats(unittest.TestCase, StreamingCommand):
+    """Test unit for the `stats` command.
+    """
+
+    command_alias = 'stats'
+    script_begin = dedent('''\
+        | make count=2 showinfo=yes
+        | eval t = id * 10 + 0.5
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='sliding_window_gap',
+            source=dedent('''\
+                | stats count as c with span=4 window=sliding slide=1 time=t
+            '''),
+            expected=[
+                Event({'window': {'start': -3.0, 'end': 1.0}, 'c': 1}),
+                Event({'window': {'start': -2.0, 'end': 2.0}, 'c': 1}),
+                Event({'window': {'start': -1.0, 'end': 3.0}, 'c': 1}),
+                Event({'window': {'start': 0.0, 'end': 4.0}, 'c': 1}),
+                Event({'window': {'start': 7.0, 'end': 11.0}, 'c': 1}),
+                Event({'window': {'start': 8.0, 'end': 12.0}, 'c': 1}),
+                Event({'window': {'start': 9.0, 'end': 13.0}, 'c': 1}),
+                Event({'window': {'start': 10.0, 'end': 14.0}, 'c': 1}),
+            ],
+            fields_in=['window', 'c']
+        ),
+
+    ]
+
+
+class GroupedStats(unittest.TestCase, StreamingCommand):
+    """Test unit for the `stats` command's groups.
+
+    The ``batch=<n>`` scripts run the vectorized functors and must
+    yield the same results as their per-event counterpart.
+    """
+
+    command_alias = 'stats'
+    script_begin = dedent('''\
+        | make count=5 showinfo=yes
+        | eval k = id % 2
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='grouped',
+            source=dedent('''\
+                | stats count as c, sum(id) as s by k with emit=final
+            '''),
+            expected=[
+                Event({'k': 0, 'c': 3, 's': 6}),
+                Event({'k': 1, 'c': 2, 's': 4}),
+            ],
+            fields_in=['k', 'c', 's']
+        ),
+
+        TestScript(
+            name='grouped_event',
+            source=dedent('''\
+                | stats count as c by k
+            '''),
+            expected=[
+                Event({'k': 0, 'c': 1}),
+                Event({'k': 1, 'c': 1}),
+                Event({'k': 0, 'c': 2}),
+                Event({'k': 1, 'c': 2}),
+                Event({'k': 0, 'c': 3}),
+            ],
+            fields_in=['k', 'c']
+        ),
+
+        TestScript(
+            name='grouped_batch',
+            source=dedent('''\
+                | stats count as c, sum(id) as s by k with batch=2 emit=final
+            '''),
+            expected=[
+                Event({'k': 0, 'c': 3, 's': 6}),
+                Event({'k': 1, 'c': 2, 's': 4}),
+            ],
+            fields_in=['k', 'c', 's']
+        ),
+
+        TestScript(
+            name='grouped_batch_event',
+            source=dedent('''\
+                | stats count as c by k with batch=2
+            '''),
+            expected=[
+                Event({'k': 0, 'c': 1}),
+                Event({'k': 1, 'c': 1}),
+                Event({'k': 0, 'c': 2}),
+                Event({'k': 1, 'c': 2}),
+                Event({'k': 0, 'c': 3}),
+            ],
+            fields_in=['k', 'c']
+        ),
+
+        TestScript(
+            name='values_max',
+            source=dedent('''\
+                | stats values(k, max=1) as v, list(id, max=2) as l with emit=final
+            '''),
+            expected=[Event({'v': [0], 'l': [3, 4]})],
+            fields_in=['v', 'l']
+        ),
+
+        TestScript(
+            name='emit_every',
+            source=dedent('''\
+                | stats count as c by k with emit=every:4
+            '''),
+            expected=[
+                Event({'k': 0, 'c': 2}),
+                Event({'k': 1, 'c': 2}),
+                Event({'k': 0, 'c': 3}),
+            ],
+            fields_in=['k', 'c']
+        ),
+
+        TestScript(
+            name='emit_interval',
+            source=dedent('''\
+                | stats count as c by k with emit=interval:3600
+            '''),
+            # The interval is never due: the groups are flushed at the end
+            expected=[
+                Event({'k': 0, 'c': 3}),
+                Event({'k': 1, 'c': 2}),
+            ],
+            fields_in=['k', 'c']
+        ),
+
+    ]
+
+
+class Merging(unittest.TestCase):
+    """Test unit for the stats functors partial states.
+
+    Merging the partial states of two chunks must give the same result
+    as aggregating all the values at once.
+    """
+
+    functions = (
+        'count', 'dc', 'dc_approx', 'values', 'list', 'min', 'max',
+        'range', 'first', 'last', 'sum', 'avg', 'var', 'stdev',
+        'median', 'p99', 'topk'
+    )
+
+    def aggregate(self, function, values):
+        dataset = None
+        for value in values:
+            dataset = function(dataset, value)
+        return dataset
+
+    def test_merge(self):
+        rng = random.Random(1)
+        values = [rng.randint(0, 20) + rng.choice((0, 0.5)) for _ in range(300)]
+        for name in self.functions:
+            with self.subTest(function=name):
+                function = names[name](Field('x'), [], Field('y'), {}, [])
+                expected = function.value(self.aggregate(function, values))
+                merged = function.result(function.merge(
+                    function.state(self.aggregate(function, values[:100])),
+                    function.state(self.aggregate(function, values[100:]))
+                ))
+                if isinstance(expected, float):
+                    self.assertAlmostEqual(merged, expected)
+                else:
+                    self.assertEqual(merged, expected)
+
+
+class Moments(unittest.TestCase):
+    """Test unit for the `sum`, `avg`, `var`, `stdev` and `range`
+    functors and their accumulators.
+    """
+
+    def function(self, name: str):
+        return names[name](Field('x'), [], Field('y'), {}, [])
+
+    def aggregate(self, name: str, values: list):
+        function, dataset = self.function(name), None
+        for value in values:
+            dataset = function(dataset, value)
+        return function.value(dataset)
+
+    def test_kahan_sum(self):
+        total = KahanSum()
+        for value in [0.1] * 10:
+            total.add(value)
+        self.assertEqual(total.value(), 1.0)
+        total = KahanSum()
+        for value in (1e16, 1.0, -1e16):
+            total.add(value)
+        self.assertEqual(total.value(), 1.0)
+
+    def test_welford(self):
+        rng = random.Random(3)
+        values = [1e9 + rng.random() for _ in range(1000)]
+        accumulator = Welford()
+        for value in values:
+            accumulator.add(value)
+        self.assertAlmostEqual(accumulator.mean, statistics.fmean(values), delta=1e-6)
+        self.assertAlmostEqual(accumulator.variance(), statistics.variance(values))
+        # Chan's merge of two halves
+        left, right = Welford(), Welford()
+        for value in values[:300]:
+            left.add(value)
+        for value in values[300:]:
+            right.add(value)
+        left.merge(*right.state())
+        self.assertEqual(left.count, 1000)
+        self.assertAlmostEqual(left.mean, accumulator.mean, delta=1e-6)
+        self.assertAlmostEqual(left.variance(), accumulator.variance())
+        # Single value
+        single = Welford()
+        single.add(1.0)
+        self.assertIsNone(single.variance())
+
+    def test_functors(self):
+        values, numbers = [2, 4, 'x', None, 4.0, 6], [2, 4, 4.0, 6]
+        self.assertAlmostEqual(self.aggregate('avg', values), statistics.fmean(numbers))
+        self.assertAlmostEqual(self.aggregate('var', values), statistics.variance(numbers))
+        self.assertAlmostEqual(self.aggregate('stdev', values), statistics.stdev(numbers))
+        self.assertEqual(self.aggregate('range', values), 4)
+        self.assertEqual(self.aggregate('range', [5, 'x']), 0)
+        self.assertIsNone(self.aggregate('var', [5]))
+        self.assertIsNone(self.aggregate('stdev', [5]))
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_batch(self):
+        rng = random.Random(4)
+        values = [rng.uniform(-100, 100) for _ in range(200)]
+        groups = [rng.randrange(3) for _ in values]
+        for name in ('avg', 'var', 'stdev', 'range'):
+            with self.subTest(function=name):
+                function = self.function(name)
+                # Two batches, the second one updates the first one's slots
+                datasets = [None] * 3
+                for start, stop in ((0, 120), (120, 200)):
+                    datasets = function.batch(
+                        datasets,
+                        np.array(groups[start:stop]),
+                        np.array(values[start:stop]),
+                        3
+                    )
+                for group, dataset in enumerate(datasets):
+                    self.assertAlmostEqual(
+                        function.value(dataset),
+                        self.aggregate(name, [
+                            value
+                            for value, code
+                            in zip(values, groups)
+                            if code == group
+                        ])
+                    )
+
+
+class Percentiles(unittest.TestCase):
+    """Test unit for the `percentile` functor's parameter.
+    """
+
+    def function(self, params: list):
+        return names['percentile'](Field('x'), [], Field('y'), {}, params)
+
+    def test_valid(self):
+        for param, quantile in (('0', 0), ('95', 0.95), ('99.9', 0.999), ('100', 1)):
+            self.assertAlmostEqual(self.function([param]).quantile, quantile)
+
+    def test_invalid(self):
+        for params in ([], ['-1'], ['100.5'], ['abc'], ['nan']):
+            with self.subTest(params=params):
+                with self.assertRaises(Exception):
+                    self.function(params)
+
+
+class Collections(unittest.TestCase):
+    """Test unit for the `values` and `list` functors.
+    """
+
+    def function(self, name: str, params: list = []):
+        return names[name](Field('x'), [], Field('y'), {}, params)
+
+    def test_default_max(self):
+        for name in ('values', 'list'):
+            function = self.function(name)
+            dataset = None
+            for value in range(150):
+                dataset = function(dataset, value)
+            self.assertEqual(len(function.value(dataset)), 100)
+
+    def test_max(self):
+        values, items = self.function('values', ['max=0']), self.function('list', ['max=2'])
+        dataset_v, dataset_l = None, None
+        for value in (1, 2, 1, [3, [4]], [3, [4]]):
+            dataset_v = values(dataset_v, value)
+            dataset_l = items(dataset_l, value)
+        self.assertEqual(values.value(dataset_v), [1, 2, 3, [4]])
+        self.assertEqual(items.value(dataset_l), [3, [4]])
+
+    def test_values_are_copies(self):
+        for name in ('values', 'list'):
+            function = self.function(name)
+            dataset = function(None, 1)
+            first = function.value(dataset)
+            dataset = function(dataset, 2)
+            self.assertEqual(first, [1])
+            self.assertIsNot(function.value(dataset), function.value(dataset))
+
+
+class Spilling(unittest.TestCase):
+    """Test unit for the stats groups spilling.
+
+    Spilling groups to several run files must give the same results as
+    keeping all the groups in memory.
+    """
+
+    functions = [
+        ('count', None, 'c', []),
+        ('sum', 'x', 's', []),
+        ('max', 'x', 'm', []),
+        ('avg', 'x', 'a', [])
+    ]
+
+    def run_stats(self, events: list, **kwargs) -> tuple:
+        async def run():
+            command = StreamStats(self.functions, ['k'], emit='final', **kwargs)
+            await command.setup(Event(), None, None)
+            results, runs = {}, 0
+            for event, ending in [*((e, False) for e in events), (None, True)]:
+                async for stated in command(event, None, None, ending):
+                    results[stated['data']['k']] = [
+                        stated['data'][name]
+                        for *_, name, _
+                        in self.functions
+                    ]
+                runs = max(runs, len(command.runs))
+            return command, results, runs
+        return asyncio.run(run())
+
+    def test_spill(self):
+        rng = random.Random(5)
+        events = [
+            Event({'k': rng.randrange(40), 'x': rng.randint(0, 100)})
+            for _ in range(1000)
+        ]
+        _, expected, _ = self.run_stats(events)
+        command, results, runs = self.run_stats(events, spill=8)
+        self.assertGreater(runs, 2)
+        self.assertEqual(len(results), 40)
+        for key, values in expected.items():
+            for value, result in zip(values, results[key]):
+                self.assertAlmostEqual(result, value)
+        # The run files are removed once merged
+        self.assertIsNone(command.rundir)
+
+
+class Screen:
+    """Curses screen stand-in which records the drawn lines.
+    """
+
+    def __init__(self):
+        self.lines = {} # type: dict[int, str]
+        self.drawn = [] # type: list[int]
+
+    def getmaxyx(self):
+        return (50, 200)
+
+    def addstr(self, y, x, text):
+        self.lines[y] = text
+        self.drawn.append(y)
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+    def clrtobot(self):
+        pass
+
+    def refresh(self):
+        pass
+
+
+class Table(unittest.TestCase):
+    """Test unit for the `print_stats` incremental rendering.
+    """
+
+    def table(self) -> StatsTable:
+        table = StatsTable()
+        table.stdscr = Screen()
+        return table
+
+    def test_line(self):
+        table = self.table()
+        table.measure({'k': 'abc', 'count': 10, 'avg': None})
+        self.assertEqual(table.widths, {'k': 3, 'count': 5, 'avg': 3})
+        self.assertEqual(table.line({'k': 'a', 'count': 10}), 'a       10     ')
+
+    def test_incremental_render(self):
+        table = self.table()
+        self.assertTrue(table.update('a', {'k': 'a', 'c': 1}))
+        self.assertTrue(table.update('b', {'k': 'b', 'c': 2}))
+        table.render()
+        # New columns: the header and all the rows are drawn
+        self.assertEqual(sorted(table.stdscr.drawn), [2, 3, 4, 5])
+        self.assertEqual(table.stdscr.lines[5], 'b  2')
+        # Same widths: only the updated row is drawn
+        table.stdscr.drawn = []
+        self.assertFalse(table.update('b', {'k': 'b', 'c': 2}))
+        self.assertTrue(table.update('a', {'k': 'a', 'c': 3}))
+        table.render()
+        self.assertEqual(table.stdscr.drawn, [4])
+        self.assertEqual(table.stdscr.lines[4], 'a  3')
+        # Wider column: the whole table is drawn again
+        table.stdscr.drawn = []
+        table.update('b', {'k': 'b', 'c': 100})
+        table.render()
+        self.assertEqual(sorted(table.stdscr.drawn), [2, 3, 4, 5])
+        self.assertEqual(table.stdscr.lines[4], 'a    3')
+        self.assertFalse(table.dirty or table.redraw)
+
+
+class Windows(unittest.TestCase):
+    """Test unit for the windowed stats chunks merge.
+    """
+
+    def test_span_not_multiple_of_slide(self):
+        command = WindowStreamStats(
+            [('count', None, 'c', [])], [],
+            span=10, window='sliding', slide=3
+        )
+        with self.assertRaises(Exception):
+            asyncio.run(command.setup(Event(), None, None))
+
+    def test_skewed_chunks(self):
+        async def run():
+            functions = [('count', None, 'c', [])]
+            chunks = []
+            for chunk in range(2):
+                command = WindowStreamStats(functions, [], span=2, time='t')
+                command._chunk, command._chunks = chunk, 2
+                await command.setup(Event(), None, None)
+                chunks.append(command)
+            merge = PostStatsMerge(functions, [], span=2, time='t')
+            await merge.setup(Event(), None, None)
+            results = {}
+            async def feed(command, event, ending=False):
+                async for stated in command(event, None, None, ending):
+                    async for merged in merge(stated, None, None, False):
+                        results[merged['data']['window']['start']] = merged['data']['c']
+            # The first chunk runs ahead of the second one
+            for t in (0.5, 1.0, 2.5, 4.5, 6.5, 8.5):
+                await feed(chunks[0], Event({'t': t}))
+            for t in (0.2, 1.5, 2.2, 3.0):
+                await feed(chunks[1], Event({'t': t}))
+            for command in chunks:
+                await feed(command, None, True)
+            return results
+        self.assertEqual(
+            asyncio.run(run()),
+            {0.0: 4, 2.0: 3, 4.0: 1, 6.0: 1, 8.0: 1}
+        )
+
+
+class Signatures(unittest.TestCase):
+    """Test unit for the stats group signatures.
+    """
+
+    def test_strategies(self):
+        key = ('a', 1)
+        self.assertIs(signatures.tuple_signature(key), key)
+        self.assertRegex(signatures.hash_signature(key), r'^[0-9a-f]{16}$')
+        self.assertEqual(signatures.hash_signature(key), signatures.hash_signature(('a', 1)))
+        self.assertNotEqual(signatures.hash_signature(key), signatures.hash_signature(('a', 2)))
+
+    def test_hash_fallback(self):
+        # Without xxhash, the hash is a 64 bits blake2b digest
+        with mock.patch.object(signatures, 'xxhash', None):
+            self.assertEqual(
+                signatures.hash64(('a', 1)),
+                int.from_bytes(blake2b(b"('a', 1)", digest_size=8).digest(), 'big')
+            )
+        self.assertLess(signatures.hash64(('a', 1)), 2 ** 64)
+
+    def test_merge_signatures(self):
+        async def run(chunks: int) -> list:
+            functions = [('count', None, 'c', [])]
+            command = StreamStats(functions, ['k'])
+            command._chunk, command._chunks = 0, chunks
+            await command.setup(Event(), None, None)
+            merge = PostStatsMerge(functions, ['k'])
+            await merge.setup(Event(), None, None)
+            signs = []
+            for event, ending in ((Event({'k': 'a'}), False), (None, True)):
+                async for stated in command(event, None, None, ending):
+                    async for merged in merge(stated, None, None, False):
+                        signs.append(merged['sign'])
+            return signs
+        # A single chunk results keep their (tuple) signature
+        self.assertEqual(asyncio.run(run(1)), [('a', )])
+        # Merged chunks results get a process-stable signature
+        self.assertEqual(asyncio.run(run(2)), [signatures.hash_signature(('a', ))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from textwrap import dedent
+
+from m42pl.utils.unittest import StreamingCommand, TestScript
+from m42pl.event import Event
+
+from m42pl_commands.where import compile_mask
+
+
+class Where(unittest.TestCase, StreamingCommand):
+    """Test unit for the `where` command.
+
+    The ``batch=<n>`` scripts run the vectorized path and must select
+    the same events as their per-event counterpart.
+    """
+
+    command_alias = 'where'
+    script_begin = dedent('''\
+        | make count=3 showinfo=yes
+        | eval x = 1 if id < 2 else 'a'
+        | eval x = tostring(x) if id == 1 else x
+    ''')
+    expected_success = [
+
+        TestScript(
+            name='mixed_types',
+            source=dedent('''\
+                | where x == '1'
+            '''),
+            expected=[Event({'id': 1, 'x': '1'})],
+            fields_in=['id', 'x']
+        ),
+
+        TestScript(
+            name='mixed_types_batch',
+            source=dedent('''\
+                | where batch=3 x == '1'
+            '''),
+            expected=[Event({'id': 1, 'x': '1'})],
+            fields_in=['id', 'x']
+        ),
+
+        TestScript(
+            name='numeric',
+            source=dedent('''\
+                | where id >= 1 and not id == 2
+            '''),
+            expected=[Event({'id': 1})],
+            fields_in=['id']
+        ),
+
+        TestScript(
+            name='numeric_batch',
+            source=dedent('''\
+                | where batch=3 id >= 1 and not id == 2
+            '''),
+            expected=[Event({'id': 1})],
+            fields_in=['id']
+        ),
+
+    ]
+
+
+class Mask(unittest.TestCase):
+    """Test unit for the `where` vectorized masks.
+
+    Masks must select the same rows as the expression evaluated event
+    by event.
+    """
+
+    columns = {
+        's': ['', 'x', '', 'y'],
+        'i': [0, 2, -1, 0],
+        'f': [0.0, 1.5, 0.0, -0.5],
+        'b': [False, True, True, False]
+    }
+
+    def test_parity(self):
+        rows = [
+            {name: values[index] for name, values in self.columns.items()}
+            for index in range(4)
+        ]
+        for expression in ('s', 'i', 'f', 'b', 'not s', 's and i',
+                            'not f or b', "s == '' and i == 0"):
+            with self.subTest(expression=expression):
+                mask = compile_mask(expression)
+                self.assertEqual(
+                    [bool(keep) for keep in mask(self.columns.get, 4)],
+                    [bool(eval(expression, {}, row)) for row in rows]
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()